@@ -0,0 +1,63 @@
+"""Build and lookup cost of the tag autocomplete trie.
+
+    python benchmarks/bench_autocomplete.py [--tags 100000] [--k 10]
+
+Tag names are pronounceable synthetic words with Zipf-distributed image
+counts; lookups use prefixes of 1-4 characters taken from real tags, as
+typed by a visitor.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from lfp_image_preprocessor.search.autocomplete import Autocomplete, build_autocomplete
+
+_CONSONANTS = "bcdfghklmnprstvz"
+_VOWELS = "aeiou"
+
+
+def synthetic_tags(count: int, seed: int = 0) -> dict[str, int]:
+    rng = random.Random(seed)
+    tags: dict[str, int] = {}
+    while len(tags) < count:
+        syllables = rng.randint(1, 4)
+        name = "".join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(syllables))
+        if rng.random() < 0.2:
+            name += "-" + rng.choice(("film", "digital", "portrait", "street", "bw"))
+        tags[name] = max(1, int(200_000 / (len(tags) + 1)))
+    return tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tags", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    counts = synthetic_tags(args.tags)
+    started = time.perf_counter()
+    data = build_autocomplete(counts)
+    build_s = time.perf_counter() - started
+    started = time.perf_counter()
+    trie = Autocomplete(data)
+    load_s = time.perf_counter() - started
+    plain = sum(len(tag.encode()) + 4 for tag in counts)
+    print(f"{len(counts)} tags: built in {build_s:.2f}s, {len(data):,} bytes "
+          f"(names + counts alone: {plain:,}), decoded in {load_s * 1e3:.0f} ms")
+
+    rng = random.Random(1)
+    names = list(counts)
+    prefixes = [name[:rng.randint(1, 4)] for name in rng.choices(names, k=args.lookups)]
+    started = time.perf_counter()
+    for prefix in prefixes:
+        trie.complete(prefix, args.k)
+    lookup_s = time.perf_counter() - started
+    print(f"{args.lookups} top-{args.k} lookups: {lookup_s / args.lookups * 1e6:.1f} us each")
+
+
+if __name__ == "__main__":
+    main()
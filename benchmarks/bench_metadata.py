@@ -0,0 +1,102 @@
+"""Header-only metadata reading versus a full decode.
+
+    python benchmarks/bench_metadata.py [--files 100] [--size 2400x1600]
+
+Writes ``--files`` images per format (JPEG, PNG, TIFF) carrying EXIF and
+XMP keywords, then reads each set twice: with ``read_header`` and by
+decoding the image with Pillow and asking for its EXIF. Reports bytes read
+per file (as seen by the OS-level file object, so buffer read-ahead counts)
+and files per second. Pillow is needed for this benchmark only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from lfp_image_preprocessor.discovery import read_header
+
+XMP = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF><rdf:Description>'
+       b"<dc:subject><rdf:Bag><rdf:li>bench</rdf:li><rdf:li>keyword</rdf:li></rdf:Bag></dc:subject>"
+       b"</rdf:Description></rdf:RDF></x:xmpmeta>")
+
+
+class CountingFile(io.FileIO):
+    """Raw file that tallies the bytes the OS hands back."""
+
+    bytes_read = 0
+
+    def readinto(self, buffer) -> int | None:
+        n = super().readinto(buffer)
+        CountingFile.bytes_read += n or 0
+        return n
+
+
+def make_library(root: Path, files: int, size: tuple[int, int]) -> dict[str, list[Path]]:
+    exif = Image.Exif()
+    exif[0x010E] = "benchmark image"
+    exif[0x9C9E] = "tree;sky\x00".encode("utf-16-le")
+    image = Image.effect_noise(size, 64).convert("RGB")
+    library: dict[str, list[Path]] = {}
+    for fmt, suffix, extra in (("JPEG", ".jpg", {"quality": 90}), ("PNG", ".png", {}), ("TIFF", ".tif", {})):
+        paths = library.setdefault(fmt.lower(), [])
+        for number in range(files):
+            path = root / f"{number:05d}{suffix}"
+            image.save(path, fmt, exif=exif.tobytes(), **extra)
+            paths.append(path)
+        if fmt == "JPEG":
+            # Splice an XMP APP1 after SOI so the JPEG path exercises both.
+            segment = b"http://ns.adobe.com/xap/1.0/\x00" + XMP
+            app1 = b"\xff\xe1" + (len(segment) + 2).to_bytes(2, "big") + segment
+            for path in paths:
+                data = path.read_bytes()
+                path.write_bytes(data[:2] + app1 + data[2:])
+    return library
+
+
+def header_only(path: Path) -> None:
+    with io.BufferedReader(CountingFile(path)) as fh:
+        read_header(fh)
+
+
+def full_decode(path: Path) -> None:
+    with io.BufferedReader(CountingFile(path)) as fh, Image.open(fh) as image:
+        image.load()
+        image.getexif()
+
+
+def measure(fn, paths: list[Path]) -> tuple[float, float]:
+    CountingFile.bytes_read = 0
+    started = time.perf_counter()
+    for path in paths:
+        fn(path)
+    elapsed = time.perf_counter() - started
+    return CountingFile.bytes_read / len(paths), len(paths) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--size", default="2400x1600", help="WIDTHxHEIGHT of the generated images")
+    args = parser.parse_args()
+    width, height = map(int, args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"{'format':>6} {'file size':>11} {'reader':>8} {'bytes/file':>11} {'files/s':>9}")
+        for fmt, paths in make_library(root, args.files, (width, height)).items():
+            file_size = sum(path.stat().st_size for path in paths) // len(paths)
+            for name, fn in (("header", header_only), ("decode", full_decode)):
+                per_file, rate = measure(fn, paths)
+                print(f"{fmt:>6} {file_size:>11,} {name:>8} {per_file:>11,.0f} {rate:>9,.0f}")
+            for path in paths:
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main()
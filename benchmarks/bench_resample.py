@@ -0,0 +1,75 @@
+"""Compare the box and Lanczos pyramid filters on a synthetic 50 MP image.
+
+    python benchmarks/bench_resample.py [--megapixels 50] [--strip-rows 256]
+
+Each filter builds the full chain of reduced levels from the original,
+streamed in strips exactly as the tiler does, and reports throughput in
+source megapixels per second.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from lfp_image_preprocessor.tiling.pyramid import level_sizes
+from lfp_image_preprocessor.tiling.resample import FILTERS, make_halver
+
+
+def synthetic_image(megapixels: float, seed: int = 0) -> np.ndarray:
+    """3:2 RGB image of smooth gradients plus noise, so neither filter gets a free ride."""
+    height = int((megapixels * 1e6 / 1.5) ** 0.5)
+    width = int(height * 1.5)
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:height, :width]
+    base = ((x * 255 // width + y * 255 // height) // 2).astype(np.uint8)
+    image = np.repeat(base[:, :, np.newaxis], 3, axis=2).astype(np.int16)
+    noise = rng.integers(0, 32, size=image.shape, dtype=np.int16)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def reduce_all(image: np.ndarray, kind: str, strip_rows: int) -> int:
+    """Stream ``image`` through every level's halver; return output pixels."""
+    sizes = level_sizes(image.shape[1], image.shape[0])
+    halvers = [make_halver(kind, h) for _, h in sizes]
+    received = [0] * len(sizes)
+    produced = 0
+
+    def feed(level: int, strip: np.ndarray) -> None:
+        nonlocal produced
+        received[level] += len(strip)
+        if level == 0:
+            return
+        out = halvers[level].push(strip, final=received[level] == sizes[level][1])
+        if out is not None:
+            produced += out.shape[0] * out.shape[1]
+            feed(level - 1, out)
+
+    for top in range(0, image.shape[0], strip_rows):
+        feed(len(sizes) - 1, image[top:top + strip_rows])
+    return produced
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=50)
+    parser.add_argument("--strip-rows", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image = synthetic_image(args.megapixels)
+    source_mp = image.shape[0] * image.shape[1] / 1e6
+    print(f"source {image.shape[1]}x{image.shape[0]} ({source_mp:.1f} MP), strips of {args.strip_rows} rows")
+    for kind in FILTERS:
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            produced = reduce_all(image, kind, args.strip_rows)
+            best = min(best, time.perf_counter() - started)
+        print(f"{kind:>8}: {best:7.2f}s  {source_mp / best:7.1f} MP/s  ({produced / 1e6:.1f} MP of levels)")
+
+
+if __name__ == "__main__":
+    main()
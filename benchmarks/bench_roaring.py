@@ -0,0 +1,79 @@
+"""Sorted-list versus roaring-bitmap postings across tag densities.
+
+    python benchmarks/bench_roaring.py [--images 200000]
+
+For every pair of densities (fraction of the library a tag covers) this
+reports the encoded size of each representation and the time for AND, OR
+and ANDNOT. Lists are intersected with the same routine the search uses;
+bitmaps use RoaringBitmap operators.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from itertools import combinations_with_replacement
+
+from lfp_image_preprocessor.search.index import intersect
+from lfp_image_preprocessor.search.roaring import RoaringBitmap
+from lfp_image_preprocessor.search.varint import encode_deltas
+
+DENSITIES = (0.001, 0.01, 0.1, 0.5, 0.9)
+
+
+def posting_list(images: int, density: float, rng: random.Random, clustered: bool = False) -> list[int]:
+    if clustered:
+        # Long consecutive stretches, like a tag applied to whole shoots.
+        ids: list[int] = []
+        pos = 0
+        while pos < images:
+            length = rng.randint(50, 500)
+            if rng.random() < density:
+                ids.extend(range(pos, min(pos + length, images)))
+            pos += length
+        return ids
+    return sorted(rng.sample(range(images), max(1, int(images * density))))
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=200_000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print("size per tag (bytes)")
+    print(f"{'density':>8} {'layout':>9} {'delta':>9} {'roaring':>9}")
+    for density in DENSITIES:
+        for clustered in (False, True):
+            ids = posting_list(args.images, density, rng, clustered)
+            print(f"{density:>8} {'runs' if clustered else 'random':>9} "
+                  f"{len(encode_deltas(ids)):>9,} {len(RoaringBitmap.from_sorted(ids).to_bytes()):>9,}")
+
+    print("\noperation time (ms): list / roaring")
+    print(f"{'a':>6} {'b':>6} {'AND':>17} {'OR':>17} {'ANDNOT':>17}")
+    for da, db in combinations_with_replacement(DENSITIES, 2):
+        a = posting_list(args.images, da, rng)
+        b = posting_list(args.images, db, rng)
+        ra, rb = RoaringBitmap.from_sorted(a), RoaringBitmap.from_sorted(b)
+        set_b = set(b)
+        timings = (
+            (timed(lambda: intersect(a, b)), timed(lambda: ra & rb)),
+            (timed(lambda: sorted(set(a).union(b))), timed(lambda: ra | rb)),
+            (timed(lambda: [x for x in a if x not in set_b]), timed(lambda: ra - rb)),
+        )
+        cells = " ".join(f"{lst * 1e3:>8.2f}/{bmp * 1e3:<8.2f}" for lst, bmp in timings)
+        print(f"{da:>6} {db:>6} {cells}")
+
+
+if __name__ == "__main__":
+    main()
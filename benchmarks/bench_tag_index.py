@@ -0,0 +1,66 @@
+"""Size and decode speed of the binary tag index against plain JSON arrays.
+
+    python benchmarks/bench_tag_index.py [--images 200000] [--tags 5000]
+
+Tags are assigned with a Zipf-like popularity so that a few tags cover most
+of the library and most tags are rare, as on the real site.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import time
+
+from lfp_image_preprocessor.search import TagIndex, TagIndexBuilder, TagIndexReader
+
+
+def synthetic_index(images: int, tags: int, per_image: int, seed: int = 0) -> TagIndex:
+    rng = random.Random(seed)
+    names = [f"tag-{i:05d}" for i in range(tags)]
+    weights = [1 / (rank + 1) for rank in range(tags)]
+    builder = TagIndexBuilder()
+    for image_id in range(images):
+        builder.add(image_id, set(rng.choices(names, weights, k=rng.randint(1, per_image))))
+    return builder.build()
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=200_000)
+    parser.add_argument("--tags", type=int, default=5_000)
+    parser.add_argument("--per-image", type=int, default=12)
+    args = parser.parse_args()
+
+    index = synthetic_index(args.images, args.tags, args.per_image)
+    postings = sum(len(ids) for _, ids in index.items())
+    binary = index.to_bytes()
+    plain = json.dumps(dict(index.items()), separators=(",", ":")).encode()
+    print(f"{args.images} images, {len(index)} tags, {postings} postings")
+    print(f"{'':>8} {'raw':>12} {'gzip':>12}")
+    for name, data in (("json", plain), ("binary", binary)):
+        print(f"{name:>8} {len(data):>12,} {len(gzip.compress(data, 9)):>12,}")
+
+    json_s = timed(lambda: json.loads(plain))
+    binary_s = timed(lambda: TagIndex.from_bytes(binary))
+    print(f"full decode: json {json_s * 1e3:.1f} ms, binary {binary_s * 1e3:.1f} ms "
+          f"({postings / binary_s / 1e6:.1f} M postings/s)")
+    reader = TagIndexReader(binary)
+    popular = next(index.tags())
+    lazy_s = timed(lambda: reader.postings(popular), repeat=10)
+    print(f"one posting list ({reader.count(popular)} IDs) from the lazy reader: {lazy_s * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Image tiling and tag-search precompute for the LeftEyePro.com website.
+
+The package is split by job:
+
+* :mod:`lfp_image_preprocessor.discovery` walks the photo library and reads
+  each file's dimensions and keywords from its headers. Standard library only.
+* :mod:`lfp_image_preprocessor.tiling` turns original photos into zoomable
+  tile pyramids. It needs the ``tiling`` extra (NumPy, Pillow).
+* :mod:`lfp_image_preprocessor.search` precomputes the tag index the site
+  searches client-side. Standard library only.
+* :mod:`lfp_image_preprocessor.build` ties them into a
+  :mod:`~lfp_image_preprocessor.pipeline` whose stages re-run only when their
+  inputs change.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,15 @@
+"""Helpers for importing optional dependencies with a useful error."""
+
+import importlib
+from types import ModuleType
+
+
+def require(module: str, extra: str) -> ModuleType:
+    """Import ``module`` or explain which package extra provides it."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as exc:
+        raise ImportError(
+            f"{module!r} is required for this feature; "
+            f"install it with `pip install lfp-image-preprocessor[{extra}]`"
+        ) from exc
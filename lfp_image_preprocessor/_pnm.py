@@ -0,0 +1,33 @@
+"""Binary PNM (P5/P6) header parsing, shared by the tiler and discovery."""
+
+from typing import BinaryIO
+
+
+def read_pnm_header(fh: BinaryIO) -> tuple[bytes, int, int, int]:
+    """Parse a binary PGM/PPM header, leaving ``fh`` at the first pixel.
+
+    Returns ``(magic, width, height, maxval)``.
+    """
+    magic = fh.read(2)
+    if magic not in (b"P5", b"P6"):
+        raise ValueError(f"unsupported PNM type {magic!r}; only binary P5/P6 are streamed")
+    fields: list[int] = []
+    token = b""
+    while len(fields) < 3:
+        ch = fh.read(1)
+        if not ch:
+            raise ValueError("truncated PNM header")
+        if ch == b"#" or ch.isspace():
+            if ch == b"#":
+                fh.readline()
+            if token:
+                fields.append(int(token))
+                token = b""
+            continue
+        token += ch
+    # Exactly one whitespace byte separates maxval from the raster, and the
+    # loop above stops right after consuming it.
+    width, height, maxval = fields
+    if not 0 < maxval < 65536:
+        raise ValueError(f"invalid PNM maxval {maxval}")
+    return magic, width, height, maxval
@@ -0,0 +1,305 @@
+"""The standard site build as a :class:`~.pipeline.Pipeline`.
+
+Given the photo library and an output directory, the stages are::
+
+    scan ──┬─> index    records.jsonl -> search/ (shards, autocomplete, cache,
+    tiles ─┘            records with placeholders)
+                        tiles/ (one pyramid plus gallery variants per original)
+
+``tiles`` does not depend on ``scan``, so the two run side by side; ``index``
+waits for both because its records carry the placeholders and perceptual
+hashes that tiling records in the tile manifest, and near-duplicates can
+be collapsed to one search result by those hashes. All three read the library, so
+adding one photo re-runs all three stages, but ``scan`` and ``tiles`` are
+themselves incremental: ``scan`` reuses the metadata cache and ``tiles`` its
+build manifest, so only ``index`` does work proportional to the library.
+A change to index settings alone re-runs only ``index``.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .pipeline import STATE_NAME, Pipeline, Stage
+
+if TYPE_CHECKING:
+    from .discovery import ImageRecord
+    from .search import TagIndex
+    from .tiling import LibraryReport, TileEncoder, TileOptions
+
+log = logging.getLogger(__name__)
+
+RECORDS_NAME = "records.jsonl"
+
+
+@dataclass(frozen=True)
+class BuildOptions:
+    tile_size: int = 256
+    overlap: int = 0
+    format: str = "jpeg"
+    quality: int = 85
+    resample: str = "box"
+    jobs: int = 1
+    """Tile encoder processes; 0 means one per CPU."""
+    scan_workers: int = 16
+    shard_bytes: int = 32 * 1024
+    partition: str = "prefix"
+    cache_top: int = 1000
+    cache_budget: int = 256 * 1024
+    prune_grace: float = 24 * 3600
+    """Seconds a shard or delta file is kept after the root manifest stops referencing it."""
+    variant_widths: tuple[int, ...] = (320, 640, 1280, 2048)
+    collapse_duplicates: int | None = None
+    """pHash distance (bits) within which images count as one search result; None keeps all."""
+    layouts: tuple[str, ...] = ()
+    """Viewer layouts to tile into (see :mod:`.tiling.layouts`); empty for the plain directory."""
+    iiif_base: str = ""
+    adaptive_quality: tuple[int, int] | None = None
+    """Per-tile quality range (see :mod:`.tiling.quality`); None encodes every tile at ``quality``."""
+    fsync: str = "off"
+    """Tile durability, one of :data:`~.tiling.writer.FSYNC_MODES`."""
+    write_queue: int = 256
+    """Tile writes queued for the writer thread; 0 writes inline."""
+
+    def tile_options(self) -> TileOptions:
+        """The tiler's options; raises ``ValueError`` if they are inconsistent."""
+        from .tiling import TileOptions
+        from .tiling.layouts import check_layouts
+
+        options = TileOptions(self.tile_size, self.overlap, self.format, self.quality, self.resample,
+                              self.variant_widths, layouts=self.layouts, iiif_base=self.iiif_base,
+                              adaptive_quality=self.adaptive_quality)
+        if options.layouts:
+            check_layouts(options)
+        return options
+
+
+def _image_files(library: Path) -> list[Path]:
+    from .discovery import IMAGE_SUFFIXES
+
+    found = []
+    for directory, subdirs, files in os.walk(library):
+        subdirs.sort()
+        found.extend(Path(directory, name) for name in sorted(files)
+                     if os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES)
+    return found
+
+
+def load_records(path: Path) -> dict[str, dict[str, Any]]:
+    """``path -> row`` from a records file; empty if there is none yet."""
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return {row["path"]: row for row in map(json.loads, fh)}
+
+
+def record_row(record: ImageRecord, image_id: int) -> dict[str, Any]:
+    row = dataclasses.asdict(record)
+    return {"id": image_id, "tags": list(row.pop("keywords")), **row}
+
+
+def write_records(path: Path, rows: Iterable[dict[str, Any]]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def _run_scan(library: Path, output: Path, options: BuildOptions) -> None:
+    from .discovery import MetadataCache, scan
+
+    # IDs stay attached to their path across builds, so cached shards and
+    # client-side bookmarks keep pointing at the same image.
+    previous = {path: row["id"] for path, row in load_records(output / RECORDS_NAME).items()}
+    next_id = max(previous.values(), default=-1) + 1
+    with MetadataCache(output / ".lfp-metadata.db") as cache:
+        records = sorted(scan([library], options.scan_workers, cache=cache), key=lambda r: r.path)
+    rows = []
+    for record in records:
+        image_id = previous.get(record.path)
+        if image_id is None:
+            image_id, next_id = next_id, next_id + 1
+        rows.append(record_row(record, image_id))
+    write_records(output / RECORDS_NAME, rows)
+
+
+def write_search(index: TagIndex, output: Path, options: BuildOptions) -> None:
+    """Write the shards, autocomplete trie and intersection cache of ``index``."""
+    from .search import CacheOptions, ShardOptions, mine_combinations, prune_shards, write_shards
+
+    cache_options = CacheOptions(options.cache_top, options.cache_budget)
+    sample = [combo for combo, _ in mine_combinations(index, cache_options)]
+    write_shards(index, output / "search", ShardOptions(options.shard_bytes, options.partition), sample)
+    # Clients and CDN edges may still hold the previous manifest.
+    prune_shards(output / "search", options.prune_grace)
+    write_lookup_tables(index, output, options)
+
+
+def write_lookup_tables(index: TagIndex, output: Path, options: BuildOptions) -> None:
+    """Write the autocomplete trie and intersection cache of ``index``."""
+    from .search import CACHE_MAGIC, CacheOptions, autocomplete_from_index, build_intersection_cache
+
+    search = output / "search"
+    cache = build_intersection_cache(index, CacheOptions(options.cache_top, options.cache_budget))
+    (search / "autocomplete.bin").write_bytes(autocomplete_from_index(index))
+    (search / "intersections.bin").write_bytes(cache.to_bytes(CACHE_MAGIC))
+
+
+def search_rows(rows: Iterable[dict[str, Any]], output: Path) -> list[dict[str, Any]]:
+    """The records joined with what tiling recorded about each image.
+
+    That is the placeholder (``blurhash``, ``colour``) and the perceptual
+    hashes (``dhash``, ``phash``) from the tile manifest; images not tiled
+    yet get ``None``.
+    """
+    from .tiling import BuildManifest
+    from .tiling.manifest import MANIFEST_NAME
+
+    manifest = BuildManifest(output / "tiles" / MANIFEST_NAME)
+    placeholders, hashes = manifest.placeholders(), manifest.hashes()
+    no_placeholder = {"blurhash": None, "colour": None}
+    no_hashes = {"dhash": None, "phash": None}
+    joined = []
+    for row in rows:
+        source = os.path.realpath(row["path"])
+        joined.append({**row, **placeholders.get(source, no_placeholder), **hashes.get(source, no_hashes)})
+    return joined
+
+
+def find_duplicates(rows: Iterable[dict[str, Any]], threshold: int) -> dict[int, int]:
+    """``{duplicate id: kept id}`` for the pHash clusters within ``threshold`` bits.
+
+    The largest image of each cluster (lowest ID on a tie) is kept.
+    """
+    from .search import duplicate_clusters
+
+    by_id = {row["id"]: row for row in rows if row.get("phash")}
+    clusters = duplicate_clusters({image_id: int(row["phash"], 16) for image_id, row in by_id.items()}, threshold)
+    duplicate_of = {}
+    for cluster in clusters:
+        keep = max(cluster, key=lambda i: ((by_id[i]["width"] or 0) * (by_id[i]["height"] or 0), -i))
+        duplicate_of.update((image_id, keep) for image_id in cluster if image_id != keep)
+    return duplicate_of
+
+
+def write_search_records(
+    rows: Iterable[dict[str, Any]],
+    output: Path,
+    duplicate_of: dict[int, int] | None = None,
+) -> None:
+    """Write ``search/records.jsonl`` from :func:`search_rows` output.
+
+    This is what a results page loads alongside the shards, so each hit can
+    be drawn as its BlurHash or dominant colour before its tiles arrive.
+    Collapsed duplicates keep their record, marked ``duplicate_of`` the kept
+    image, which lists them under ``duplicates``.
+    """
+    duplicate_of = duplicate_of or {}
+    members: dict[int, list[int]] = {}
+    for image_id, keep in duplicate_of.items():
+        members.setdefault(keep, []).append(image_id)
+
+    def annotated(row: dict[str, Any]) -> dict[str, Any]:
+        if row["id"] in duplicate_of:
+            return {**row, "duplicate_of": duplicate_of[row["id"]]}
+        if row["id"] in members:
+            return {**row, "duplicates": sorted(members[row["id"]])}
+        return row
+
+    write_records(output / "search" / RECORDS_NAME, map(annotated, rows))
+
+
+def _run_index(output: Path, options: BuildOptions) -> None:
+    from .search import TagIndexBuilder
+
+    rows = search_rows(load_records(output / RECORDS_NAME).values(), output)
+    duplicate_of: dict[int, int] = {}
+    if options.collapse_duplicates is not None:
+        duplicate_of = find_duplicates(rows, options.collapse_duplicates)
+    builder = TagIndexBuilder()
+    for row in rows:
+        if row["id"] not in duplicate_of:
+            builder.add(row["id"], row["tags"])
+    write_search(builder.build(), output, options)
+    write_search_records(rows, output, duplicate_of)
+
+
+def tile_sources(
+    sources: Iterable[Path],
+    library: Path,
+    output: Path,
+    options: BuildOptions,
+    encoder: TileEncoder | None = None,
+) -> LibraryReport:
+    """Tile ``sources`` (files under ``library``) into ``output/tiles``."""
+    from .tiling import (
+        EXTENSIONS,
+        DirectorySink,
+        LayoutSink,
+        ParallelEncoder,
+        SerialEncoder,
+        ThreadedSink,
+        TileSink,
+        tile_library,
+    )
+
+    tile_options = options.tile_options()
+    extension = EXTENSIONS[tile_options.format]
+
+    def make_sink(path: Path) -> TileSink:
+        if tile_options.layouts:
+            sink: TileSink = LayoutSink(path, tile_options, path.relative_to(output).as_posix(), options.fsync)
+        else:
+            sink = DirectorySink(path, extension, options.fsync)
+        return ThreadedSink(sink, options.write_queue) if options.write_queue else sink
+
+    own = encoder is None
+    if encoder is None:
+        encoder = SerialEncoder() if options.jobs == 1 else ParallelEncoder(options.jobs or None)
+    try:
+        return tile_library(sources, output / "tiles", make_sink, tile_options, encoder, relative_to=library)
+    finally:
+        if own:
+            encoder.close()
+
+
+def _run_tiles(library: Path, output: Path, options: BuildOptions) -> None:
+    report = tile_sources(_image_files(library), library, output, options)
+    if report.failed:
+        # Not fatal for the build; they are retried when the library next
+        # changes or with --rerun tiles.
+        log.warning("%d originals could not be tiled: %s", len(report.failed), ", ".join(report.failed))
+
+
+def library_pipeline(
+    library: str | os.PathLike[str],
+    output: str | os.PathLike[str],
+    options: BuildOptions = BuildOptions(),
+) -> Pipeline:
+    library, output = Path(library), Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    settings = dataclasses.asdict(options)
+    tile_params = {
+        key: settings[key] for key in ("tile_size", "overlap", "format", "quality", "resample", "variant_widths",
+                                       "layouts", "iiif_base", "adaptive_quality")
+    }
+    index_params = {
+        key: settings[key] for key in ("shard_bytes", "partition", "cache_top", "cache_budget", "collapse_duplicates")
+    }
+    stages = [
+        Stage("scan", lambda: _run_scan(library, output, options),
+              inputs=[library], outputs=[output / RECORDS_NAME]),
+        Stage("index", lambda: _run_index(output, options),
+              outputs=[output / "search"], after=["scan", "tiles"], params=index_params),
+        Stage("tiles", lambda: _run_tiles(library, output, options),
+              inputs=[library], outputs=[output / "tiles"], params=tile_params),
+    ]
+    return Pipeline(stages, output / STATE_NAME)
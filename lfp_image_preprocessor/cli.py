@@ -0,0 +1,380 @@
+"""Command-line entry point: ``lfp-preprocess <command> ...``."""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .build import BuildOptions
+
+
+def _widths(text: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in text.split(",") if part.strip())
+
+
+def _quality_range(text: str) -> tuple[int, int]:
+    values = _widths(text)
+    if len(values) != 2 or not 1 <= values[0] <= values[1] <= 100:
+        raise argparse.ArgumentTypeError("expected LOW,HIGH with 1 <= LOW <= HIGH <= 100")
+    return values[0], values[1]
+
+
+def _names(text: str) -> tuple[str, ...]:
+    return tuple(part.strip() for part in text.split(",") if part.strip())
+
+
+def _cmd_tile(args: argparse.Namespace) -> int:
+    from .tiling import (
+        EXTENSIONS,
+        DirectorySink,
+        LayoutSink,
+        PackSink,
+        ParallelEncoder,
+        SerialEncoder,
+        TiffSink,
+        TileOptions,
+        ThreadedSink,
+        TileSink,
+        tile_library,
+    )
+    from .tiling import bigtiff, layouts, pack
+
+    if args.layouts and args.container != "dir":
+        args.parser.error("--layouts needs --container dir")
+    if args.container == "tiff" and args.variants:
+        args.parser.error("--container tiff does not store --variants")
+    try:
+        options = TileOptions(args.tile_size, args.overlap, args.format, args.quality, args.resample, args.variants,
+                              layouts=args.layouts, iiif_base=args.iiif_base, adaptive_quality=args.adaptive_quality)
+        if options.layouts:
+            layouts.check_layouts(options)
+        if args.container == "tiff":
+            options = bigtiff.tiff_options(options)
+    except ValueError as exc:
+        args.parser.error(str(exc))
+    extension = EXTENSIONS[options.format]
+
+    def open_sink(output: Path) -> TileSink:
+        if args.container == "pack":
+            return PackSink(output.with_name(output.name + pack.SUFFIX), extension, dataclasses.asdict(options),
+                            args.fsync)
+        if args.container == "tiff":
+            return TiffSink(output.with_name(output.name + bigtiff.SUFFIX), options, args.fsync)
+        if options.layouts:
+            return LayoutSink(output, options, output.relative_to(args.output).as_posix(), args.fsync)
+        return DirectorySink(output, extension, args.fsync)
+
+    def make_sink(output: Path) -> TileSink:
+        sink = open_sink(output)
+        return ThreadedSink(sink, args.write_queue) if args.write_queue else sink
+
+    if args.jobs == 1:
+        encoder = SerialEncoder(skip_uniform=args.skip_uniform)
+    else:
+        encoder = ParallelEncoder(args.jobs or None, skip_uniform=args.skip_uniform)
+    # Outputs are named after each source's path below the folder all of them share.
+    common = os.path.commonpath([source.resolve().parent for source in args.sources])
+    try:
+        report = tile_library(
+            args.sources,
+            args.output,
+            make_sink,
+            options,
+            encoder,
+            force=args.force,
+            dedup=args.dedup,
+            relative_to=common,
+        )
+    finally:
+        encoder.close()
+    print(f"tiled {report.tiled}, unchanged {report.skipped}, removed {report.removed}; "
+          f"{report.tiles} tiles, {report.bytes_written} bytes")
+    if report.failed:
+        print(f"failed {len(report.failed)}: " + ", ".join(report.failed), file=sys.stderr)
+    if report.variants:
+        print(f"{report.variants} variants, {report.variant_bytes} bytes")
+    if options.adaptive_quality and options.format != "png" and report.tiled:
+        print(f"adaptive quality saved ~{report.adaptive_bytes_saved} bytes against quality {options.quality}")
+    if args.dedup or args.skip_uniform:
+        print(f"saved {report.bytes_deduplicated} bytes on {report.duplicates} duplicate tiles, "
+              f"~{report.encode_seconds_saved:.2f}s on {report.uniform_reused} skipped uniform encodes")
+    return 1 if report.failed else 0
+
+
+def _cmd_unpack(args: argparse.Namespace) -> int:
+    from .tiling import extract_pack
+
+    count = extract_pack(args.pack, args.output)
+    print(f"extracted {count} tiles to {args.output}")
+    return 0
+
+
+def _cmd_index(args: argparse.Namespace) -> int:
+    from .search import (
+        CACHE_MAGIC,
+        CacheOptions,
+        ShardOptions,
+        TagIndexBuilder,
+        autocomplete_from_index,
+        build_intersection_cache,
+        mine_combinations,
+        write_shards,
+    )
+
+    if not (args.output or args.shards_output):
+        raise SystemExit("index: give --output and/or --shards-output")
+
+    builder = TagIndexBuilder()
+    with open(args.records, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                builder.add(record["id"], record["tags"])
+    index = builder.build()
+    if args.output:
+        size = index.write(args.output)
+        print(f"wrote {len(index)} tags, {size} bytes to {args.output}")
+    if args.shards_output:
+        # Frequent pairs/triples stand in for a query log when reporting fan-out.
+        sample = [combo for combo, _ in mine_combinations(index, CacheOptions(args.cache_top))]
+        report = write_shards(index, args.shards_output, ShardOptions(args.shard_bytes, args.partition), sample)
+        print(f"wrote {report.shards} {args.partition} shards, {report.total_bytes} bytes "
+              f"(largest {report.largest_bytes}) to {args.shards_output}; "
+              f"a typical query touches {report.mean_shards_per_query:.2f} shards")
+    if args.autocomplete_output:
+        data = autocomplete_from_index(index)
+        args.autocomplete_output.write_bytes(data)
+        print(f"wrote autocomplete trie, {len(data)} bytes to {args.autocomplete_output}")
+    if args.cache_output:
+        cache = build_intersection_cache(index, CacheOptions(args.cache_top, args.cache_budget))
+        size = len(data := cache.to_bytes(CACHE_MAGIC))
+        args.cache_output.write_bytes(data)
+        print(f"wrote {len(cache)} cached intersections, {size} bytes to {args.cache_output}")
+    return 0
+
+
+def _cmd_scan(args: argparse.Namespace) -> int:
+    from .discovery import MetadataCache, scan
+
+    cache = MetadataCache(args.cache) if args.cache else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    count = 0
+    try:
+        for record in scan(args.roots, args.jobs, cache=cache):
+            out.write(json.dumps(dataclasses.asdict(record), ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+    print(f"found {count} images", file=sys.stderr)
+    if cache is not None:
+        print(f"metadata cache: {cache.hits} hits, {cache.misses} probed, {cache.evicted} evicted", file=sys.stderr)
+    return 0
+
+
+def _build_options(args: argparse.Namespace) -> BuildOptions:
+    from .build import BuildOptions
+
+    options = BuildOptions(args.tile_size, args.overlap, args.format, args.quality, args.resample, args.jobs,
+                           variant_widths=args.variants, collapse_duplicates=args.collapse_duplicates,
+                           layouts=args.layouts, iiif_base=args.iiif_base, fsync=args.fsync,
+                           adaptive_quality=args.adaptive_quality, prune_grace=args.prune_grace * 3600)
+    try:
+        # Fail here rather than in the tiles stage, after the scan has run.
+        options.tile_options()
+    except ValueError as exc:
+        args.parser.error(str(exc))
+    return options
+
+
+def _cmd_build(args: argparse.Namespace) -> int:
+    from .build import library_pipeline
+
+    options = _build_options(args)
+    pipeline = library_pipeline(args.library, args.output, options)
+    if unknown := set(args.rerun) - pipeline.stages.keys():
+        args.parser.error(f"--rerun: unknown stage {', '.join(sorted(unknown))} "
+                          f"(choose from {', '.join(pipeline.order)})")
+    report = pipeline.run(force=pipeline.stages if args.force else args.rerun)
+    for name in pipeline.order:
+        state = "ran" if name in report.ran else "up to date"
+        print(f"{name:>8}: {state} ({report.seconds.get(name, 0.0):.2f}s)")
+    return 0
+
+
+def _cmd_watch(args: argparse.Namespace) -> int:
+    from .daemon import LibraryDaemon
+
+    options = _build_options(args)
+    daemon = LibraryDaemon(args.library, args.output, options, args.quiet, args.max_delay, args.poll)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_duplicates(args: argparse.Namespace) -> int:
+    from .build import RECORDS_NAME, load_records
+    from .search import duplicate_clusters
+
+    rows = {row["id"]: row for row in load_records(args.output / "search" / RECORDS_NAME).values()}
+    if not rows:
+        raise SystemExit(f"duplicates: no search records under {args.output}; run build first")
+    hashes = {image_id: int(row[args.hash], 16) for image_id, row in rows.items() if row.get(args.hash)}
+    clusters = duplicate_clusters(hashes, args.threshold)
+    if args.json:
+        for cluster in clusters:
+            print(json.dumps([rows[image_id]["path"] for image_id in cluster], ensure_ascii=False))
+    else:
+        for cluster in clusters:
+            print(f"{len(cluster)} images:")
+            for image_id in cluster:
+                row = rows[image_id]
+                print(f"  {row['width']}x{row['height']}  {row['path']}")
+    redundant = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"{len(clusters)} clusters within {args.threshold} bits of {args.hash}; "
+          f"{redundant} of {len(hashes)} hashed images are redundant", file=sys.stderr)
+    return 0
+
+
+def _tiling_arguments() -> argparse.ArgumentParser:
+    """Options shared by every command that tiles."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=0)
+    parser.add_argument("--format", choices=("jpeg", "png", "webp"), default="jpeg")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--adaptive-quality", type=_quality_range, metavar="LOW,HIGH",
+                        help="pick each tile's quality in this range by its detail, e.g. 50,90; "
+                             "--quality is the reference for the reported savings")
+    parser.add_argument("--resample", choices=("box", "lanczos"), default="box",
+                        help="filter used to build each level from the one above (default: box)")
+    parser.add_argument("--layouts", type=_names, default=(), metavar="NAME,...",
+                        help="write these viewer layouts from one pass: dzi, iiif, xyz, tms "
+                             "(default: the plain <level>/<col>_<row> directory)")
+    parser.add_argument("--iiif-base", default="", metavar="URL",
+                        help="URL the output directory is served at, for IIIF info.json ids")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="tile encoder processes; 0 means one per CPU (default: 1)")
+    parser.add_argument("--fsync", choices=("off", "batch", "end"), default="off",
+                        help="sync tiles to disk every few hundred files, or once per image at the end "
+                             "(default: off, leave it to the OS)")
+    return parser
+
+
+def _library_arguments() -> argparse.ArgumentParser:
+    """Options shared by ``build`` and ``watch``."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("library", type=Path)
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument("--variants", type=_widths, default=(320, 640, 1280, 2048), metavar="W,W,...",
+                        help="gallery variant widths; empty for none (default: 320,640,1280,2048)")
+    parser.add_argument("--collapse-duplicates", type=int, metavar="BITS",
+                        help="index only the largest image of each cluster within BITS of pHash distance")
+    parser.add_argument("--prune-grace", type=float, default=24.0, metavar="HOURS",
+                        help="keep search shards the index no longer uses this long, for clients "
+                             "holding the previous index.json (default: 24)")
+    return parser
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="lfp-preprocess", description="Image tiling and tag-search precompute for LeftEyePro.com.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="walk the library and print one JSON record per image")
+    scan.add_argument("roots", nargs="+", type=Path)
+    scan.add_argument("-o", "--output", type=Path, help="JSON Lines file (default: stdout)")
+    scan.add_argument("-j", "--jobs", type=int, default=16, help="I/O threads (default: 16)")
+    scan.add_argument("--cache", type=Path,
+                      help="SQLite metadata cache; unchanged files are not opened again")
+    scan.set_defaults(func=_cmd_scan)
+
+    tiling = _tiling_arguments()
+    library = _library_arguments()
+
+    tile = commands.add_parser("tile", parents=[tiling], help="cut originals into tile pyramids")
+    tile.add_argument("sources", nargs="+", type=Path)
+    tile.add_argument("-o", "--output", type=Path, required=True)
+    tile.add_argument("--variants", type=_widths, default=(), metavar="W,W,...",
+                      help="also write whole-image variants of these widths, e.g. 320,640,1280,2048")
+    tile.add_argument("--force", action="store_true",
+                      help="re-tile every source even if the build manifest says it is current")
+    tile.add_argument("--container", choices=("dir", "pack", "tiff"), default="dir",
+                      help="one file per tile, one .lfpack archive per image, or one pyramidal "
+                           "BigTIFF per image (default: dir)")
+    tile.add_argument("--dedup", action="store_true",
+                      help="store byte-identical tiles once and alias the rest (symlink or pack index)")
+    tile.add_argument("--skip-uniform", action="store_true",
+                      help="reuse the encoding of single-colour tiles instead of re-encoding them")
+    tile.add_argument("--write-queue", type=int, default=256, metavar="N",
+                      help="write tiles on a background thread, at most N calls behind; 0 writes "
+                           "inline (default: 256)")
+    tile.set_defaults(func=_cmd_tile, parser=tile)
+
+    build = commands.add_parser("build", parents=[tiling, library],
+                                help="scan, index and tile the library, re-running only stale stages")
+    build.add_argument("--rerun", action="append", default=[], metavar="STAGE",
+                       help="run this stage and everything downstream of it even if up to date (repeatable)")
+    build.add_argument("--force", action="store_true", help="run every stage")
+    build.set_defaults(func=_cmd_build, parser=build)
+
+    watch = commands.add_parser("watch", parents=[tiling, library],
+                                help="build once, then keep the output current as photos arrive")
+    watch.add_argument("--quiet", type=float, default=2.0,
+                       help="seconds without changes before a batch is processed (default: 2)")
+    watch.add_argument("--max-delay", type=float, default=30.0,
+                       help="process a batch after this long even if changes keep coming (default: 30)")
+    watch.add_argument("--poll", type=float, metavar="SECONDS",
+                       help="poll at this interval instead of using inotify")
+    watch.set_defaults(func=_cmd_watch, parser=watch)
+
+    duplicates = commands.add_parser("duplicates", help="report clusters of near-duplicate images in a build")
+    duplicates.add_argument("output", type=Path, help="build output directory")
+    duplicates.add_argument("--threshold", type=int, default=6,
+                            help="maximum Hamming distance in bits (default: 6)")
+    duplicates.add_argument("--hash", choices=("phash", "dhash"), default="phash")
+    duplicates.add_argument("--json", action="store_true", help="one JSON array of paths per cluster")
+    duplicates.set_defaults(func=_cmd_duplicates)
+
+    unpack = commands.add_parser("unpack", help="extract an .lfpack archive into a tile directory")
+    unpack.add_argument("pack", type=Path)
+    unpack.add_argument("-o", "--output", type=Path, required=True)
+    unpack.set_defaults(func=_cmd_unpack)
+
+    index = commands.add_parser("index", help="build the binary tag-search index")
+    index.add_argument("records", type=Path, help='JSON Lines of {"id": int, "tags": [str, ...]}')
+    index.add_argument("-o", "--output", type=Path, help="monolithic index file")
+    index.add_argument("--shards-output", type=Path,
+                       help="directory for content-addressed shards plus an index.json root manifest")
+    index.add_argument("--shard-bytes", type=int, default=32 * 1024,
+                       help="target shard size (default: 32768)")
+    index.add_argument("--partition", choices=("prefix", "hash"), default="prefix",
+                       help="group tags into shards by name order or by hash (default: prefix)")
+    index.add_argument("--autocomplete-output", type=Path,
+                       help="also write the top-k tag-name completion trie")
+    index.add_argument("--cache-output", type=Path,
+                       help="also precompute results for the most frequent tag pairs/triples")
+    index.add_argument("--cache-top", type=int, default=1000,
+                       help="combinations considered for the cache (default: 1000)")
+    index.add_argument("--cache-budget", type=int, default=256 * 1024,
+                       help="byte budget of the intersection cache (default: 262144)")
+    index.set_defaults(func=_cmd_index)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    return args.func(args)
@@ -0,0 +1,256 @@
+"""Long-running mode: keep the build output current as the library changes.
+
+The daemon starts with one ordinary :func:`~.build.library_pipeline` run,
+then loads the records into memory and waits on a :mod:`.watch` watcher.
+Each debounced batch of changed paths is applied incrementally:
+
+* only the changed files are probed (through the metadata cache) and tiled;
+* their IDs and postings are patched in the in-memory tag index;
+* the added and removed postings go out as one delta segment per touched
+  shard (see :func:`~.search.apply_delta`), so only those deltas and the
+  root manifest are new files; the autocomplete trie, intersection cache
+  and placeholder-carrying search records are rewritten from memory.
+
+An original that cannot be read or tiled (say, still being copied in) is
+logged and retried with the next batch; an error applying a batch is
+logged, its postings stay pending for the next one, and the daemon keeps
+watching.
+
+Shards whose deltas have grown past the threshold are compacted on a
+background thread, and files no manifest has referenced for
+``prune_grace`` (a day by default) are pruned.
+
+Near-duplicates collapsed by the last full build stay collapsed; an
+image added in watch mode is only matched against the library at the next
+full build. When the kept copy of a cluster is deleted, its duplicates
+become searchable again.
+
+State is the records of the library, the postings and one watch per
+directory; per-batch data is dropped after each batch, so memory stays
+flat over days of uptime.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .build import (
+    RECORDS_NAME,
+    BuildOptions,
+    library_pipeline,
+    load_records,
+    record_row,
+    search_rows,
+    tile_sources,
+    write_lookup_tables,
+    write_records,
+    write_search_records,
+)
+from .discovery import IMAGE_SUFFIXES, MetadataCache, probe
+from .search import ShardOptions, TagIndex, apply_delta, compact_shards, prune_shards
+from .watch import Debouncer, open_watcher
+
+if TYPE_CHECKING:
+    from .tiling import TileEncoder
+
+log = logging.getLogger(__name__)
+
+
+class LibraryDaemon:
+    def __init__(
+        self,
+        library: str | os.PathLike[str],
+        output: str | os.PathLike[str],
+        options: BuildOptions = BuildOptions(),
+        quiet: float = 2.0,
+        max_delay: float = 30.0,
+        poll_interval: float | None = None,
+    ):
+        self.library = Path(library)
+        self.output = Path(output)
+        self.options = options
+        self.debouncer = Debouncer(quiet, max_delay)
+        self.poll_interval = poll_interval
+        self.rows: dict[str, dict[str, Any]] = {}
+        self.postings: dict[str, set[int]] = {}
+        self.duplicate_of: dict[int, int] = {}
+        """Collapsed image ID -> the ID kept in its place; left out of the postings."""
+        self._next_id = 0
+        self._encoder: TileEncoder | None = None
+        self._added: dict[str, set[int]] = {}
+        self._removed: dict[str, set[int]] = {}
+        self._manifest_lock = threading.Lock()
+        self._compactor = ThreadPoolExecutor(1, thread_name_prefix="compact")
+        self._compaction: Future[None] | None = None
+        self._failed: set[str] = set()
+        """Originals whose tiling failed; retried with the next batch."""
+
+    def _load(self) -> None:
+        self.rows = load_records(self.output / RECORDS_NAME)
+        self.duplicate_of = {row["id"]: row["duplicate_of"]
+                             for row in load_records(self.output / "search" / RECORDS_NAME).values()
+                             if row.get("duplicate_of") is not None}
+        self.postings = {}
+        for row in self.rows.values():
+            if row["id"] in self.duplicate_of:
+                continue
+            for tag in row["tags"]:
+                self.postings.setdefault(tag, set()).add(row["id"])
+        self._next_id = max((row["id"] for row in self.rows.values()), default=-1) + 1
+
+    def resync(self) -> None:
+        """Full (but still cached and manifest-driven) pipeline run."""
+        with self._manifest_lock:
+            library_pipeline(self.library, self.output, self.options).run()
+        self._load()
+
+    def _drop(self, path: str) -> None:
+        row = self.rows.pop(path)
+        if self.duplicate_of.pop(row["id"], None) is not None:
+            return
+        for tag in row["tags"]:
+            ids = self.postings[tag]
+            ids.discard(row["id"])
+            if not ids:
+                del self.postings[tag]
+            if row["id"] in self._added.get(tag, ()):
+                self._added[tag].discard(row["id"])
+            else:
+                self._removed.setdefault(tag, set()).add(row["id"])
+        orphans = {image_id for image_id, keep in self.duplicate_of.items() if keep == row["id"]}
+        if orphans:
+            for image_id in orphans:
+                del self.duplicate_of[image_id]
+            for other in [other for other in self.rows.values() if other["id"] in orphans]:
+                self._add(other)
+
+    def _add(self, row: dict[str, Any]) -> None:
+        self.rows[row["path"]] = row
+        for tag in row["tags"]:
+            self.postings.setdefault(tag, set()).add(row["id"])
+            if row["id"] in self._removed.get(tag, ()):
+                self._removed[tag].discard(row["id"])
+            else:
+                self._added.setdefault(tag, set()).add(row["id"])
+
+    def apply(self, paths: Iterable[str]) -> tuple[int, int]:
+        """Patch the outputs for ``paths``; returns ``(updated, removed)``."""
+        changed: list[Path] = []
+        removed = 0
+        paths = set(paths) | self._failed
+        self._failed = set()
+        with MetadataCache(self.output / ".lfp-metadata.db") as cache:
+            for path in sorted(set(paths)):
+                if not os.path.exists(path):
+                    if path in self.rows:
+                        self._drop(path)
+                        removed += 1
+                    elif os.path.splitext(path)[1].lower() not in IMAGE_SUFFIXES:
+                        # Probably a directory that was deleted or moved away,
+                        # which takes its files along without per-file events.
+                        prefix = os.path.join(path, "")
+                        for stale in [p for p in self.rows if p.startswith(prefix)]:
+                            self._drop(stale)
+                            removed += 1
+                    continue
+                if os.path.splitext(path)[1].lower() not in IMAGE_SUFFIXES:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    record = cache.lookup([(path, stat)]).get(path)
+                    if record is None:
+                        record = probe(path, stat)
+                        cache.store([record])
+                except Exception as exc:  # e.g. a JPEG still being copied in
+                    log.warning("cannot read %s, will retry with the next batch: %r", path, exc)
+                    self._failed.add(path)
+                    continue
+                old = self.rows.get(path)
+                if old is not None:
+                    image_id = old["id"]
+                    self._drop(path)
+                else:
+                    image_id, self._next_id = self._next_id, self._next_id + 1
+                self._add(record_row(record, image_id))
+                changed.append(Path(path))
+
+        if not (changed or removed or self._added or self._removed):
+            return 0, 0
+        write_records(self.output / RECORDS_NAME, sorted(self.rows.values(), key=lambda row: row["path"]))
+        search = self.output / "search"
+        # Pending postings are only dropped once they are on disk; after a
+        # failure they go out with the next batch.
+        apply_delta(search, {t: sorted(ids) for t, ids in self._added.items()},
+                    {t: sorted(ids) for t, ids in self._removed.items()}, self._manifest_lock)
+        self._added, self._removed = {}, {}
+        write_lookup_tables(TagIndex({tag: sorted(ids) for tag, ids in self.postings.items()}),
+                            self.output, self.options)
+        if self._compaction is None or self._compaction.done():
+            self._compaction = self._compactor.submit(self._compact)
+        # tile_library also removes the tiles of sources that have vanished.
+        try:
+            report = tile_sources(changed, self.library, self.output, self.options, self._encoder)
+        except Exception:
+            self._failed.update(map(str, changed))
+            raise
+        for path in report.failed:
+            # No manifest entry was recorded, so the image is re-tiled once it
+            # is retried (or by the next full run).
+            log.warning("could not tile %s; will retry with the next batch", path)
+            self._failed.add(path)
+        rows = search_rows(sorted(self.rows.values(), key=lambda row: row["path"]), self.output)
+        write_search_records(rows, self.output, self.duplicate_of)
+        return len(changed), removed
+
+    def _compact(self) -> None:
+        search = self.output / "search"
+        options = ShardOptions(self.options.shard_bytes, self.options.partition)
+        try:
+            if compacted := compact_shards(search, options, self._manifest_lock):
+                log.info("compacted %d shards", compacted)
+                with self._manifest_lock:
+                    prune_shards(search, self.options.prune_grace)
+        except Exception:
+            log.exception("shard compaction failed")
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        """Watch until ``stop`` is set (or forever)."""
+        from .tiling import ParallelEncoder, SerialEncoder
+
+        stop = stop or threading.Event()
+        watcher = open_watcher([self.library], self.poll_interval)
+        jobs = self.options.jobs
+        self._encoder = SerialEncoder() if jobs == 1 else ParallelEncoder(jobs or None)
+        try:
+            self.resync()
+            log.info("watching %s (%d images)", self.library, len(self.rows))
+            while not stop.is_set():
+                self.debouncer.add(watcher.poll(timeout=0.5))
+                if not self.debouncer.ready():
+                    continue
+                batch = self.debouncer.take()
+                started = time.perf_counter()
+                if batch is None:
+                    self.resync()
+                    log.info("resynchronised in %.2fs", time.perf_counter() - started)
+                    continue
+                try:
+                    updated, removed = self.apply(batch)
+                except Exception:
+                    log.exception("failed to apply %d changed paths", len(batch))
+                    continue
+                if updated or removed:
+                    log.info("updated %d, removed %d images in %.2fs",
+                             updated, removed, time.perf_counter() - started)
+        finally:
+            watcher.close()
+            self._compactor.shutdown()
+            self._encoder.close()
+            self._encoder = None
@@ -0,0 +1,15 @@
+"""Finding originals in the photo library and reading their metadata."""
+
+from .cache import MetadataCache
+from .metadata import HeaderMetadata, ImageRecord, probe, read_header
+from .scan import IMAGE_SUFFIXES, scan
+
+__all__ = [
+    "IMAGE_SUFFIXES",
+    "HeaderMetadata",
+    "ImageRecord",
+    "MetadataCache",
+    "probe",
+    "read_header",
+    "scan",
+]
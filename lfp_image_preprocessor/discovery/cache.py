@@ -0,0 +1,122 @@
+"""On-disk cache of probed metadata, keyed on ``(path, size, mtime_ns)``.
+
+A file whose size and modification time match its cached row is not opened
+at all; its record comes straight from the cache. The cache is a single
+SQLite database, so it survives crashes mid-write and can be inspected with
+the ``sqlite3`` shell.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+from .metadata import ImageRecord
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+_BATCH = 500
+"""Paths per ``IN (...)`` lookup; below SQLite's historical 999-parameter limit."""
+
+_SEPARATOR = "\x1f"
+"""Joins keywords in one column; ASCII unit separator never occurs in tags."""
+_COLUMNS = "path, size, mtime_ns, format, width, height, keywords, caption, date"
+
+
+class MetadataCache:
+    """Persistent ``path -> ImageRecord`` map, valid while size and mtime match."""
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            if version:
+                log.info("metadata cache %s has schema %d, rebuilding", self.path, version)
+            self._db.execute("DROP TABLE IF EXISTS records")
+            self._db.execute(
+                "CREATE TABLE records (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+                " format TEXT, width INTEGER, height INTEGER, keywords TEXT, caption TEXT, date TEXT)"
+                " WITHOUT ROWID"
+            )
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def lookup(self, files: Iterable[tuple[str, os.stat_result]]) -> dict[str, ImageRecord]:
+        """Cached records for those ``(path, stat)`` pairs that are unchanged."""
+        wanted = {path: (stat.st_size, stat.st_mtime_ns) for path, stat in files if _storable(path)}
+        paths = list(wanted)
+        found: dict[str, ImageRecord] = {}
+        for start in range(0, len(paths), _BATCH):
+            chunk = paths[start:start + _BATCH]
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM records WHERE path IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for path, size, mtime_ns, fmt, width, height, keywords, caption, date in rows:
+                if wanted[path] == (size, mtime_ns):
+                    found[path] = ImageRecord(
+                        path, size, mtime_ns, fmt, width, height,
+                        tuple(keywords.split(_SEPARATOR)) if keywords else (), caption, date,
+                    )
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def store(self, records: Iterable[ImageRecord]) -> None:
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO records ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (r.path, r.size, r.mtime_ns, r.format, r.width, r.height,
+                 _SEPARATOR.join(r.keywords), r.caption, r.date)
+                for r in records
+                if _storable(r.path)
+            ),
+        )
+        self._db.commit()
+
+    def evict(self, roots: Iterable[str | os.PathLike[str]], present: set[str]) -> int:
+        """Drop rows under ``roots`` whose path is not in ``present``."""
+        stale: list[tuple[str]] = []
+        for root in roots:
+            prefix = os.path.join(os.fspath(root), "")
+            rows = self._db.execute(
+                "SELECT path FROM records WHERE path >= ? AND path < ?", (prefix, prefix + "\U0010ffff")
+            )
+            stale.extend((path,) for (path,) in rows if path not in present)
+        self._db.executemany("DELETE FROM records WHERE path = ?", stale)
+        self._db.commit()
+        self.evicted += len(stale)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> MetadataCache:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _storable(path: str) -> bool:
+    # Undecodable file names come back from os.scandir as lone surrogates,
+    # which SQLite cannot store; such files are simply never cached.
+    try:
+        path.encode()
+    except UnicodeEncodeError:
+        return False
+    return True
+
@@ -0,0 +1,60 @@
+"""IPTC-IIM records from Photoshop image resource blocks (JPEG APP13)."""
+
+from __future__ import annotations
+
+import struct
+
+PHOTOSHOP_HEADER = b"Photoshop 3.0\x00"
+IPTC_RESOURCE = 0x0404
+
+KEYWORDS = (2, 25)
+DATE_CREATED = (2, 55)
+TIME_CREATED = (2, 60)
+CAPTION = (2, 120)
+_CODED_CHARACTER_SET = (1, 90)
+_UTF8 = b"\x1b%G"
+
+
+def photoshop_iptc(resources: bytes) -> bytes | None:
+    """The IPTC block from a run of ``8BIM`` image resources, if present."""
+    pos = 0
+    while pos + 12 <= len(resources) and resources[pos:pos + 4] == b"8BIM":
+        (resource,) = struct.unpack_from(">H", resources, pos + 4)
+        name_length = resources[pos + 6]
+        pos += 6 + (name_length + 2) // 2 * 2  # Pascal name padded to even
+        if pos + 4 > len(resources):
+            return None
+        (size,) = struct.unpack_from(">I", resources, pos)
+        pos += 4
+        if resource == IPTC_RESOURCE:
+            return resources[pos:pos + size]
+        pos += size + (size & 1)
+    return None
+
+
+def iptc_datasets(block: bytes) -> dict[tuple[int, int], list[str]]:
+    """Decode ``{(record, dataset): [values]}`` from an IIM block."""
+    raw: dict[tuple[int, int], list[bytes]] = {}
+    pos = 0
+    while pos + 5 <= len(block) and block[pos] == 0x1C:
+        record, dataset = block[pos + 1], block[pos + 2]
+        (size,) = struct.unpack_from(">H", block, pos + 3)
+        pos += 5
+        if size & 0x8000:  # extended dataset: the length is in the next bytes
+            width = size & 0x7FFF
+            size = int.from_bytes(block[pos:pos + width], "big")
+            pos += width
+        raw.setdefault((record, dataset), []).append(block[pos:pos + size])
+        pos += size
+    utf8 = raw.get(_CODED_CHARACTER_SET, [b""])[0] == _UTF8
+    return {key: [_decode(value, utf8) for value in values] for key, values in raw.items()}
+
+
+def _decode(value: bytes, utf8: bool) -> str:
+    if utf8:
+        return value.decode("utf-8", "replace").strip()
+    try:
+        # Many writers emit UTF-8 without declaring it.
+        return value.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return value.decode("latin-1").strip()
@@ -0,0 +1,255 @@
+"""Header-only probing of image files for dimensions, keywords, caption and date.
+
+Only the bytes in front of the pixel data are read, and reading stops as
+soon as the metadata is consumed:
+
+JPEG
+    Marker segments up to the first start-of-frame: APP1 (EXIF, XMP) and
+    APP13 (IPTC); every other segment is skipped with a seek.
+PNG
+    Chunks up to the first ``IDAT``: ``IHDR``, ``eXIf`` and the text chunks
+    (XMP travels in an ``iTXt`` chunk).
+TIFF
+    IFD0 and the EXIF IFD; only the entries and the values of the tags
+    needed, never the strips.
+PNM
+    The text header.
+
+When several blocks carry the same field, keywords are merged (XMP, then
+IPTC, then EXIF ``XPKeywords``), the caption comes from XMP, IPTC or EXIF
+in that order, and the date prefers EXIF ``DateTimeOriginal``.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from .._pnm import read_pnm_header
+from . import iptc, tiff
+from .xmp import PNG_XMP_KEYWORD, XMP_HEADER, xmp_caption, xmp_date, xmp_keywords
+
+EXIF_HEADER = b"Exif\x00\x00"
+
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_TIFF_TAGS = frozenset({
+    tiff.IMAGE_WIDTH, tiff.IMAGE_LENGTH, tiff.IMAGE_DESCRIPTION, tiff.DATE_TIME,
+    tiff.XMP, tiff.IPTC, tiff.DATE_TIME_ORIGINAL, tiff.XP_KEYWORDS,
+})
+_PNG_TEXT_CHUNKS = frozenset({b"tEXt", b"zTXt", b"iTXt", b"eXIf"})
+_MAX_PNG_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class ImageRecord:
+    """What discovery knows about one original."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    format: str | None = None
+    width: int | None = None
+    height: int | None = None
+    keywords: tuple[str, ...] = field(default=())
+    caption: str | None = None
+    date: str | None = None
+    """Capture date as ISO 8601 (``YYYY-MM-DD`` or ``YYYY-MM-DDTHH:MM:SS``)."""
+
+
+@dataclass
+class HeaderMetadata:
+    """Fields collected from each metadata block of one file, before merging."""
+
+    format: str | None = None
+    width: int | None = None
+    height: int | None = None
+    keywords: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    captions: dict[str, str] = field(default_factory=dict)
+    dates: dict[str, str] = field(default_factory=dict)
+
+    def add_xmp(self, packet: bytes) -> None:
+        self.keywords["xmp"] = xmp_keywords(packet)
+        if caption := xmp_caption(packet):
+            self.captions["xmp"] = caption
+        if date := xmp_date(packet):
+            self.dates["xmp"] = date
+
+    def add_iptc(self, block: bytes) -> None:
+        datasets = iptc.iptc_datasets(block)
+        self.keywords["iptc"] = tuple(k for k in datasets.get(iptc.KEYWORDS, ()) if k)
+        if caption := next(iter(datasets.get(iptc.CAPTION, ())), ""):
+            self.captions["iptc"] = caption
+        if date := _iptc_date(datasets):
+            self.dates["iptc"] = date
+
+    def add_tiff(self, ifd0: tiff.TiffDirectory, exif: tiff.TiffDirectory | None) -> None:
+        if caption := ifd0.get_text(tiff.IMAGE_DESCRIPTION):
+            self.captions["exif"] = caption
+        if (raw := ifd0.get_bytes(tiff.XP_KEYWORDS)) is not None:
+            text = raw.decode("utf-16-le", "replace").split("\x00", 1)[0]
+            self.keywords["exif"] = tuple(k.strip() for k in text.split(";") if k.strip())
+        if exif and (date := _exif_date(exif.get_text(tiff.DATE_TIME_ORIGINAL))):
+            self.dates["exif"] = date
+        if date := _exif_date(ifd0.get_text(tiff.DATE_TIME)):
+            self.dates["modified"] = date
+        if (packet := ifd0.get_bytes(tiff.XMP)) is not None:
+            self.add_xmp(packet)
+        if (block := ifd0.get_bytes(tiff.IPTC)) is not None:
+            self.add_iptc(block)
+
+    def add_exif(self, payload: bytes) -> None:
+        self.add_tiff(*tiff.read_tiff_tags(io.BytesIO(payload), _TIFF_TAGS))
+
+    def merged_keywords(self) -> tuple[str, ...]:
+        seen: dict[str, None] = {}
+        for source in ("xmp", "iptc", "exif"):
+            for keyword in self.keywords.get(source, ()):
+                seen.setdefault(keyword, None)
+        return tuple(seen)
+
+    def caption(self) -> str | None:
+        return _first(self.captions, ("xmp", "iptc", "exif"))
+
+    def date(self) -> str | None:
+        return _first(self.dates, ("exif", "xmp", "iptc", "modified"))
+
+
+def probe(path: str | os.PathLike[str], stat: os.stat_result | None = None) -> ImageRecord:
+    """Read just enough of ``path`` to fill an :class:`ImageRecord`."""
+    path = os.fspath(path)
+    stat = stat or os.stat(path)
+    with open(path, "rb") as fh:
+        found = read_header(fh)
+    return ImageRecord(
+        path, stat.st_size, stat.st_mtime_ns, found.format, found.width, found.height,
+        found.merged_keywords(), found.caption(), found.date(),
+    )
+
+
+def read_header(fh: BinaryIO) -> HeaderMetadata:
+    """Sniff the format of ``fh`` and collect its header metadata."""
+    found = HeaderMetadata()
+    head = fh.read(4)
+    if head[:2] == b"\xff\xd8":
+        fh.seek(2)
+        _read_jpeg(fh, found)
+    elif head == b"\x89PNG" and fh.read(4) == b"\r\n\x1a\n":
+        _read_png(fh, found)
+    elif head in (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"):
+        found.format = "tiff"
+        ifd0, exif = tiff.read_tiff_tags(fh, _TIFF_TAGS)
+        found.width = ifd0.get_int(tiff.IMAGE_WIDTH)
+        found.height = ifd0.get_int(tiff.IMAGE_LENGTH)
+        found.add_tiff(ifd0, exif)
+    elif head[:2] in (b"P5", b"P6"):
+        fh.seek(0)
+        _, found.width, found.height, _ = read_pnm_header(fh)
+        found.format = "pnm"
+    return found
+
+
+def _read_jpeg(fh: BinaryIO, found: HeaderMetadata) -> None:
+    found.format = "jpeg"
+    while True:
+        byte = fh.read(1)
+        if not byte:
+            return
+        if byte != b"\xff":
+            continue
+        marker = fh.read(1)
+        while marker == b"\xff":
+            marker = fh.read(1)
+        if not marker or marker[0] in (0xD9, 0xDA):
+            return
+        if 0xD0 <= marker[0] <= 0xD7 or marker[0] == 0x01:
+            continue
+        (length,) = struct.unpack(">H", fh.read(2))
+        if marker[0] in _SOF_MARKERS:
+            _, found.height, found.width = struct.unpack(">BHH", fh.read(5))
+            return
+        if marker[0] not in (0xE1, 0xED):
+            fh.seek(length - 2, os.SEEK_CUR)
+            continue
+        payload = fh.read(length - 2)
+        if payload.startswith(XMP_HEADER):
+            found.add_xmp(payload[len(XMP_HEADER):])
+        elif payload.startswith(EXIF_HEADER):
+            found.add_exif(payload[len(EXIF_HEADER):])
+        elif payload.startswith(iptc.PHOTOSHOP_HEADER):
+            if (block := iptc.photoshop_iptc(payload[len(iptc.PHOTOSHOP_HEADER):])) is not None:
+                found.add_iptc(block)
+
+
+def _read_png(fh: BinaryIO, found: HeaderMetadata) -> None:
+    found.format = "png"
+    while True:
+        header = fh.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack(">I4s", header)
+        if kind in (b"IDAT", b"IEND"):
+            return
+        if kind == b"IHDR":
+            found.width, found.height = struct.unpack(">II", fh.read(8))
+            fh.seek(length - 8 + 4, os.SEEK_CUR)
+        elif kind in _PNG_TEXT_CHUNKS and length <= _MAX_PNG_CHUNK:
+            _png_text(kind, fh.read(length), found)
+            fh.seek(4, os.SEEK_CUR)
+        else:
+            fh.seek(length + 4, os.SEEK_CUR)
+
+
+def _png_text(kind: bytes, data: bytes, found: HeaderMetadata) -> None:
+    if kind == b"eXIf":
+        found.add_exif(data)
+        return
+    keyword, _, rest = data.partition(b"\x00")
+    if kind == b"tEXt":
+        text = rest
+    elif kind == b"zTXt":
+        text = _inflate(rest[1:])
+    else:  # iTXt: compression flag, method, language\0, translated keyword\0, text
+        compressed = rest[:1] == b"\x01"
+        text = rest[2:].split(b"\x00", 2)[-1]
+        if compressed:
+            text = _inflate(text)
+    if keyword == PNG_XMP_KEYWORD:
+        found.add_xmp(text)
+        return
+    decoded = text.decode("utf-8" if kind == b"iTXt" else "latin-1", "replace").strip()
+    if keyword == b"Description" and decoded:
+        found.captions.setdefault("exif", decoded)
+    elif keyword == b"Creation Time" and decoded:
+        found.dates.setdefault("modified", decoded)
+
+
+def _inflate(data: bytes) -> bytes:
+    return zlib.decompressobj().decompress(data, _MAX_PNG_CHUNK)
+
+
+def _exif_date(value: str | None) -> str | None:
+    """``YYYY:MM:DD HH:MM:SS`` to ISO 8601; blank placeholders become ``None``."""
+    if not value or not value[:4].isdigit() or value.startswith("0000"):
+        return None
+    date, _, time = value.partition(" ")
+    iso = date.replace(":", "-")
+    return f"{iso}T{time}" if time else iso
+
+
+def _iptc_date(datasets: dict[tuple[int, int], list[str]]) -> str | None:
+    date = next(iter(datasets.get(iptc.DATE_CREATED, ())), "")
+    if len(date) != 8 or not date.isdigit() or date == "00000000":
+        return None
+    iso = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+    time = next(iter(datasets.get(iptc.TIME_CREATED, ())), "")
+    if len(time) >= 6 and time[:6].isdigit():
+        iso += f"T{time[:2]}:{time[2:4]}:{time[4:6]}"
+    return iso
+
+
+def _first(values: dict[str, str], order: tuple[str, ...]) -> str | None:
+    return next((values[source] for source in order if source in values), None)
@@ -0,0 +1,116 @@
+"""Concurrent walk of the photo library.
+
+Directory listings and header probes both run on one thread pool, so a slow
+NFS ``readdir`` or ``open`` only stalls one worker. Records are yielded as
+soon as their probe finishes, in no particular order, and the number of
+probes in flight is bounded so a huge directory cannot queue up unbounded
+work.
+
+With a :class:`~.cache.MetadataCache`, each directory's files are looked up
+in one batch as soon as it is listed and only the misses are probed; once the
+walk completes, cached rows for files that have vanished are evicted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from .cache import MetadataCache
+from .metadata import ImageRecord, probe
+
+log = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png", ".tif", ".tiff", ".pnm", ".ppm", ".pgm"})
+_STORE_BATCH = 1000
+
+
+@dataclass
+class _Listing:
+    directories: list[str]
+    files: list[tuple[str, os.stat_result]]
+    complete: bool = True
+
+
+def _list(directory: str, suffixes: frozenset[str]) -> _Listing:
+    listing = _Listing([], [])
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    listing.directories.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in suffixes:
+                    listing.files.append((entry.path, entry.stat()))
+    except OSError as exc:
+        log.warning("cannot list %s: %s", directory, exc)
+        listing.complete = False
+    return listing
+
+
+def _probe(path: str, stat: os.stat_result) -> ImageRecord | None:
+    try:
+        return probe(path, stat)
+    except (OSError, ValueError, EOFError) as exc:
+        log.warning("cannot read %s: %s", path, exc)
+        return None
+    except Exception as exc:  # a malformed header must not stop the scan
+        log.warning("cannot parse %s: %r", path, exc)
+        return None
+
+
+def scan(
+    roots: Iterable[str | os.PathLike[str]],
+    workers: int = 16,
+    suffixes: frozenset[str] = IMAGE_SUFFIXES,
+    cache: MetadataCache | None = None,
+) -> Iterator[ImageRecord]:
+    """Yield an :class:`ImageRecord` for every image file under ``roots``.
+
+    Symlinked directories are not followed. Unreadable directories and files
+    are logged and skipped. Eviction from ``cache`` only happens if the walk
+    runs to the end and every directory could be listed.
+    """
+    roots = [os.fspath(root) for root in roots]
+    limit = 4 * workers
+    present: set[str] = set()
+    probed: list[ImageRecord] = []
+    complete = True
+    with ThreadPoolExecutor(workers, thread_name_prefix="scan") as pool:
+        pending: set[Future[_Listing | ImageRecord | None]] = set()
+        backlog: deque[tuple[str, os.stat_result]] = deque()
+        for root in roots:
+            pending.add(pool.submit(_list, root, suffixes))
+        while pending or backlog:
+            while backlog and len(pending) < limit:
+                pending.add(pool.submit(_probe, *backlog.popleft()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if isinstance(result, _Listing):
+                    for directory in result.directories:
+                        pending.add(pool.submit(_list, directory, suffixes))
+                    complete &= result.complete
+                    if cache is None:
+                        backlog.extend(result.files)
+                        continue
+                    present.update(path for path, _ in result.files)
+                    cached = cache.lookup(result.files)
+                    backlog.extend(item for item in result.files if item[0] not in cached)
+                    yield from cached.values()
+                elif result is not None:
+                    if cache is not None:
+                        probed.append(result)
+                        if len(probed) >= _STORE_BATCH:
+                            cache.store(probed)
+                            probed.clear()
+                    yield result
+    if cache is not None:
+        cache.store(probed)
+        if complete:
+            cache.evict(roots, present)
+        else:
+            log.warning("some directories could not be listed; not evicting from the metadata cache")
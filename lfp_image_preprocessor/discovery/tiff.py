@@ -0,0 +1,173 @@
+"""Reading the tag directories of TIFF structures (TIFF/BigTIFF files, EXIF).
+
+Only the IFD entries and the values of the tags asked for are read, each
+with a seek and a small read; strip and tile data are never touched (the
+tiler maps those itself, see :class:`~..tiling.source.TiffSource`).
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+from collections.abc import Collection
+from typing import BinaryIO
+
+IMAGE_WIDTH = 0x0100
+IMAGE_LENGTH = 0x0101
+BITS_PER_SAMPLE = 0x0102
+COMPRESSION = 0x0103
+PHOTOMETRIC = 0x0106
+IMAGE_DESCRIPTION = 0x010E
+STRIP_OFFSETS = 0x0111
+SAMPLES_PER_PIXEL = 0x0115
+ROWS_PER_STRIP = 0x0116
+STRIP_BYTE_COUNTS = 0x0117
+PLANAR_CONFIGURATION = 0x011C
+DATE_TIME = 0x0132
+TILE_WIDTH = 0x0142
+SAMPLE_FORMAT = 0x0153
+XMP = 0x02BC
+IPTC = 0x83BB
+EXIF_IFD = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+XP_KEYWORDS = 0x9C9E
+
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4, 16: 8, 17: 8, 18: 8}
+_INT_FORMATS = {1: "B", 3: "H", 4: "I", 6: "b", 8: "h", 9: "i", 13: "I", 16: "Q", 17: "q", 18: "Q"}
+MAX_VALUE_BYTES = 1 << 20
+"""Values larger than this are skipped by default; metadata never needs them."""
+
+
+class TiffDirectory:
+    """Tags of one IFD: ``{tag: int | tuple[int, ...] | bytes}``."""
+
+    def __init__(self, values: dict[int, int | tuple[int, ...] | bytes]):
+        self.values = values
+
+    def get_int(self, tag: int) -> int | None:
+        value = self.values.get(tag)
+        if isinstance(value, tuple):
+            return value[0] if value else None
+        return value if isinstance(value, int) else None
+
+    def get_ints(self, tag: int) -> tuple[int, ...] | None:
+        value = self.values.get(tag)
+        if isinstance(value, int):
+            return (value,)
+        return value if isinstance(value, tuple) else None
+
+    def get_bytes(self, tag: int) -> bytes | None:
+        value = self.values.get(tag)
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, tuple):
+            # IPTC blocks are sometimes typed as LONG; the payload is the same.
+            return b"".join(v.to_bytes(4, "big") for v in value)
+        return None
+
+    def get_text(self, tag: int) -> str | None:
+        raw = self.get_bytes(tag)
+        if raw is None:
+            return None
+        text = raw.split(b"\x00", 1)[0].decode("utf-8", "replace").strip()
+        return text or None
+
+
+def read_tiff_tags(
+    fh: BinaryIO,
+    tags: Collection[int],
+    base: int = 0,
+    max_value_bytes: int | None = MAX_VALUE_BYTES,
+) -> tuple[TiffDirectory, TiffDirectory | None]:
+    """Read ``tags`` from IFD0, and from the EXIF IFD if IFD0 points to one.
+
+    ``base`` is the file offset of the TIFF header (non-zero inside a JPEG
+    APP1 segment). Values over ``max_value_bytes`` are left out; with
+    ``None`` every value is read, however large (strip offsets, say). A
+    structure cut short raises ``ValueError``.
+    """
+    try:
+        return _read_tiff_tags(fh, tags, base, max_value_bytes)
+    except struct.error as exc:
+        raise ValueError(f"truncated TIFF structure: {exc}") from exc
+
+
+def _read_tiff_tags(
+    fh: BinaryIO,
+    tags: Collection[int],
+    base: int,
+    max_value_bytes: int | None,
+) -> tuple[TiffDirectory, TiffDirectory | None]:
+    fh.seek(base)
+    header = fh.read(8)
+    order = {b"II": "<", b"MM": ">"}.get(header[:2])
+    if order is None or len(header) < 8:
+        raise ValueError("not a TIFF structure")
+    (version,) = struct.unpack(order + "H", header[2:4])
+    if version == 42:
+        big = False
+        (offset,) = struct.unpack(order + "I", header[4:8])
+    elif version == 43:
+        big = True
+        (offset,) = struct.unpack(order + "Q", fh.read(8))
+    else:
+        raise ValueError(f"unknown TIFF version {version}")
+    reader = _IfdReader(fh, order, base, big, max_value_bytes)
+    ifd0 = reader.read(offset, set(tags) | {EXIF_IFD})
+    exif_offset = ifd0.get_int(EXIF_IFD)
+    exif = reader.read(exif_offset, tags) if exif_offset else None
+    return ifd0, exif
+
+
+class _IfdReader:
+    def __init__(self, fh: BinaryIO, order: str, base: int, big: bool, max_value_bytes: int | None):
+        self._fh = fh
+        self._max_value_bytes = max_value_bytes
+        self._end: int | None = None
+        self._order = order
+        self._base = base
+        self._count_format = order + ("Q" if big else "H")
+        self._entry = struct.Struct(order + ("HHQ8s" if big else "HHI4s"))
+        self._offset_format = order + ("Q" if big else "I")
+
+    def read(self, offset: int, wanted: Collection[int]) -> TiffDirectory:
+        fh = self._fh
+        fh.seek(self._base + offset)
+        count_size = struct.calcsize(self._count_format)
+        (count,) = struct.unpack(self._count_format, fh.read(count_size))
+        table = fh.read(min(count * self._entry.size, self._file_end() - self._base - offset))
+        found: list[tuple[int, int, int, bytes]] = []
+        for index in range(len(table) // self._entry.size):
+            tag, kind, n, inline = self._entry.unpack_from(table, index * self._entry.size)
+            if tag in wanted and kind in _TYPE_SIZES:
+                found.append((tag, kind, n, inline))
+        values: dict[int, int | tuple[int, ...] | bytes] = {}
+        for tag, kind, n, inline in found:
+            size = _TYPE_SIZES[kind] * n
+            if self._max_value_bytes is not None and size > self._max_value_bytes:
+                continue
+            if size <= len(inline):
+                raw = inline[:size]
+            else:
+                (pointer,) = struct.unpack(self._offset_format, inline)
+                # Checked before reading, so a corrupt count cannot ask for a huge buffer.
+                if self._base + pointer + size > self._file_end():
+                    raise ValueError(f"value of tag {tag} runs past the end of the file")
+                fh.seek(self._base + pointer)
+                raw = fh.read(size)
+            values[tag] = self._decode(kind, n, raw)
+        return TiffDirectory(values)
+
+    def _file_end(self) -> int:
+        if self._end is None:
+            position = self._fh.tell()
+            self._end = self._fh.seek(0, io.SEEK_END)
+            self._fh.seek(position)
+        return self._end
+
+    def _decode(self, kind: int, n: int, raw: bytes) -> int | tuple[int, ...] | bytes:
+        fmt = _INT_FORMATS.get(kind)
+        if fmt is None or kind == 1 and n > 1:
+            return raw
+        values = struct.unpack(f"{self._order}{n}{fmt}", raw[:n * struct.calcsize(fmt)])
+        return values[0] if n == 1 else values
@@ -0,0 +1,53 @@
+"""Pulling keywords, caption and date out of an XMP packet.
+
+The packet is scanned with regular expressions rather than parsed as XML:
+real-world packets are often truncated or padded, and only three fields
+are needed.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+PNG_XMP_KEYWORD = b"XML:com.adobe.xmp"
+
+_SUBJECT = re.compile(rb"<dc:subject>(.*?)</dc:subject>", re.S)
+_DESCRIPTION = re.compile(rb"<dc:description>(.*?)</dc:description>", re.S)
+_LIST_ITEM = re.compile(rb"<rdf:li[^>]*>(.*?)</rdf:li>", re.S)
+_DATE_FIELDS = (rb"photoshop:DateCreated", rb"exif:DateTimeOriginal", rb"xmp:CreateDate")
+_DATES = [
+    (re.compile(rb'%s="([^"]+)"' % name), re.compile(rb"<%s>([^<]+)</%s>" % (name, name)))
+    for name in _DATE_FIELDS
+]
+
+
+def _text(raw: bytes) -> str:
+    return html.unescape(raw.decode("utf-8", "replace")).strip()
+
+
+def xmp_keywords(packet: bytes) -> tuple[str, ...]:
+    """The ``dc:subject`` bag of an XMP packet."""
+    match = _SUBJECT.search(packet)
+    if not match:
+        return ()
+    return tuple(text for raw in _LIST_ITEM.findall(match.group(1)) if (text := _text(raw)))
+
+
+def xmp_caption(packet: bytes) -> str | None:
+    """The first ``dc:description`` alternative (normally ``x-default``)."""
+    match = _DESCRIPTION.search(packet)
+    if not match:
+        return None
+    items = _LIST_ITEM.findall(match.group(1))
+    return (_text(items[0]) if items else None) or None
+
+
+def xmp_date(packet: bytes) -> str | None:
+    """Capture date, preferring ``photoshop:DateCreated``; as written (ISO 8601)."""
+    for attribute, element in _DATES:
+        match = attribute.search(packet) or element.search(packet)
+        if match:
+            return _text(match.group(1)) or None
+    return None
@@ -0,0 +1,195 @@
+"""A small DAG runner with fingerprinted stages.
+
+Each :class:`Stage` names the paths it reads, the paths it writes and the
+stages it depends on. Its fingerprint hashes its name, parameters, the
+size and mtime of every file under its inputs, and the fingerprints of its
+upstream stages, so a change anywhere upstream propagates down the graph
+without re-hashing outputs. A stage runs only when its fingerprint differs
+from the one recorded after its last successful run, or an output is
+missing. Stages whose dependencies are satisfied run concurrently on a
+thread pool; heavy stages bring their own process pools.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+STATE_NAME = ".lfp-pipeline.json"
+_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[[], object]
+    inputs: Sequence[Path] = ()
+    outputs: Sequence[Path] = ()
+    after: Sequence[str] = ()
+    params: Mapping[str, Any] = field(default_factory=dict)
+    """JSON-serialisable settings; changing any of them re-runs the stage."""
+
+
+@dataclass
+class PipelineReport:
+    ran: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    seconds: dict[str, float] = field(default_factory=dict)
+
+
+def fingerprint_paths(paths: Iterable[Path]) -> str:
+    """Hash of the relative path, size and mtime of every file under ``paths``."""
+    digest = hashlib.sha256()
+    for root in paths:
+        digest.update(os.fsencode(root) + b"\x00")
+        if root.is_file():
+            st = root.stat()
+            digest.update(f"{st.st_size}:{st.st_mtime_ns}\n".encode())
+            continue
+        if not root.exists():
+            digest.update(b"missing\n")
+            continue
+        for directory, subdirs, files in os.walk(root):
+            subdirs.sort()
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                rel = os.path.relpath(path, root)
+                digest.update(os.fsencode(rel) + f"\x00{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class Pipeline:
+    """A validated stage graph plus the state file recording past runs."""
+
+    def __init__(self, stages: Iterable[Stage], state: str | os.PathLike[str]):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = Path(state)
+        for stage in self.stages.values():
+            for dependency in stage.after:
+                if dependency not in self.stages:
+                    raise ValueError(f"stage {stage.name!r} depends on unknown stage {dependency!r}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list[str]:
+        order: list[str] = []
+        state: dict[str, int] = {}  # 1 visiting, 2 done
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"stage graph has a cycle through {name!r}")
+            state[name] = 1
+            for dependency in self.stages[name].after:
+                visit(dependency)
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _load_state(self) -> dict[str, str]:
+        if not self.state_path.exists():
+            return {}
+        data = json.loads(self.state_path.read_text())
+        if data.get("version") != _VERSION:
+            log.warning("ignoring pipeline state %s with unknown version", self.state_path)
+            return {}
+        return data["stages"]
+
+    def _save_state(self, fingerprints: dict[str, str]) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": _VERSION, "stages": fingerprints}, indent=1, sort_keys=True))
+        os.replace(tmp, self.state_path)
+
+    def fingerprint(self, name: str, upstream: Mapping[str, str]) -> str:
+        stage = self.stages[name]
+        digest = hashlib.sha256()
+        digest.update(json.dumps([name, dict(stage.params)], sort_keys=True, default=str).encode())
+        digest.update(fingerprint_paths(stage.inputs).encode())
+        for dependency in sorted(stage.after):
+            digest.update(f"{dependency}={upstream[dependency]}".encode())
+        return digest.hexdigest()
+
+    def downstream(self, names: Iterable[str]) -> set[str]:
+        """``names`` plus every stage that depends on one of them, directly or not."""
+        selected = set(names)
+        if unknown := selected - self.stages.keys():
+            raise ValueError(f"unknown stages: {', '.join(sorted(unknown))}")
+        for name in self.order:
+            if any(dependency in selected for dependency in self.stages[name].after):
+                selected.add(name)
+        return selected
+
+    def run(self, jobs: int | None = None, force: Iterable[str] = ()) -> PipelineReport:
+        """Run every out-of-date stage; ``force`` names stages to re-run regardless.
+
+        Forcing a stage also re-runs everything downstream of it, since its
+        outputs may change even though its fingerprint does not. A failing
+        stage stops new stages from starting; stages already running finish
+        and are recorded, then the error is re-raised.
+        """
+        forced = self.downstream(force)
+        recorded = self._load_state()
+        state = dict(recorded)
+        fingerprints: dict[str, str] = {}
+        report = PipelineReport()
+        waiting = list(self.order)
+        failure: BaseException | None = None
+
+        with ThreadPoolExecutor(jobs or len(self.stages) or 1, thread_name_prefix="stage") as pool:
+            running: dict[Future[tuple[str, bool, float]], str] = {}
+            while waiting or running:
+                if failure is None:
+                    for name in [n for n in waiting if all(d in fingerprints for d in self.stages[n].after)]:
+                        waiting.remove(name)
+                        upstream = {d: fingerprints[d] for d in self.stages[name].after}
+                        running[pool.submit(self._execute, name, upstream, recorded.get(name), name in forced)] = name
+                elif not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        fingerprint, ran, seconds = future.result()
+                    except BaseException as exc:
+                        log.error("stage %s failed: %s", name, exc)
+                        state.pop(name, None)
+                        failure = failure or exc
+                        continue
+                    fingerprints[name] = state[name] = fingerprint
+                    (report.ran if ran else report.skipped).append(name)
+                    report.seconds[name] = seconds
+                    self._save_state(state)
+        if failure is not None:
+            self._save_state(state)
+            raise failure
+        return report
+
+    def _execute(self, name: str, upstream: Mapping[str, str], previous: str | None, force: bool) -> tuple[str, bool, float]:
+        stage = self.stages[name]
+        started = time.perf_counter()
+        fingerprint = self.fingerprint(name, upstream)
+        missing = [path for path in stage.outputs if not path.exists()]
+        if not force and fingerprint == previous and not missing:
+            log.info("stage %s is up to date", name)
+            return fingerprint, False, time.perf_counter() - started
+        log.info("running stage %s", name)
+        stage.run()
+        return fingerprint, True, time.perf_counter() - started
@@ -0,0 +1,40 @@
+"""Precomputed tag-search structures for the client-side search."""
+
+from .autocomplete import Autocomplete, autocomplete_from_index, build_autocomplete
+from .duplicates import MultiIndexHash, duplicate_clusters, hamming
+from .index import TagIndex, TagIndexBuilder, TagIndexReader, intersect
+from .intersections import CACHE_MAGIC, CacheOptions, TagSearch, build_intersection_cache, mine_combinations
+from .roaring import RoaringBitmap
+from .segments import DeltaSegment, encode_delta
+from .shards import ShardedIndex, ShardOptions, ShardReport, apply_delta, compact_shards, prune_shards, write_shards
+from .varint import decode_deltas, encode_deltas
+
+__all__ = [
+    "Autocomplete",
+    "CACHE_MAGIC",
+    "CacheOptions",
+    "DeltaSegment",
+    "MultiIndexHash",
+    "RoaringBitmap",
+    "ShardOptions",
+    "ShardReport",
+    "ShardedIndex",
+    "TagIndex",
+    "TagIndexBuilder",
+    "TagIndexReader",
+    "TagSearch",
+    "apply_delta",
+    "autocomplete_from_index",
+    "build_autocomplete",
+    "build_intersection_cache",
+    "compact_shards",
+    "decode_deltas",
+    "duplicate_clusters",
+    "encode_delta",
+    "encode_deltas",
+    "hamming",
+    "intersect",
+    "mine_combinations",
+    "prune_shards",
+    "write_shards",
+]
@@ -0,0 +1,166 @@
+"""Top-k tag-name completion from a score-annotated radix trie.
+
+Every node of the trie carries the largest image count anywhere in its
+subtree, and children are stored in descending order of that score. The
+top-k completions of a prefix are then found best-first with a small heap,
+touching O(k * depth) nodes instead of every tag under the prefix.
+
+Edge labels are UTF-8 byte strings (single-child chains are merged). The
+nodes are written in breadth-first order, so each node's children are
+contiguous and their position follows from a running count. All integers
+are LEB128 varints::
+
+    b"LFPAUTO1"
+    node count
+    per node:  label length, label bytes, count + 1 (0: no tag ends here),
+               subtree max count, child count
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from .index import TagIndex
+from .varint import read_varint, write_varint
+
+MAGIC = b"LFPAUTO1"
+
+
+@dataclass
+class _Node:
+    label: bytes
+    count: int = -1
+    best: int = 0
+    children: list[_Node] = field(default_factory=list)
+
+
+def _build(keys: list[bytes], counts: list[int], lo: int, hi: int, depth: int, label: bytes) -> _Node:
+    """Radix-trie node for ``keys[lo:hi]``, which all share ``depth`` bytes."""
+    node = _Node(label)
+    if len(keys[lo]) == depth:
+        node.count = node.best = counts[lo]
+        lo += 1
+    while lo < hi:
+        first = keys[lo][depth]
+        end = lo + 1
+        while end < hi and keys[end][depth] == first:
+            end += 1
+        # Keys are sorted, so the group's common prefix is that of its ends.
+        low, high = keys[lo], keys[end - 1]
+        common = depth + 1
+        while common < len(low) and common < len(high) and low[common] == high[common]:
+            common += 1
+        child = _build(keys, counts, lo, end, common, low[depth:common])
+        node.children.append(child)
+        node.best = max(node.best, child.best)
+        lo = end
+    node.children.sort(key=lambda child: -child.best)
+    return node
+
+
+def build_autocomplete(counts: Mapping[str, int]) -> bytes:
+    """Serialise a completion trie over ``counts`` (tag name -> image count)."""
+    items = sorted((tag.encode(), count) for tag, count in counts.items())
+    out = bytearray(MAGIC)
+    if not items:
+        write_varint(out, 0)
+        return bytes(out)
+    keys = [key for key, _ in items]
+    root = _build(keys, [count for _, count in items], 0, len(keys), 0, b"")
+
+    ordered: list[_Node] = []
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        ordered.append(node)
+        queue.extend(node.children)
+    write_varint(out, len(ordered))
+    for node in ordered:
+        write_varint(out, len(node.label))
+        out += node.label
+        write_varint(out, node.count + 1)
+        write_varint(out, node.best)
+        write_varint(out, len(node.children))
+    return bytes(out)
+
+
+def autocomplete_from_index(index: TagIndex) -> bytes:
+    return build_autocomplete({tag: len(ids) for tag, ids in index.items()})
+
+
+class Autocomplete:
+    """Decoded completion trie; answers :meth:`complete` without scanning."""
+
+    def __init__(self, data: bytes):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not an autocomplete index (bad magic)")
+        total, pos = read_varint(data, len(MAGIC))
+        self._labels: list[bytes] = []
+        self._counts: list[int] = []
+        self._best: list[int] = []
+        self._first: list[int] = []
+        self._children: list[int] = []
+        next_child = 1
+        for _ in range(total):
+            length, pos = read_varint(data, pos)
+            self._labels.append(data[pos:pos + length])
+            pos += length
+            count, pos = read_varint(data, pos)
+            best, pos = read_varint(data, pos)
+            children, pos = read_varint(data, pos)
+            self._counts.append(count - 1)
+            self._best.append(best)
+            self._first.append(next_child)
+            self._children.append(children)
+            next_child += children
+
+    def __len__(self) -> int:
+        return sum(count >= 0 for count in self._counts)
+
+    def _locate(self, prefix: bytes) -> tuple[int, bytes] | None:
+        """Node whose subtree holds every key starting with ``prefix``."""
+        if not self._labels:
+            return None
+        node, text, pos = 0, b"", 0
+        while pos < len(prefix):
+            first = self._first[node]
+            for child in range(first, first + self._children[node]):
+                label = self._labels[child]
+                if label[0] == prefix[pos]:
+                    break
+            else:
+                return None
+            size = min(len(label), len(prefix) - pos)
+            if label[:size] != prefix[pos:pos + size]:
+                return None
+            node, text, pos = child, text + label, pos + size
+        return node, text
+
+    def complete(self, prefix: str, k: int = 10) -> list[tuple[str, int]]:
+        """The ``k`` tags starting with ``prefix`` with the most images.
+
+        Ties are broken alphabetically.
+        """
+        found = self._locate(prefix.encode())
+        if found is None or k <= 0:
+            return []
+        node, text = found
+        # Entries are (-score, text, kind, node); kind 0 emits a tag, 1 expands
+        # a subtree. A subtree's text is a prefix of all its tags, so popping
+        # in (score, text) order also yields ties alphabetically.
+        heap: list[tuple[int, bytes, int, int]] = [(-self._best[node], text, 1, node)]
+        results: list[tuple[str, int]] = []
+        while heap and len(results) < k:
+            score, text, kind, node = heapq.heappop(heap)
+            if kind == 0:
+                results.append((text.decode(), -score))
+                continue
+            if self._counts[node] >= 0:
+                heapq.heappush(heap, (-self._counts[node], text, 0, node))
+            first = self._first[node]
+            for child in range(first, first + self._children[node]):
+                heapq.heappush(heap, (-self._best[child], text + self._labels[child], 1, child))
+        return results
@@ -0,0 +1,106 @@
+"""Near-duplicate grouping of 64-bit perceptual hashes.
+
+Hashes are kept in a multi-index hash table (Norouzi et al.): the 64 bits
+are cut into ``m`` chunks and every chunk value keys its own dict. If two
+hashes are within ``t`` bits, by the pigeonhole principle at least one of
+their chunks is within ``t // m`` bits, so a query probes each chunk's
+dict at its own value and at every value within that many flipped bits,
+and checks the full distance of only the hashes found there. ``m`` is
+picked so that ``t // m`` is at most 1, which keeps both the probes per
+query (``m * (chunk bits + 1)``) and the hashes per bucket small, so
+only a small fraction of all pairs is ever compared. The cost grows with
+the threshold, as the chunks get shorter and their buckets coarser.
+
+Groups are the connected components of the "within threshold" relation,
+found by querying each hash against the table of the hashes before it and
+merging matches with a union-find.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+HASH_BITS = 64
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """Hamming-radius lookup of 64-bit hashes for a fixed maximum radius."""
+
+    def __init__(self, radius: int):
+        if not 0 <= radius < HASH_BITS:
+            raise ValueError(f"radius must be in [0, {HASH_BITS})")
+        self.radius = radius
+        chunks = radius // 2 + 1
+        self._sub_radius = radius // chunks
+        bounds = [HASH_BITS * i // chunks for i in range(chunks + 1)]
+        # (shift, mask, chunk values to probe relative to the query's chunk)
+        self._chunks = [
+            (low, (1 << (high - low)) - 1, [0] + [1 << bit for bit in range(high - low) if self._sub_radius])
+            for low, high in zip(bounds, bounds[1:])
+        ]
+        self._tables: list[dict[int, list[int]]] = [{} for _ in self._chunks]
+        self._values: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: int, key: int) -> None:
+        self._values[key] = value
+        for (shift, mask, _), table in zip(self._chunks, self._tables):
+            table.setdefault(value >> shift & mask, []).append(key)
+
+    def search(self, value: int, radius: int | None = None) -> list[tuple[int, int]]:
+        """``(key, distance)`` of every entry within ``radius`` of ``value``.
+
+        ``radius`` defaults to, and may not exceed, the table's own radius.
+        """
+        radius = self.radius if radius is None else radius
+        if radius > self.radius:
+            raise ValueError(f"radius {radius} exceeds the table's {self.radius}")
+        values = self._values
+        # A match can turn up in several chunks; the dict keeps it once.
+        found: dict[int, int] = {}
+        for (shift, mask, flips), table in zip(self._chunks, self._tables):
+            chunk = value >> shift & mask
+            for flip in flips:
+                for key in table.get(chunk ^ flip, ()):
+                    distance = (values[key] ^ value).bit_count()
+                    if distance <= radius:
+                        found[key] = distance
+        return list(found.items())
+
+
+def duplicate_clusters(hashes: Mapping[int, int], threshold: int) -> list[list[int]]:
+    """Groups of keys whose hashes chain together within ``threshold`` bits.
+
+    Returns only groups of two or more, each sorted, largest group first.
+    """
+    parent: dict[int, int] = {}
+
+    def find(key: int) -> int:
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    table = MultiIndexHash(threshold)
+    for key, value in hashes.items():
+        parent[key] = key
+        for other, _ in table.search(value):
+            a, b = find(key), find(other)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        table.add(value, key)
+
+    groups: dict[int, list[int]] = {}
+    for key in hashes:
+        groups.setdefault(find(key), []).append(key)
+    clusters = [sorted(group) for group in groups.values() if len(group) > 1]
+    clusters.sort(key=lambda group: (-len(group), group[0]))
+    return clusters
@@ -0,0 +1,207 @@
+"""Inverted tag index: tag name -> sorted posting list of image IDs.
+
+The binary form is what ships to the browser. All integers are LEB128
+varints::
+
+    b"LFPTAGS2"
+    tag count
+    per tag, sorted by name:  name length, UTF-8 name,
+                              posting count << 1 | roaring flag, block length
+    posting blocks            one per tag, same order
+
+A posting block normally stores the first ID as-is and every following ID
+as the gap to its predecessor minus one (see :mod:`.varint`), so a client
+can decode it with a single loop over bytes. Tags covering a large share of
+the library are stored as a roaring bitmap instead (see :mod:`.roaring`)
+whenever that is smaller. The directory is read once; blocks are only
+decoded for the tags a query needs.
+"""
+
+from __future__ import annotations
+
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from .roaring import RoaringBitmap
+from .varint import decode_deltas, encode_deltas, read_varint, write_varint
+
+MAGIC = b"LFPTAGS2"
+ROARING_MIN_POSTINGS = 1024
+"""Shorter lists never beat delta coding as a bitmap, so are not tried."""
+
+
+def encode_postings(ids: list[int]) -> tuple[bytes, bool]:
+    """Smaller of the delta and roaring encodings; the flag marks roaring."""
+    block = encode_deltas(ids)
+    if len(ids) >= ROARING_MIN_POSTINGS:
+        bitmap = RoaringBitmap.from_sorted(ids).to_bytes()
+        if len(bitmap) < len(block):
+            return bitmap, True
+    return block, False
+
+
+class TagIndexBuilder:
+    """Accumulates ``image ID -> tags`` and produces a :class:`TagIndex`."""
+
+    def __init__(self) -> None:
+        self._postings: defaultdict[str, set[int]] = defaultdict(set)
+
+    def add(self, image_id: int, tags: Iterable[str]) -> None:
+        if image_id < 0:
+            raise ValueError("image IDs must be non-negative")
+        for tag in tags:
+            self._postings[tag].add(image_id)
+
+    def build(self) -> TagIndex:
+        return TagIndex({tag: sorted(ids) for tag, ids in self._postings.items()})
+
+
+@dataclass(frozen=True)
+class _Block:
+    count: int
+    start: int
+    end: int
+    roaring: bool
+
+
+class TagIndex:
+    """Posting lists in memory, with conversion to and from the binary form."""
+
+    def __init__(self, postings: Mapping[str, list[int]]):
+        self._postings = dict(sorted(postings.items()))
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._postings
+
+    def tags(self) -> Iterator[str]:
+        return iter(self._postings)
+
+    def items(self) -> Iterator[tuple[str, list[int]]]:
+        return iter(self._postings.items())
+
+    def postings(self, tag: str) -> list[int]:
+        return self._postings.get(tag, [])
+
+    def to_bytes(self, magic: bytes = MAGIC) -> bytes:
+        directory = bytearray(magic)
+        write_varint(directory, len(self._postings))
+        blocks = []
+        for tag, ids in self._postings.items():
+            name = tag.encode()
+            block, roaring = encode_postings(ids)
+            write_varint(directory, len(name))
+            directory += name
+            write_varint(directory, len(ids) << 1 | roaring)
+            write_varint(directory, len(block))
+            blocks.append(block)
+        return bytes(directory) + b"".join(blocks)
+
+    def write(self, path: str | os.PathLike[str]) -> int:
+        data = self.to_bytes()
+        Path(path).write_bytes(data)
+        return len(data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> TagIndex:
+        reader = TagIndexReader(data)
+        return cls({tag: reader.postings(tag) for tag in reader.tags()})
+
+    @classmethod
+    def read(cls, path: str | os.PathLike[str]) -> TagIndex:
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+class TagIndexReader:
+    """Lazy view of a binary index: parses the directory, decodes on demand."""
+
+    def __init__(self, data: bytes, magic: bytes = MAGIC):
+        if data[:len(magic)] != magic:
+            raise ValueError(f"bad magic, expected {magic!r}")
+        self._data = data
+        count, pos = read_varint(data, len(magic))
+        entries: list[tuple[str, int, int]] = []
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            name = data[pos:pos + length].decode()
+            pos += length
+            postings, pos = read_varint(data, pos)
+            size, pos = read_varint(data, pos)
+            entries.append((name, postings, size))
+        self._names = [name for name, _, _ in entries]
+        self._blocks: dict[str, _Block] = {}
+        for name, postings, size in entries:
+            self._blocks[name] = _Block(postings >> 1, pos, pos + size, bool(postings & 1))
+            pos += size
+
+    def tags(self) -> list[str]:
+        return self._names
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._blocks
+
+    def count(self, tag: str) -> int:
+        block = self._blocks.get(tag)
+        return block.count if block else 0
+
+    def postings(self, tag: str) -> list[int]:
+        block = self._blocks.get(tag)
+        if block is None:
+            return []
+        data = memoryview(self._data)[block.start:block.end]
+        if block.roaring:
+            return RoaringBitmap.from_bytes(data).to_list()
+        return decode_deltas(data, block.count)
+
+    def bitmap(self, tag: str) -> RoaringBitmap:
+        """Posting list as a bitmap, for set operations on dense tags."""
+        block = self._blocks.get(tag)
+        if block is None:
+            return RoaringBitmap()
+        data = memoryview(self._data)[block.start:block.end]
+        if block.roaring:
+            return RoaringBitmap.from_bytes(data)
+        return RoaringBitmap.from_sorted(decode_deltas(data, block.count))
+
+    def is_roaring(self, tag: str) -> bool:
+        block = self._blocks.get(tag)
+        return block is not None and block.roaring
+
+
+def intersect(*lists: list[int]) -> list[int]:
+    """Intersect sorted posting lists, starting from the shortest.
+
+    Each step either probes a set of the longer list or, when that list is
+    much longer, gallops through it with binary search.
+    """
+    if not lists:
+        return []
+    ordered = sorted(lists, key=len)
+    result = ordered[0]
+    for other in ordered[1:]:
+        if not result:
+            break
+        if len(other) > 8 * len(result):
+            result = _gallop(result, other)
+        else:
+            members = set(other)
+            result = [value for value in result if value in members]
+    return result
+
+
+def _gallop(small: list[int], large: list[int]) -> list[int]:
+    out = []
+    lo = 0
+    for value in small:
+        lo = bisect_left(large, value, lo)
+        if lo == len(large):
+            break
+        if large[lo] == value:
+            out.append(value)
+    return out
@@ -0,0 +1,175 @@
+"""Precomputed results for popular multi-tag queries.
+
+Visitors mostly filter by two or three tags at once. The combinations that
+co-occur most often in the library are mined Apriori-style (triples are only
+counted when all three of their pairs made the cut) and their intersections
+are stored, most frequent first, until a byte budget is spent.
+
+The cache is serialised in the tag-index format (see :mod:`.index`) with its
+own magic; each "tag" is a combination key, the member tags sorted and
+joined with ``KEY_SEPARATOR``. Queries the cache cannot answer fall back to
+intersecting posting lists at runtime, starting from the smallest cached
+subset if there is one.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Protocol
+
+from .index import TagIndex, TagIndexReader, encode_postings, intersect
+from .roaring import RoaringBitmap
+from .varint import write_varint
+
+CACHE_MAGIC = b"LFPXSEC2"
+KEY_SEPARATOR = "\x00"
+
+
+def combination_key(tags: Iterable[str]) -> str:
+    return KEY_SEPARATOR.join(sorted(set(tags)))
+
+
+@dataclass(frozen=True)
+class CacheOptions:
+    top_n: int = 1000
+    """Most combinations considered, by co-occurrence count."""
+    byte_budget: int = 256 * 1024
+    """Upper bound on the serialised size of the cached posting lists."""
+    min_support: int = 2
+    """Combinations matching fewer images than this are not worth caching."""
+    max_arity: int = 3
+    """2 to cache pairs only, 3 to add triples."""
+
+
+def mine_combinations(index: TagIndex, options: CacheOptions = CacheOptions()) -> list[tuple[tuple[str, ...], int]]:
+    """The ``top_n`` most frequent tag pairs and triples with their counts."""
+    frequent = {tag for tag, ids in index.items() if len(ids) >= options.min_support}
+    by_image: defaultdict[int, list[str]] = defaultdict(list)
+    for tag, ids in index.items():
+        if tag in frequent:
+            for image_id in ids:
+                by_image[image_id].append(tag)
+
+    pair_counts: Counter[tuple[str, ...]] = Counter()
+    for tags in by_image.values():
+        pair_counts.update(combinations(sorted(tags), 2))
+    pairs = _top(pair_counts, options)
+    found = dict(pairs)
+
+    if options.max_arity >= 3 and pairs:
+        kept = set(found)
+        in_pairs = {tag for pair in kept for tag in pair}
+        triple_counts: Counter[tuple[str, ...]] = Counter()
+        for tags in by_image.values():
+            candidates = sorted(tag for tag in tags if tag in in_pairs)
+            for a, b, c in combinations(candidates, 3):
+                if (a, b) in kept and (a, c) in kept and (b, c) in kept:
+                    triple_counts[a, b, c] += 1
+        found.update(_top(triple_counts, options))
+
+    return sorted(found.items(), key=lambda item: (-item[1], item[0]))[:options.top_n]
+
+
+def _top(counts: Counter[tuple[str, ...]], options: CacheOptions) -> list[tuple[tuple[str, ...], int]]:
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [(combo, count) for combo, count in ranked[:options.top_n] if count >= options.min_support]
+
+
+def build_intersection_cache(index: TagIndex, options: CacheOptions = CacheOptions()) -> TagIndex:
+    """Cache the mined combinations' results, most frequent first, within budget.
+
+    A combination that does not fit is skipped rather than ending the
+    build, so smaller results further down the list can still use the
+    remaining budget.
+    """
+    cached: dict[str, list[int]] = {}
+    used = 0
+    for combo, _ in mine_combinations(index, options):
+        ids = intersect(*(index.postings(tag) for tag in combo))
+        key = combination_key(combo).encode()
+        block, roaring = encode_postings(ids)
+        header = bytearray()
+        write_varint(header, len(key))
+        write_varint(header, len(ids) << 1 | roaring)
+        write_varint(header, len(block))
+        cost = len(header) + len(key) + len(block)
+        if used + cost > options.byte_budget:
+            continue
+        cached[key.decode()] = ids
+        used += cost
+    return TagIndex(cached)
+
+
+class PostingSource(Protocol):
+    """A whole index (:class:`~.index.TagIndexReader`) or a sharded one."""
+
+    def postings(self, tag: str) -> list[int]:
+        ...
+
+    def bitmap(self, tag: str) -> RoaringBitmap:
+        ...
+
+    def is_roaring(self, tag: str) -> bool:
+        ...
+
+
+class TagSearch:
+    """Answers multi-tag AND queries from an index plus an optional cache."""
+
+    def __init__(self, index: PostingSource, cache: TagIndexReader | None = None):
+        self.index = index
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_bytes(cls, index: bytes, cache: bytes | None = None) -> TagSearch:
+        return cls(TagIndexReader(index), TagIndexReader(cache, CACHE_MAGIC) if cache else None)
+
+    def query(self, tags: Iterable[str]) -> list[int]:
+        wanted = sorted(set(tags))
+        if not wanted:
+            return []
+        if len(wanted) == 1:
+            return self.index.postings(wanted[0])
+        if self.cache is not None:
+            key = combination_key(wanted)
+            if key in self.cache:
+                self.hits += 1
+                return self.cache.postings(key)
+        self.misses += 1
+        lists = []
+        covered: tuple[str, ...] = ()
+        if self.cache is not None:
+            best = self._smallest_cached_subset(wanted)
+            if best is not None:
+                covered = best
+                lists.append(self.cache.postings(combination_key(best)))
+        rest = [tag for tag in wanted if tag not in covered]
+        dense = [tag for tag in rest if self.index.is_roaring(tag)]
+        if len(dense) >= 2:
+            # Dense tags are ANDed as bitmaps before meeting the sparse lists.
+            combined = self.index.bitmap(dense[0])
+            for tag in dense[1:]:
+                combined &= self.index.bitmap(tag)
+            lists.append(combined.to_list())
+            rest = [tag for tag in rest if tag not in dense]
+        lists.extend(self.index.postings(tag) for tag in rest)
+        return intersect(*lists)
+
+    def _smallest_cached_subset(self, wanted: list[str]) -> tuple[str, ...] | None:
+        assert self.cache is not None
+        best: tuple[str, ...] | None = None
+        best_count = 0
+        for size in range(min(len(wanted) - 1, 3), 1, -1):
+            for subset in combinations(wanted, size):
+                key = combination_key(subset)
+                if key not in self.cache:
+                    continue
+                count = self.cache.count(key)
+                if best is None or count < best_count:
+                    best, best_count = subset, count
+        return best
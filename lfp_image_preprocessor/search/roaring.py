@@ -0,0 +1,295 @@
+"""Roaring-style compressed bitmaps for dense posting lists.
+
+IDs are split into their high and low 16 bits; every high half with members
+gets a container for the low halves, in whichever of three forms is
+smallest:
+
+``array``
+    Sorted list of low halves; 2 bytes per member, used up to 4096 members.
+``bitmap``
+    A 65536-bit set held as a Python ``int``; a fixed 8 KiB.
+``run``
+    ``(start, end)`` inclusive intervals; 4 bytes per run.
+
+AND, OR and ANDNOT work container by container across any mix of forms:
+arrays are merged or probed directly, everything else goes through integer
+bit operations, and the result is re-packed into its smallest form.
+
+Serialised form (varints unless noted)::
+
+    container count
+    per container:  high 16 bits, kind (0 array, 1 bitmap, 2 run), payload
+        array:   member count, delta-coded low halves (see :mod:`.varint`)
+        bitmap:  8192 raw bytes, little-endian bit order
+        run:     run count, then per run: start - previous end - 1 (the gap
+                 since the previous run), length - 1
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from .varint import decode_deltas, encode_deltas, read_varint, write_varint
+
+ARRAY, BITMAP, RUN = 0, 1, 2
+ARRAY_LIMIT = 4096
+_BITMAP_BYTES = 1 << 13
+
+_Container = tuple[int, Any]
+"""``(kind, payload)``: a list of lows, an ``int`` bit set or a list of runs."""
+
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _bits_to_list(bits: int) -> list[int]:
+    out: list[int] = []
+    for index, byte in enumerate(bits.to_bytes(_BITMAP_BYTES, "little")):
+        if byte:
+            base = index << 3
+            out.extend(base + bit for bit in _BYTE_BITS[byte])
+    return out
+
+
+def _list_to_bits(values: Iterable[int]) -> int:
+    buf = bytearray(_BITMAP_BYTES)
+    for value in values:
+        buf[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _runs_to_bits(runs: list[tuple[int, int]]) -> int:
+    bits = 0
+    for start, end in runs:
+        bits |= ((1 << (end - start + 1)) - 1) << start
+    return bits
+
+
+def _to_bits(container: _Container) -> int:
+    kind, payload = container
+    if kind == BITMAP:
+        return payload
+    if kind == ARRAY:
+        return _list_to_bits(payload)
+    return _runs_to_bits(payload)
+
+
+def _to_list(container: _Container) -> list[int]:
+    kind, payload = container
+    if kind == ARRAY:
+        return payload
+    if kind == BITMAP:
+        return _bits_to_list(payload)
+    return [value for start, end in payload for value in range(start, end + 1)]
+
+
+def _cardinality(container: _Container) -> int:
+    kind, payload = container
+    if kind == ARRAY:
+        return len(payload)
+    if kind == BITMAP:
+        return payload.bit_count()
+    return sum(end - start + 1 for start, end in payload)
+
+
+def _pack_bits(bits: int) -> _Container | None:
+    """Smallest container for a bit set, or ``None`` if it is empty."""
+    cardinality = bits.bit_count()
+    if not cardinality:
+        return None
+    starts = bits & ~(bits << 1)
+    runs = starts.bit_count()
+    if 4 * runs < min(2 * cardinality, _BITMAP_BYTES):
+        ends = bits & ~(bits >> 1)
+        return RUN, list(zip(_bits_to_list(starts), _bits_to_list(ends)))
+    if cardinality <= ARRAY_LIMIT:
+        return ARRAY, _bits_to_list(bits)
+    return BITMAP, bits
+
+
+def _pack_list(values: list[int]) -> _Container | None:
+    """Smallest container for sorted low halves, or ``None`` if empty."""
+    if not values:
+        return None
+    runs: list[tuple[int, int]] = []
+    start = previous = values[0]
+    for value in values[1:]:
+        if value != previous + 1:
+            runs.append((start, previous))
+            start = value
+        previous = value
+    runs.append((start, previous))
+    if 4 * len(runs) < min(2 * len(values), _BITMAP_BYTES):
+        return RUN, runs
+    if len(values) <= ARRAY_LIMIT:
+        return ARRAY, values
+    return BITMAP, _list_to_bits(values)
+
+
+def _probe(values: list[int], container: _Container, keep: bool) -> list[int]:
+    """Members of ``values`` that are (``keep``) or are not in ``container``."""
+    if container[0] == ARRAY:
+        members = set(container[1])
+        return [value for value in values if (value in members) is keep]
+    table = _to_bits(container).to_bytes(_BITMAP_BYTES, "little")
+    return [value for value in values if bool(table[value >> 3] >> (value & 7) & 1) is keep]
+
+
+def _and(a: _Container, b: _Container) -> _Container | None:
+    if a[0] == ARRAY:
+        return _pack_list(_probe(a[1], b, True))
+    if b[0] == ARRAY:
+        return _pack_list(_probe(b[1], a, True))
+    return _pack_bits(_to_bits(a) & _to_bits(b))
+
+
+def _or(a: _Container, b: _Container) -> _Container | None:
+    if a[0] == ARRAY and b[0] == ARRAY and len(a[1]) + len(b[1]) <= ARRAY_LIMIT:
+        return _pack_list(sorted(set(a[1]).union(b[1])))
+    return _pack_bits(_to_bits(a) | _to_bits(b))
+
+
+def _andnot(a: _Container, b: _Container) -> _Container | None:
+    if a[0] == ARRAY:
+        return _pack_list(_probe(a[1], b, False))
+    return _pack_bits(_to_bits(a) & ~_to_bits(b))
+
+
+class RoaringBitmap:
+    """Immutable set of non-negative 32-bit integers."""
+
+    __slots__ = ("_keys", "_containers")
+
+    def __init__(self, keys: list[int] | None = None, containers: list[_Container] | None = None):
+        self._keys = keys or []
+        self._containers = containers or []
+
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int]) -> RoaringBitmap:
+        """Build from strictly increasing IDs below 2**32."""
+        keys: list[int] = []
+        containers: list[_Container] = []
+        lows: list[int] = []
+        current = -1
+        for value in ids:
+            high = value >> 16
+            if high != current:
+                if lows:
+                    keys.append(current)
+                    containers.append(_pack_list(lows))
+                current, lows = high, []
+            lows.append(value & 0xFFFF)
+        if lows:
+            keys.append(current)
+            containers.append(_pack_list(lows))
+        return cls(keys, containers)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(c) for c in self._containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for high, container in zip(self._keys, self._containers):
+            base = high << 16
+            for low in _to_list(container):
+                yield base | low
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        return self._keys == other._keys and all(
+            _to_list(a) == _to_list(b) for a, b in zip(self._containers, other._containers)
+        )
+
+    def __repr__(self) -> str:
+        kinds = ",".join("abr"[kind] for kind, _ in self._containers)
+        return f"RoaringBitmap({len(self)} ids, containers={kinds or '-'})"
+
+    def to_list(self) -> list[int]:
+        return list(self)
+
+    def __and__(self, other: RoaringBitmap) -> RoaringBitmap:
+        keys, containers = [], []
+        right = dict(zip(other._keys, other._containers))
+        for key, container in zip(self._keys, self._containers):
+            if key in right and (result := _and(container, right[key])) is not None:
+                keys.append(key)
+                containers.append(result)
+        return RoaringBitmap(keys, containers)
+
+    def __or__(self, other: RoaringBitmap) -> RoaringBitmap:
+        left = dict(zip(self._keys, self._containers))
+        right = dict(zip(other._keys, other._containers))
+        keys, containers = [], []
+        for key in sorted(left.keys() | right.keys()):
+            if key in left and key in right:
+                result = _or(left[key], right[key])
+            else:
+                result = left.get(key) or right[key]
+            if result is not None:
+                keys.append(key)
+                containers.append(result)
+        return RoaringBitmap(keys, containers)
+
+    def __sub__(self, other: RoaringBitmap) -> RoaringBitmap:
+        """ANDNOT: members of ``self`` that are not in ``other``."""
+        right = dict(zip(other._keys, other._containers))
+        keys, containers = [], []
+        for key, container in zip(self._keys, self._containers):
+            result = _andnot(container, right[key]) if key in right else container
+            if result is not None:
+                keys.append(key)
+                containers.append(result)
+        return RoaringBitmap(keys, containers)
+
+    def to_bytes(self) -> bytes:
+        out = bytearray()
+        write_varint(out, len(self._keys))
+        for key, (kind, payload) in zip(self._keys, self._containers):
+            write_varint(out, key)
+            write_varint(out, kind)
+            if kind == ARRAY:
+                write_varint(out, len(payload))
+                out += encode_deltas(payload)
+            elif kind == BITMAP:
+                out += payload.to_bytes(_BITMAP_BYTES, "little")
+            else:
+                write_varint(out, len(payload))
+                previous = -1
+                for start, end in payload:
+                    write_varint(out, start - previous - 1)
+                    write_varint(out, end - start)
+                    previous = end
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview) -> RoaringBitmap:
+        count, pos = read_varint(data, 0)
+        keys: list[int] = []
+        containers: list[_Container] = []
+        for _ in range(count):
+            key, pos = read_varint(data, pos)
+            kind, pos = read_varint(data, pos)
+            if kind == ARRAY:
+                size, pos = read_varint(data, pos)
+                start = pos
+                for _ in range(size):
+                    _, pos = read_varint(data, pos)
+                containers.append((ARRAY, decode_deltas(data[start:pos], size)))
+            elif kind == BITMAP:
+                containers.append((BITMAP, int.from_bytes(data[pos:pos + _BITMAP_BYTES], "little")))
+                pos += _BITMAP_BYTES
+            elif kind == RUN:
+                size, pos = read_varint(data, pos)
+                runs = []
+                previous = -1
+                for _ in range(size):
+                    gap, pos = read_varint(data, pos)
+                    length, pos = read_varint(data, pos)
+                    start = previous + gap + 1
+                    runs.append((start, start + length))
+                    previous = start + length
+                containers.append((RUN, runs))
+            else:
+                raise ValueError(f"unknown roaring container kind {kind}")
+            keys.append(key)
+        return cls(keys, containers)
@@ -0,0 +1,62 @@
+"""Delta segments: immutable patches on top of a tag-index shard.
+
+A delta holds, per tag, the IDs added and the IDs removed since the shard
+(or the previous delta) was written. Clients apply a shard's deltas in
+order at query time: ``ids = (ids - removed) | added``. Deltas are tiny, so
+an update rewrites only the root manifest plus one delta per touched shard,
+and every previously cached file stays valid.
+
+Serialised form::
+
+    b"LFPDELT1"
+    varint: length of the added block
+    added block:    a tag index (see :mod:`.index`) of added IDs
+    removed block:  a tag index of removed IDs
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+
+from .index import TagIndex, TagIndexReader
+from .varint import read_varint, write_varint
+
+DELTA_MAGIC = b"LFPDELT1"
+DELTA_SUFFIX = ".dlt"
+
+
+def encode_delta(added: Mapping[str, Sequence[int]], removed: Mapping[str, Sequence[int]]) -> bytes:
+    """Serialise one delta; IDs in each list need not be sorted."""
+    def block(postings: Mapping[str, Sequence[int]]) -> bytes:
+        return TagIndex({tag: sorted(set(ids)) for tag, ids in postings.items() if ids}).to_bytes()
+
+    first = block(added)
+    out = bytearray(DELTA_MAGIC)
+    write_varint(out, len(first))
+    out += first
+    out += block(removed)
+    return bytes(out)
+
+
+class DeltaSegment:
+    """Decoded view of one delta file."""
+
+    def __init__(self, data: bytes):
+        if data[:len(DELTA_MAGIC)] != DELTA_MAGIC:
+            raise ValueError("not a delta segment (bad magic)")
+        size, pos = read_varint(data, len(DELTA_MAGIC))
+        self.added = TagIndexReader(data[pos:pos + size])
+        self.removed = TagIndexReader(data[pos + size:])
+
+    def tags(self) -> set[str]:
+        return set(self.added.tags()) | set(self.removed.tags())
+
+    def apply(self, tag: str, ids: list[int]) -> list[int]:
+        """``ids`` (sorted) with this delta's changes for ``tag`` applied."""
+        added = self.added.postings(tag)
+        removed = self.removed.postings(tag)
+        if not (added or removed):
+            return ids
+        result = set(ids).difference(removed)
+        result.update(added)
+        return sorted(result)
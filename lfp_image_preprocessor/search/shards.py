@@ -0,0 +1,366 @@
+"""Splitting the tag index into lazily fetched, content-addressed shards.
+
+Each shard is an ordinary binary tag index (see :mod:`.index`) holding a
+subset of the tags, stored as ``<sha256 prefix>.idx`` so it can be cached
+forever. A small ``index.json`` root manifest tells the client which shard
+holds a tag:
+
+``prefix`` partitioning
+    Tags stay in name order and are cut into consecutive runs of about
+    ``target_bytes``. The manifest lists each shard's first tag; a client
+    binary-searches it. Tags sharing a prefix land in the same shard, which
+    suits autocomplete.
+``hash`` partitioning
+    A tag lives in shard ``fnv1a32(utf8 name) % len(shards)``. Shard sizes
+    are more even, but related tags scatter.
+
+Only the root manifest changes name-stably between builds.
+
+Incremental updates (:func:`apply_delta`) leave the shards alone and append
+a :mod:`delta segment <.segments>` to each touched shard's entry; the
+manifest then has version 2 and entries may carry ``"deltas"``. Once a
+shard's deltas pass ``compact_bytes`` or ``max_deltas``,
+:func:`compact_shards` folds them into a fresh shard, LSM-style, splitting
+it if it has grown past twice the target size (prefix partitioning only).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .index import TagIndex, TagIndexReader, encode_postings
+from .roaring import RoaringBitmap
+from .segments import DELTA_SUFFIX, DeltaSegment, encode_delta
+
+ROOT_NAME = "index.json"
+PARTITIONS = ("prefix", "hash")
+
+
+def fnv1a32(text: str) -> int:
+    """32-bit FNV-1a over UTF-8; trivial to reproduce in the browser."""
+    value = 0x811C9DC5
+    for byte in text.encode():
+        value = ((value ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return value
+
+
+@dataclass(frozen=True)
+class ShardOptions:
+    target_bytes: int = 32 * 1024
+    partition: str = "prefix"
+    compact_bytes: int = 8 * 1024
+    """A shard is compacted once its deltas add up to this many bytes ..."""
+    max_deltas: int = 8
+    """... or once it has this many of them."""
+
+    def __post_init__(self) -> None:
+        if self.partition not in PARTITIONS:
+            raise ValueError(f"partition must be one of {PARTITIONS}")
+
+
+@dataclass
+class ShardReport:
+    shards: int = 0
+    total_bytes: int = 0
+    largest_bytes: int = 0
+    queries: int = 0
+    mean_shards_per_query: float = 0.0
+    """Average number of distinct shards the sample queries needed."""
+
+
+def _estimated_size(tag: str, ids: list[int]) -> int:
+    return len(tag.encode()) + len(encode_postings(ids)[0]) + 8
+
+
+def partition(index: TagIndex, options: ShardOptions = ShardOptions()) -> list[dict[str, list[int]]]:
+    """Group the tags of ``index`` into shards according to ``options``."""
+    if options.partition == "hash":
+        total = sum(_estimated_size(tag, ids) for tag, ids in index.items())
+        count = max(1, -(-total // options.target_bytes))
+        groups: list[dict[str, list[int]]] = [{} for _ in range(count)]
+        for tag, ids in index.items():
+            groups[fnv1a32(tag) % count][tag] = ids
+        return groups
+
+    groups = []
+    current: dict[str, list[int]] = {}
+    size = 0
+    for tag, ids in index.items():
+        cost = _estimated_size(tag, ids)
+        if current and size + cost > options.target_bytes:
+            groups.append(current)
+            current, size = {}, 0
+        current[tag] = ids
+        size += cost
+    if current or not groups:
+        groups.append(current)
+    return groups
+
+
+def write_shards(
+    index: TagIndex,
+    directory: str | os.PathLike[str],
+    options: ShardOptions = ShardOptions(),
+    queries: Iterable[Iterable[str]] = (),
+    prune: bool = False,
+) -> ShardReport:
+    """Write the shards and root manifest of ``index`` into ``directory``.
+
+    ``queries`` is a sample of typical queries, used only to report how many
+    shards a query touches. With ``prune``, shard files no longer referenced
+    by the new manifest are deleted; leave it off while clients may still
+    hold the previous manifest.
+    """
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    report = ShardReport()
+    entries: list[dict[str, Any]] = []
+    for group in partition(index, options):
+        data = TagIndex(group).to_bytes()
+        name = hashlib.sha256(data).hexdigest()[:16] + ".idx"
+        path = root / name
+        if not path.exists():
+            path.write_bytes(data)
+        entry: dict[str, Any] = {"file": name, "bytes": len(data), "tags": len(group)}
+        if options.partition == "prefix":
+            entry["first"] = next(iter(group), "")
+        entries.append(entry)
+        report.shards += 1
+        report.total_bytes += len(data)
+        report.largest_bytes = max(report.largest_bytes, len(data))
+
+    manifest = {"version": 1, "partition": options.partition, "shards": entries}
+    if options.partition == "hash":
+        manifest["hash"] = "fnv1a32"
+    _write_manifest(root, manifest)
+
+    if prune:
+        keep = {entry["file"] for entry in entries}
+        for stale in [*root.glob("*.idx"), *root.glob("*" + DELTA_SUFFIX)]:
+            if stale.name not in keep:
+                stale.unlink()
+
+    sharded = ShardedIndex(manifest, lambda name: b"")
+    touched = [len({sharded.shard_for(tag) for tag in query}) for query in map(set, queries) if query]
+    if touched:
+        report.queries = len(touched)
+        report.mean_shards_per_query = sum(touched) / len(touched)
+    return report
+
+
+def _read_manifest(root: Path) -> dict[str, Any]:
+    return json.loads((root / ROOT_NAME).read_text())
+
+
+def _referenced(manifest: dict[str, Any]) -> set[str]:
+    """Shard and delta file names ``manifest`` points at."""
+    names = {entry["file"] for entry in manifest["shards"]}
+    names.update(name for entry in manifest["shards"] for name in entry.get("deltas", ()))
+    return names
+
+
+def _write_manifest(root: Path, manifest: dict[str, Any]) -> None:
+    """Replace the root manifest and stamp the files it stops referencing.
+
+    The mtime of a retired file is set to now, so that the grace period of
+    :func:`prune_shards` counts from its retirement, not its creation.
+    """
+    previous = _referenced(_read_manifest(root)) if (root / ROOT_NAME).exists() else set()
+    tmp = root / (ROOT_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, separators=(",", ":")))
+    os.replace(tmp, root / ROOT_NAME)
+    for name in previous - _referenced(manifest):
+        try:
+            os.utime(root / name)
+        except FileNotFoundError:
+            pass
+
+
+def _store(root: Path, data: bytes, suffix: str) -> str:
+    name = hashlib.sha256(data).hexdigest()[:16] + suffix
+    if not (root / name).exists():
+        (root / name).write_bytes(data)
+    return name
+
+
+def apply_delta(
+    directory: str | os.PathLike[str],
+    added: Mapping[str, Sequence[int]],
+    removed: Mapping[str, Sequence[int]],
+    lock: AbstractContextManager[Any] = nullcontext(),
+) -> list[int]:
+    """Record an update as one delta per touched shard; returns their numbers.
+
+    ``lock`` serialises manifest updates with a concurrent
+    :func:`compact_shards`.
+    """
+    root = Path(directory)
+    with lock:
+        manifest = _read_manifest(root)
+        sharded = ShardedIndex(manifest, lambda name: b"")
+        groups: dict[int, tuple[dict[str, Sequence[int]], dict[str, Sequence[int]]]] = {}
+        for side, postings in enumerate((added, removed)):
+            for tag, ids in postings.items():
+                if ids:
+                    groups.setdefault(sharded.shard_for(tag), ({}, {}))[side][tag] = ids
+        for number, (shard_added, shard_removed) in sorted(groups.items()):
+            data = encode_delta(shard_added, shard_removed)
+            entry = manifest["shards"][number]
+            entry.setdefault("deltas", []).append(_store(root, data, DELTA_SUFFIX))
+            entry["delta_bytes"] = entry.get("delta_bytes", 0) + len(data)
+        if groups:
+            manifest["version"] = 2
+            _write_manifest(root, manifest)
+    return sorted(groups)
+
+
+def _needs_compaction(entry: dict[str, Any], options: ShardOptions) -> bool:
+    deltas = entry.get("deltas", ())
+    return bool(deltas) and (entry.get("delta_bytes", 0) >= options.compact_bytes or len(deltas) >= options.max_deltas)
+
+
+def compact_shards(
+    directory: str | os.PathLike[str],
+    options: ShardOptions = ShardOptions(),
+    lock: AbstractContextManager[Any] = nullcontext(),
+    force: bool = False,
+) -> int:
+    """Fold the deltas of every shard past its threshold into a new shard.
+
+    The merge itself runs outside ``lock``; deltas appended meanwhile are
+    kept on top of the new shard. Returns the number of shards compacted.
+    """
+    root = Path(directory)
+    with lock:
+        snapshot = _read_manifest(root)
+    plans: list[tuple[str, int, list[dict[str, Any]]]] = []
+    for entry in snapshot["shards"]:
+        if not (force and entry.get("deltas")) and not _needs_compaction(entry, options):
+            continue
+        base = TagIndexReader((root / entry["file"]).read_bytes())
+        deltas = [DeltaSegment((root / name).read_bytes()) for name in entry["deltas"]]
+        tags = set(base.tags()).union(*(delta.tags() for delta in deltas))
+        merged: dict[str, list[int]] = {}
+        for tag in tags:
+            ids = base.postings(tag)
+            for delta in deltas:
+                ids = delta.apply(tag, ids)
+            if ids:
+                merged[tag] = ids
+        index = TagIndex(merged)
+        groups = [merged]
+        if snapshot["partition"] == "prefix" and len(index.to_bytes()) > 2 * options.target_bytes:
+            groups = partition(index, options)
+        pieces = []
+        for number, group in enumerate(groups):
+            data = TagIndex(group).to_bytes()
+            piece: dict[str, Any] = {"file": _store(root, data, ".idx"), "bytes": len(data), "tags": len(group)}
+            if "first" in entry:
+                piece["first"] = entry["first"] if number == 0 else next(iter(TagIndex(group).tags()))
+            pieces.append(piece)
+        plans.append((entry["file"], len(entry["deltas"]), pieces))
+
+    compacted = 0
+    with lock:
+        manifest = _read_manifest(root)
+        for file, folded, pieces in plans:
+            position = next((i for i, e in enumerate(manifest["shards"]) if e["file"] == file), None)
+            if position is None:
+                continue
+            entry = manifest["shards"][position]
+            remaining = entry.get("deltas", [])[folded:]
+            if remaining and len(pieces) > 1:
+                continue  # later deltas span the split; retry next time
+            if remaining:
+                pieces[0]["deltas"] = remaining
+                pieces[0]["delta_bytes"] = sum((root / name).stat().st_size for name in remaining)
+            manifest["shards"][position:position + 1] = pieces
+            compacted += 1
+        if compacted:
+            if not any(entry.get("deltas") for entry in manifest["shards"]):
+                manifest["version"] = 1
+            _write_manifest(root, manifest)
+    return compacted
+
+
+def prune_shards(directory: str | os.PathLike[str], older_than: float = 24 * 3600) -> int:
+    """Delete shard and delta files the manifest no longer references.
+
+    Files retired less than ``older_than`` seconds ago are kept for clients
+    still holding a previous manifest.
+    """
+    root = Path(directory)
+    keep = _referenced(_read_manifest(root))
+    cutoff = time.time() - older_than
+    removed = 0
+    for path in [*root.glob("*.idx"), *root.glob("*" + DELTA_SUFFIX)]:
+        if path.name not in keep and path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+class ShardedIndex:
+    """Client-side view: fetches and caches only the shards a query needs.
+
+    A shard's deltas are fetched along with it and applied to every lookup.
+    """
+
+    def __init__(self, manifest: dict[str, Any], fetch: Callable[[str], bytes]):
+        if manifest.get("version") not in (1, 2):
+            raise ValueError("unsupported shard manifest version")
+        self.partition = manifest["partition"]
+        self._files = [entry["file"] for entry in manifest["shards"]]
+        self._firsts = [entry.get("first", "") for entry in manifest["shards"]]
+        self._delta_files = [entry.get("deltas", []) for entry in manifest["shards"]]
+        self._fetch = fetch
+        self._loaded: dict[int, TagIndexReader] = {}
+        self._deltas: dict[int, list[DeltaSegment]] = {}
+
+    @classmethod
+    def open(cls, directory: str | os.PathLike[str]) -> ShardedIndex:
+        root = Path(directory)
+        manifest = json.loads((root / ROOT_NAME).read_text())
+        return cls(manifest, lambda name: (root / name).read_bytes())
+
+    def shard_for(self, tag: str) -> int:
+        if self.partition == "hash":
+            return fnv1a32(tag) % len(self._files)
+        return max(bisect_right(self._firsts, tag) - 1, 0)
+
+    @property
+    def fetched(self) -> int:
+        """Number of shards downloaded so far."""
+        return len(self._loaded)
+
+    def _shard(self, number: int) -> TagIndexReader:
+        if number not in self._loaded:
+            self._loaded[number] = TagIndexReader(self._fetch(self._files[number]))
+            self._deltas[number] = [DeltaSegment(self._fetch(name)) for name in self._delta_files[number]]
+        return self._loaded[number]
+
+    def postings(self, tag: str) -> list[int]:
+        number = self.shard_for(tag)
+        ids = self._shard(number).postings(tag)
+        for delta in self._deltas[number]:
+            ids = delta.apply(tag, ids)
+        return ids
+
+    def bitmap(self, tag: str) -> RoaringBitmap:
+        number = self.shard_for(tag)
+        shard = self._shard(number)
+        if self._deltas[number]:
+            return RoaringBitmap.from_sorted(self.postings(tag))
+        return shard.bitmap(tag)
+
+    def is_roaring(self, tag: str) -> bool:
+        return self._shard(self.shard_for(tag)).is_roaring(tag)
@@ -0,0 +1,58 @@
+"""LEB128 varints and delta coding of sorted integer lists."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    """Append ``value`` (non-negative) as an unsigned LEB128 varint."""
+    if value < 0:
+        raise ValueError("varints must be non-negative")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes | memoryview, pos: int) -> tuple[int, int]:
+    """Decode one varint at ``pos``; return ``(value, next position)``."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_deltas(ids: Iterable[int]) -> bytes:
+    """Varint-pack a strictly increasing sequence as first value + gaps."""
+    out = bytearray()
+    previous = -1
+    for value in ids:
+        if value <= previous:
+            raise ValueError("posting lists must be strictly increasing")
+        write_varint(out, value - previous - 1)
+        previous = value
+    return bytes(out)
+
+
+def decode_deltas(data: bytes | memoryview, count: int | None = None) -> list[int]:
+    """Inverse of :func:`encode_deltas`; stops after ``count`` values if given."""
+    ids: list[int] = []
+    append = ids.append
+    value = -1
+    gap = shift = 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        value += gap + 1
+        append(value)
+        if count is not None and len(ids) == count:
+            break
+        gap = shift = 0
+    return ids
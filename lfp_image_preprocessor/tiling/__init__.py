@@ -0,0 +1,69 @@
+"""Tile-pyramid generation for original photos."""
+
+from .bigtiff import TiffSink, tiff_options
+from .encode import EXTENSIONS, EncodedTile, SerialEncoder, UniformCache, encode_tile
+from .layouts import LAYOUTS, LayoutSink
+from .manifest import BuildManifest, LibraryReport, tile_library
+from .pack import PackEntry, PackReader, PackSink, extract_pack
+from .parallel import ParallelEncoder
+from .phash import HashCollector, ImageHashes, dhash, hex_hash, phash
+from .placeholder import Placeholder, PlaceholderCollector, blurhash, dominant_colour
+from .pyramid import PyramidTiler, Tile, TileOptions, level_sizes
+from .resample import FILTERS, halve
+from .sink import DirectorySink, TileSink
+from .source import PillowSource, PNMSource, StripSource, TiffSource, open_source
+from .tiler import TileEncoder, TileStats, tile_image, tile_source
+from .variants import Variant, VariantCollector, plan_variants
+from .writer import FSYNC_MODES, ThreadedSink, TileFiles
+
+__all__ = [
+    "EXTENSIONS",
+    "FILTERS",
+    "FSYNC_MODES",
+    "LAYOUTS",
+    "BuildManifest",
+    "DirectorySink",
+    "EncodedTile",
+    "HashCollector",
+    "ImageHashes",
+    "LayoutSink",
+    "LibraryReport",
+    "PNMSource",
+    "PackEntry",
+    "PackReader",
+    "PackSink",
+    "ParallelEncoder",
+    "PillowSource",
+    "Placeholder",
+    "PlaceholderCollector",
+    "PyramidTiler",
+    "SerialEncoder",
+    "StripSource",
+    "ThreadedSink",
+    "TiffSink",
+    "TiffSource",
+    "Tile",
+    "TileEncoder",
+    "TileFiles",
+    "TileOptions",
+    "TileSink",
+    "TileStats",
+    "UniformCache",
+    "Variant",
+    "VariantCollector",
+    "blurhash",
+    "dominant_colour",
+    "dhash",
+    "encode_tile",
+    "extract_pack",
+    "halve",
+    "hex_hash",
+    "level_sizes",
+    "open_source",
+    "phash",
+    "plan_variants",
+    "tiff_options",
+    "tile_image",
+    "tile_library",
+    "tile_source",
+]
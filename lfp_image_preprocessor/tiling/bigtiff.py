@@ -0,0 +1,185 @@
+"""Pyramidal tiled BigTIFF output.
+
+:class:`TiffSink` writes one ``.tif`` per original: the full-resolution
+level in IFD0 and every reduced level down to the one that fits in a
+single tile as a SubIFD of it (``NewSubfileType`` 1), the layout print and
+slide viewers (libtiff, GDAL, OpenSlide, vips) read as a pyramid.
+
+Encoded tiles are appended to the file as they arrive from the tiler, in
+whatever order the levels produce them; only each level's offset and byte
+count arrays are kept in memory. :meth:`TiffSink.close` writes the IFDs
+after the tile data and patches the header to point at IFD0. Each tile is a
+complete JPEG (``Compression`` 7, YCbCr 4:2:0 as Pillow encodes it) or WebP
+(``Compression`` 50001, as libtiff and GDAL define it) stream. TIFF tiles
+all have the same size, so the tiles must be cut with
+:attr:`~.pyramid.TileOptions.pad_edges` and a tile size divisible by 16.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from .pyramid import TileOptions, grid_size, level_sizes
+from .writer import fsync_path
+
+log = logging.getLogger(__name__)
+
+SUFFIX = ".tif"
+COMPRESSION = {"jpeg": 7, "webp": 50001}
+SOFTWARE = b"lfp-image-preprocessor\x00"
+
+_SHORT, _ASCII, _LONG, _LONG8, _IFD8 = 3, 2, 4, 16, 18
+_FORMATS = {_SHORT: "H", _ASCII: "B", _LONG: "I", _LONG8: "Q", _IFD8: "Q"}
+_ENTRY = struct.Struct("<HHQ8s")
+
+
+def tiff_options(options: TileOptions) -> TileOptions:
+    """``options`` with edge padding on; raises if TIFF cannot hold the tiles."""
+    if options.format not in COMPRESSION:
+        raise ValueError(f"TIFF output supports {sorted(COMPRESSION)} tiles, not {options.format}")
+    if options.tile_size % 16 or options.overlap:
+        raise ValueError("TIFF output needs a tile size divisible by 16 and no overlap")
+    return dataclasses.replace(options, pad_edges=True)
+
+
+def _align(fh: BinaryIO) -> int:
+    """Pad to the word boundary TIFF requires for IFDs and values; return the offset."""
+    if fh.tell() % 2:
+        fh.write(b"\x00")
+    return fh.tell()
+
+
+class _Level:
+    def __init__(self, width: int, height: int, tile_size: int):
+        self.width = width
+        self.height = height
+        self.cols, rows = grid_size(width, height, tile_size)
+        self.offsets = [0] * (self.cols * rows)
+        self.counts = [0] * (self.cols * rows)
+
+
+class TiffSink:
+    """:class:`~.sink.TileSink` that streams a pyramid into one BigTIFF file.
+
+    Like :class:`~.pack.PackSink`, the file is written under a temporary
+    name, synced unless ``fsync`` is ``"off"``, and renamed into place by
+    :meth:`close`.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], options: TileOptions, fsync: str = "off"):
+        if options != tiff_options(options):
+            raise ValueError("tile with tiff_options() so that edge tiles are padded")
+        self.path = Path(path)
+        self.options = options
+        self.fsync = fsync
+        self._fh: BinaryIO | None = None
+        self._levels: dict[int, _Level] = {}
+        self._bottom = 0
+        self._bands = 0
+
+    @property
+    def _tmp_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".tmp")
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        size = self.options.tile_size
+        sizes = level_sizes(width, height)
+        # Levels below the largest that fits in one tile add nothing to a
+        # viewer and get no IFD. Their few tiles are still written, since a
+        # deduplicated tile of a larger level may alias one of them.
+        self._bottom = max(level for level, (w, h) in enumerate(sizes) if w <= size and h <= size or level == 0)
+        self._levels = {level: _Level(w, h, size) for level, (w, h) in enumerate(sizes)}
+        self._bands = bands
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self._tmp_path, "wb")
+        # BigTIFF header; the IFD0 offset is patched in by close().
+        self._fh.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        assert self._fh is not None, "begin() was not called"
+        target = self._levels[level]
+        index = row * target.cols + col
+        target.offsets[index] = self._fh.tell()
+        target.counts[index] = len(data)
+        self._fh.write(data)
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        """Point the tile at the bytes of ``target``; TIFF allows shared offsets."""
+        source, dest = self._levels[target[0]], self._levels[level]
+        index = row * dest.cols + col
+        other = target[2] * source.cols + target[1]
+        dest.offsets[index], dest.counts[index] = source.offsets[other], source.counts[other]
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        log.warning("%s: TIFF output does not store variants; dropping the %dpx one", self.path, width)
+
+    def close(self) -> None:
+        fh = self._fh
+        assert fh is not None, "begin() was not called"
+        top = max(self._levels)
+        reduced = [self._write_ifd(fh, level, None) for level in range(top - 1, self._bottom - 1, -1)]
+        first = self._write_ifd(fh, top, reduced)
+        fh.seek(8)
+        fh.write(struct.pack("<Q", first))
+        if self.fsync != "off":
+            fh.flush()
+            os.fsync(fh.fileno())
+        fh.close()
+        self._fh = None
+        os.replace(self._tmp_path, self.path)
+        if self.fsync != "off":
+            fsync_path(self.path.parent)
+
+    def abort(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self._tmp_path.unlink(missing_ok=True)
+
+    def _tags(self, level: int, sub_ifds: list[int] | None) -> list[tuple[int, int, list[int] | bytes]]:
+        info = self._levels[level]
+        jpeg = self.options.format == "jpeg"
+        # Pillow writes grey JPEG as grey, everything else as 3 or 4 band.
+        samples = 1 if jpeg and self._bands == 1 else 4 if not jpeg and self._bands == 4 else 3
+        photometric = 1 if samples == 1 else 6 if jpeg else 2
+        tags: list[tuple[int, int, list[int] | bytes]] = [
+            (254, _LONG, [0 if sub_ifds is not None else 1]),
+            (256, _LONG, [info.width]),
+            (257, _LONG, [info.height]),
+            (258, _SHORT, [8] * samples),
+            (259, _SHORT, [COMPRESSION[self.options.format]]),
+            (262, _SHORT, [photometric]),
+            (277, _SHORT, [samples]),
+            (284, _SHORT, [1]),
+            (305, _ASCII, SOFTWARE),
+            (322, _LONG, [self.options.tile_size]),
+            (323, _LONG, [self.options.tile_size]),
+            (324, _LONG8, info.offsets),
+            (325, _LONG8, info.counts),
+        ]
+        if sub_ifds:
+            tags.append((330, _IFD8, sub_ifds))
+        if samples == 4:
+            tags.append((338, _SHORT, [2]))
+        if photometric == 6:
+            tags.append((530, _SHORT, [2, 2]))
+        return tags
+
+    def _write_ifd(self, fh: BinaryIO, level: int, sub_ifds: list[int] | None) -> int:
+        """Append the IFD of ``level`` (out-of-line values first) and return its offset."""
+        entries = []
+        for tag, kind, values in self._tags(level, sub_ifds):
+            raw = values if isinstance(values, bytes) else struct.pack(f"<{len(values)}{_FORMATS[kind]}", *values)
+            if len(raw) > 8:
+                offset = _align(fh)
+                fh.write(raw)
+                raw = struct.pack("<Q", offset)
+            entries.append(_ENTRY.pack(tag, kind, len(values), raw.ljust(8, b"\x00")))
+        offset = _align(fh)
+        fh.write(struct.pack("<Q", len(entries)) + b"".join(entries) + struct.pack("<Q", 0))
+        return offset
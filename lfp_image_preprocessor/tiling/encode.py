@@ -0,0 +1,195 @@
+"""Tile encoders.
+
+PNG is written with the standard library alone; JPEG and WebP go through
+Pillow.
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+import time
+import zlib
+
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+import numpy as np
+
+from .._optional import require
+from .pyramid import Tile, TileOptions
+from .quality import sampled, tile_quality
+
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+
+_PNG_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+
+
+def encode_tile(pixels: np.ndarray, fmt: str, quality: int = 85) -> bytes:
+    """Encode a ``(rows, cols, bands)`` uint8 array as ``fmt``."""
+    if fmt == "png":
+        return encode_png(pixels)
+    if fmt in ("jpeg", "webp"):
+        return _encode_pillow(pixels, fmt, quality)
+    raise ValueError(f"unknown tile format {fmt!r}")
+
+
+PADDED_LAYOUTS = ("xyz", "tms")
+"""Layouts whose clients draw every tile at the full tile size (see :mod:`.layouts`)."""
+
+
+def needs_padding(pixels: np.ndarray, options: TileOptions) -> bool:
+    """Whether ``pixels`` is a short edge tile that a padded layout wants at full size."""
+    size = options.tile_size
+    return pixels.shape[:2] != (size, size) and not set(options.layouts).isdisjoint(PADDED_LAYOUTS)
+
+
+def pad_tile(pixels: np.ndarray, options: TileOptions) -> np.ndarray:
+    """Grow an edge tile to the full tile size: black for JPEG, transparent otherwise."""
+    rows, cols, bands = pixels.shape
+    size = options.tile_size
+    if options.format == "jpeg":
+        keep = 1 if bands < 3 else 3
+        out = np.zeros((size, size, keep), dtype=np.uint8)
+        out[:rows, :cols] = pixels[:, :, :keep]
+        return out
+    out = np.zeros((size, size, 4), dtype=np.uint8)
+    out[:rows, :cols, :3] = pixels[:, :, :3] if bands >= 3 else pixels[:, :, :1]
+    out[:rows, :cols, 3] = pixels[:, :, 3] if bands == 4 else 255
+    return out
+
+
+def encode_with_options(
+    pixels: np.ndarray, options: TileOptions, col: int, row: int
+) -> tuple[bytes, int, int, bytes | None]:
+    """Encode a tile at its :func:`~.quality.tile_quality`.
+
+    Returns the bytes, the quality used, for an adaptive encode of a
+    :func:`~.quality.sampled` tile its size at the uniform
+    ``options.quality`` (else 0), and, for a tile that
+    :func:`needs_padding`, its :func:`pad_tile` form encoded at the same
+    quality (else ``None``).
+    """
+    quality = tile_quality(pixels, options)
+    data = encode_tile(pixels, options.format, quality)
+    baseline = 0
+    if options.adaptive_quality is not None and options.format != "png" and sampled(col, row):
+        same = quality == options.quality
+        baseline = len(data) if same else len(encode_tile(pixels, options.format, options.quality))
+    padded = encode_tile(pad_tile(pixels, options), options.format, quality) if needs_padding(pixels, options) else None
+    return data, quality, baseline, padded
+
+
+class EncodedTile(NamedTuple):
+    level: int
+    col: int
+    row: int
+    data: bytes
+    seconds: float = 0.0
+    """Time spent encoding; zero when ``reused``."""
+    reused: bool = False
+    """Bytes came from :class:`UniformCache` instead of the encoder."""
+    quality: int = 0
+    """Quality the tile was encoded at; zero when ``reused``."""
+    baseline_bytes: int = 0
+    """Size at the uniform quality, for the sampled tiles of an adaptive encode."""
+    padded: bytes | None = None
+    """The full-size form of an edge tile, when a padded layout is requested."""
+
+
+def uniform_colour(pixels: np.ndarray) -> bytes | None:
+    """The colour of a single-colour tile, or ``None`` if it has detail.
+
+    A couple of probe pixels are compared first so that ordinary tiles are
+    usually rejected without scanning them.
+    """
+    first = pixels[0, 0]
+    rows, cols = pixels.shape[:2]
+    if (pixels[-1, -1] != first).any() or (pixels[rows // 2, cols // 2] != first).any():
+        return None
+    if (pixels != first).any():
+        return None
+    return first.tobytes()
+
+
+class UniformCache:
+    """Encoded bytes of single-colour tiles, keyed by shape, colour and encode settings.
+
+    Encoders are deterministic, so a flat tile of a colour and shape seen
+    before can skip encoding entirely.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._cache: dict[tuple[object, ...], bytes] = {}
+
+    @staticmethod
+    def key(pixels: np.ndarray, options: TileOptions) -> tuple[object, ...] | None:
+        colour = uniform_colour(pixels)
+        if colour is None or needs_padding(pixels, options):
+            # The cache holds one encoding; padded edge tiles need two.
+            return None
+        return pixels.shape, colour, options.format, options.quality, options.adaptive_quality
+
+    def get(self, key: tuple[object, ...]) -> bytes | None:
+        return self._cache.get(key)
+
+    def put(self, key: tuple[object, ...], data: bytes) -> None:
+        if len(self._cache) >= self.capacity:
+            self._cache.clear()
+        self._cache[key] = data
+
+
+class SerialEncoder:
+    """Encodes tiles one after another in the calling process."""
+
+    def __init__(self, skip_uniform: bool = False):
+        self._uniform = UniformCache() if skip_uniform else None
+
+    def encode(self, tiles: Iterable[Tile], options: TileOptions) -> Iterator[EncodedTile]:
+        for tile in tiles:
+            key = self._uniform.key(tile.pixels, options) if self._uniform else None
+            if key is not None and (data := self._uniform.get(key)) is not None:
+                yield EncodedTile(tile.level, tile.col, tile.row, data, reused=True)
+                continue
+            started = time.perf_counter()
+            data, quality, baseline, padded = encode_with_options(tile.pixels, options, tile.col, tile.row)
+            seconds = time.perf_counter() - started
+            if key is not None:
+                self._uniform.put(key, data)
+            yield EncodedTile(tile.level, tile.col, tile.row, data, seconds, quality=quality, baseline_bytes=baseline,
+                              padded=padded)
+
+    def close(self) -> None:
+        pass
+
+
+def encode_png(pixels: np.ndarray, level: int = 6) -> bytes:
+    """Minimal PNG writer (8-bit, no interlace, filter type 0 on every row)."""
+    rows, cols, bands = pixels.shape
+    raw = np.zeros((rows, cols * bands + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(rows, cols * bands)
+    header = struct.pack(">IIBBBBB", cols, rows, 8, _PNG_COLOR_TYPES[bands], 0, 0, 0)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    crc = zlib.crc32(body, zlib.crc32(kind))
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", crc)
+
+
+def _encode_pillow(pixels: np.ndarray, fmt: str, quality: int) -> bytes:
+    image_mod = require("PIL.Image", "tiling")
+    if pixels.shape[2] == 1:
+        pixels = pixels[:, :, 0]
+    image = image_mod.fromarray(np.ascontiguousarray(pixels))
+    if fmt == "jpeg" and image.mode == "RGBA":
+        image = image.convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue()
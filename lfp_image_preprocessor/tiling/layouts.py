@@ -0,0 +1,225 @@
+"""Several viewer layouts written from one pyramid.
+
+:class:`LayoutSink` lays the same encoded tiles out for each requested
+viewer, under one directory per layout:
+
+* ``dzi``: Deep Zoom for OpenSeadragon, ``dzi/image.dzi`` plus
+  ``dzi/image_files/<level>/<col>_<row>.<ext>``.
+* ``iiif``: a IIIF Image API 3.0 level 0 (static) service,
+  ``iiif/info.json`` plus ``iiif/<x>,<y>,<w>,<h>/<w>,<h>/0/default.<ext>``
+  with the region in full-resolution pixels. The ``<w>,`` size form of
+  Image API 2 and, for levels that fit in one tile, the ``full`` region are
+  linked too, since viewers differ in which they request.
+* ``xyz`` and ``tms``: slippy-map ``<z>/<x>/<y>.<ext>`` tiles with a
+  ``tilejson.json``. Zoom 0 is the largest level that fits in one tile;
+  ``tms`` counts rows from the bottom of the ``2**z`` grid.
+
+A tile is written once, for the first layout that wants it, and every other
+path of the same bytes is a hard link to that file. Map clients draw every
+tile at the full tile size, so the right and bottom edge tiles of the
+``xyz`` and ``tms`` layouts are stored in a second form: the encoder pads
+the raw tile with black for JPEG and with transparency otherwise, and hands
+both encodings over (see :func:`~.encode.pad_tile`). IIIF and slippy maps
+have no notion of overlap, so they need tiles cut without it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from .encode import EXTENSIONS, PADDED_LAYOUTS
+from .pyramid import TileOptions, level_sizes
+from .writer import TileFiles
+
+LAYOUTS = ("dzi", "iiif", *PADDED_LAYOUTS)
+
+_DZI = """<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{format}" Overlap="{overlap}" TileSize="{size}">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+"""
+
+
+def check_layouts(options: TileOptions) -> None:
+    """Raise ``ValueError`` unless ``options`` can produce every requested layout."""
+    unknown = sorted(set(options.layouts) - set(LAYOUTS))
+    if unknown or not options.layouts:
+        raise ValueError(f"layouts must be some of {LAYOUTS}, not {unknown or 'none'}")
+    if options.overlap and set(options.layouts) - {"dzi"}:
+        raise ValueError("only the dzi layout supports overlap")
+    if options.pad_edges:
+        raise ValueError("layouts are cut from unpadded tiles")
+
+
+class LayoutSink:
+    """:class:`~.sink.TileSink` that writes ``options.layouts`` under ``root``.
+
+    ``name`` is the image's path relative to the web root the output is
+    served from; with ``options.iiif_base`` it makes up the IIIF service id.
+    Variants go to ``<root>/variants/<width>.<ext>`` and ``fsync`` applies,
+    as with :class:`~.sink.DirectorySink`.
+    """
+
+    def __init__(self, root: str | os.PathLike[str], options: TileOptions, name: str = "", fsync: str = "off"):
+        check_layouts(options)
+        self.path = Path(root)
+        self.options = options
+        self.name = name
+        self.extension = EXTENSIONS[options.format]
+        self._files = TileFiles(fsync)
+        self._sizes: list[tuple[int, int]] = []
+        self._bottom = 0
+        self._unplaced: dict[tuple[int, int, int], bytes] = {}
+        self._padded: dict[tuple[int, int, int], bytes] = {}
+        self._padded_below: dict[tuple[int, int, int], bytes] = {}
+        self.padded = 0
+        """Edge tiles written at the full tile size for the map layouts."""
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        size = self.options.tile_size
+        self._sizes = level_sizes(width, height)
+        self._bottom = max(level for level, (w, h) in enumerate(self._sizes) if w <= size and h <= size or level == 0)
+
+    def _paths(self, layout: str, level: int, col: int, row: int) -> list[Path]:
+        size, ext = self.options.tile_size, self.extension
+        if layout == "dzi":
+            return [self.path / "dzi" / "image_files" / str(level) / f"{col}_{row}.{ext}"]
+        if layout == "iiif":
+            top = len(self._sizes) - 1
+            scale = 1 << (top - level)
+            full_width, full_height = self._sizes[top]
+            level_width, level_height = self._sizes[level]
+            x, y = col * size * scale, row * size * scale
+            region = f"{x},{y},{min(size * scale, full_width - x)},{min(size * scale, full_height - y)}"
+            width, height = min(size, level_width - col * size), min(size, level_height - row * size)
+            regions = [region] + (["full"] if level <= self._bottom else [])
+            sizes = [f"{width},{height}", f"{width},"] + (["max"] if level == top and level <= self._bottom else [])
+            root = self.path / "iiif"
+            return [root / region / size_ / "0" / f"default.{ext}" for region in regions for size_ in sizes]
+        if level < self._bottom:
+            return []
+        zoom = level - self._bottom
+        y = row if layout == "xyz" else (1 << zoom) - 1 - row
+        return [self.path / layout / str(zoom) / str(col) / f"{y}.{ext}"]
+
+    def _partial(self, level: int, col: int, row: int) -> bool:
+        size = self.options.tile_size
+        width, height = self._sizes[level]
+        return (col + 1) * size > width or (row + 1) * size > height
+
+    def _put(self, path: Path, source: Path | None, data: bytes) -> Path:
+        """Link ``path`` to ``source``, or write ``data`` there if there is none."""
+        if source is None:
+            self._files.write(path, data)
+        else:
+            self._files.link(source, path)
+        return path
+
+    def write_padded(self, level: int, col: int, row: int, data: bytes) -> None:
+        self._padded[level, col, row] = data
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        # One file per distinct content: the tile as cut, and its padded form.
+        padded = self._padded.pop((level, col, row), None)
+        sources: dict[bool, Path | None] = {False: None, True: None}
+        for layout in self.options.layouts:
+            pad = layout in PADDED_LAYOUTS and self._partial(level, col, row)
+            for path in self._paths(layout, level, col, row):
+                if pad and padded is None:
+                    raise ValueError(f"edge tile {level}/{col}_{row} arrived without its padded form")
+                sources[pad] = self._put(path, sources[pad], padded if pad else data)
+        self.padded += sources[True] is not None
+        if padded is not None and level < self._bottom:
+            # Kept for aliases at the map zooms; these levels are one small tile each.
+            self._padded_below[level, col, row] = padded
+        if sources == {False: None, True: None}:
+            # Below every layout's smallest level, but possibly an alias target.
+            self._unplaced[level, col, row] = data
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        """Hard-link each layout's path to the same layout's file of ``target``.
+
+        Identical bytes mean identical tile dimensions, so the target's
+        padded tile is right for the alias too.
+        """
+        if target in self._unplaced:
+            if target in self._padded_below:
+                self._padded[level, col, row] = self._padded_below[target]
+            self.write(level, col, row, self._unplaced[target])
+            return
+        for layout in self.options.layouts:
+            paths = self._paths(layout, level, col, row)
+            targets = self._paths(layout, *target)
+            if targets:
+                for path in paths:
+                    self._put(path, targets[0], b"")
+                continue
+            if not paths:
+                continue
+            # The target is below this map layout's zoom 0, so it was only
+            # written unpadded; its padded form was kept aside.
+            source = None
+            for path in paths:
+                source = self._put(path, source, self._padded_below[target])
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        self._files.write(self.path / "variants" / f"{width}.{self.extension}", data)
+
+    def close(self) -> None:
+        for layout in self.options.layouts:
+            directory = self.path / layout
+            if layout == "dzi":
+                self._files.write(directory / "image.dzi", self._dzi().encode())
+            elif layout == "iiif":
+                self._files.write(directory / "info.json", json.dumps(self._iiif_info(), indent=1).encode())
+            else:
+                self._files.write(directory / "tilejson.json", json.dumps(self._tilejson(layout), indent=1).encode())
+        self._files.close()
+        self._clear()
+
+    def abort(self) -> None:
+        self._files.abort()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._unplaced.clear()
+        self._padded.clear()
+        self._padded_below.clear()
+
+    def _dzi(self) -> str:
+        width, height = self._sizes[-1]
+        return _DZI.format(format=self.extension, overlap=self.options.overlap, size=self.options.tile_size,
+                           width=width, height=height)
+
+    def _iiif_info(self) -> dict[str, object]:
+        width, height = self._sizes[-1]
+        base = self.options.iiif_base.rstrip("/")
+        info: dict[str, object] = {
+            "@context": "http://iiif.io/api/image/3/context.json",
+            "id": "/".join(part for part in (base, self.name, "iiif") if part),
+            "type": "ImageService3",
+            "protocol": "http://iiif.io/api/image",
+            "profile": "level0",
+            "width": width,
+            "height": height,
+            "sizes": [{"width": w, "height": h} for w, h in self._sizes[1 : self._bottom + 1]],
+            "tiles": [{"width": self.options.tile_size, "scaleFactors": [1 << i for i in range(len(self._sizes))]}],
+        }
+        if self.extension != "jpg":
+            info["preferredFormats"] = info["extraFormats"] = [self.extension]
+        return info
+
+    def _tilejson(self, layout: str) -> dict[str, object]:
+        width, height = self._sizes[-1]
+        return {
+            "tilejson": "3.0.0",
+            "tiles": [f"{{z}}/{{x}}/{{y}}.{self.extension}"],
+            "scheme": layout,
+            "minzoom": 0,
+            "maxzoom": len(self._sizes) - 1 - self._bottom,
+            "tileSize": self.options.tile_size,
+            "width": width,
+            "height": height,
+        }
@@ -0,0 +1,240 @@
+"""Incremental tiling driven by a persistent build manifest.
+
+The manifest lives next to the tiles and maps every source path to the
+content hash and tiling options its pyramid was built from. On a re-run a
+source is skipped when its size and mtime are unchanged, or, failing that,
+when its SHA-256 still matches; only then is the file actually re-tiled.
+Entries whose source has disappeared are dropped together with their tiles.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .phash import hex_hash
+from .pyramid import TileOptions
+from .sink import TileSink
+from .tiler import TileEncoder, TileStats, tile_image
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".lfp-manifest.json"
+_VERSION = 1
+
+
+def file_digest(path: str | os.PathLike[str], chunk: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in ``chunk``-sized pieces."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while block := fh.read(chunk):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """Source path -> (content hash, options, output) records, stored as JSON."""
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, Any]] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") == _VERSION:
+                self.entries = data["entries"]
+            else:
+                log.warning("ignoring manifest %s with unknown version", self.path)
+
+    def check(self, source: Path, options: TileOptions, output: Path) -> str | None:
+        """Return ``None`` if ``source`` is up to date, else its content hash.
+
+        The entry must also have been written to ``output``, so switching
+        between output containers rebuilds, as do entries from before
+        placeholders and perceptual hashes were recorded. A stat change alone does not force a
+        rebuild: the file is hashed and, if the content is unchanged, the
+        recorded stat is refreshed.
+        """
+        entry = self.entries.get(str(source))
+        if (entry is None or entry["options"] != _options_json(options) or entry["output"] != str(output)
+                or "hashes" not in entry):
+            return file_digest(source)
+        st = source.stat()
+        if (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return None
+        digest = file_digest(source)
+        if digest != entry["sha256"]:
+            return digest
+        entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+        return None
+
+    def record(self, source: Path, digest: str, options: TileOptions, output: Path, stats: TileStats) -> None:
+        st = source.stat()
+        hashes = stats.hashes._asdict() if stats.hashes else {}
+        self.entries[str(source)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": digest,
+            "options": _options_json(options),
+            "output": str(output),
+            "tiles": stats.tiles,
+            "bytes": stats.bytes_written,
+            "adaptive_bytes_saved": stats.adaptive_bytes_saved,
+            "placeholder": stats.placeholder._asdict() if stats.placeholder else None,
+            "hashes": {name: hex_hash(value) for name, value in hashes.items()} or None,
+        }
+
+    def placeholders(self) -> dict[str, dict[str, str]]:
+        """Source path -> ``{"blurhash": ..., "colour": ...}``."""
+        return {source: entry["placeholder"] for source, entry in self.entries.items() if entry.get("placeholder")}
+
+    def hashes(self) -> dict[str, dict[str, str]]:
+        """Source path -> ``{"dhash": <hex>, "phash": <hex>}``."""
+        return {source: entry["hashes"] for source, entry in self.entries.items() if entry.get("hashes")}
+
+    def orphans(self) -> list[str]:
+        """Recorded sources that no longer exist on disk."""
+        return [source for source in self.entries if not os.path.exists(source)]
+
+    def forget(self, source: str) -> dict[str, Any]:
+        return self.entries.pop(source)
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": _VERSION, "entries": self.entries}, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+
+
+def _options_json(options: TileOptions) -> dict[str, Any]:
+    """Options as they read back from the manifest (tuples become lists)."""
+    return json.loads(json.dumps(dataclasses.asdict(options)))
+
+
+def output_name(source: Path, relative_to: Path | None = None) -> Path:
+    """Output path of ``source`` relative to the output root, without a suffix.
+
+    With ``relative_to`` it is the source's path below that folder with the
+    dots of the file name replaced (``2024/shoot/a_jpg``); otherwise the file
+    name alone, dots replaced, plus a short hash of its folder, so that
+    ``a/cat.jpg`` and ``b/cat.jpg`` differ.
+    """
+    if relative_to is None:
+        folder = hashlib.sha256(str(source.parent).encode()).hexdigest()[:8]
+        return Path(f"{source.name.replace('.', '_')}_{folder}")
+    relative = source.relative_to(relative_to)
+    return relative.with_name(relative.name.replace(".", "_"))
+
+
+def remove_output(path: str | os.PathLike[str]) -> None:
+    """Delete a tile directory or pack file, whichever ``path`` is."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+@dataclass
+class LibraryReport:
+    tiled: int = 0
+    skipped: int = 0
+    removed: int = 0
+    tiles: int = 0
+    bytes_written: int = 0
+    duplicates: int = 0
+    bytes_deduplicated: int = 0
+    uniform_reused: int = 0
+    encode_seconds_saved: float = 0.0
+    variants: int = 0
+    variant_bytes: int = 0
+    adaptive_bytes_saved: int = 0
+    """Estimated; see :attr:`~.tiler.TileStats.adaptive_bytes_saved`."""
+    failed: list[str] = field(default_factory=list)
+    """Sources that could not be tiled; they have no manifest entry, so the next run retries them."""
+
+    def add(self, stats: TileStats) -> None:
+        self.tiled += 1
+        self.tiles += stats.tiles
+        self.bytes_written += stats.bytes_written
+        self.duplicates += stats.duplicates
+        self.bytes_deduplicated += stats.bytes_deduplicated
+        self.uniform_reused += stats.uniform_reused
+        self.encode_seconds_saved += stats.encode_seconds_saved
+        self.variants += stats.variants
+        self.variant_bytes += stats.variant_bytes
+        self.adaptive_bytes_saved += stats.adaptive_bytes_saved
+
+
+def tile_library(
+    sources: Iterable[str | os.PathLike[str]],
+    output_root: str | os.PathLike[str],
+    make_sink: Callable[[Path], TileSink],
+    options: TileOptions = TileOptions(),
+    encoder: TileEncoder | None = None,
+    force: bool = False,
+    dedup: bool = False,
+    relative_to: str | os.PathLike[str] | None = None,
+) -> LibraryReport:
+    """Tile every changed source under ``output_root``.
+
+    ``make_sink`` builds the sink for one image given
+    ``output_root/<name>`` (see :func:`output_name`); it may pick a
+    different final path (e.g. a pack file) via ``sink.path``, and must not
+    touch the filesystem before the first write. Should two sources still
+    map to one output (``a_b.jpg`` and ``a.b.jpg``), the one without a
+    manifest entry for it gets a hash of its path appended. The manifest is
+    saved after each image, so an interrupted run keeps the work it has
+    finished. A source that fails to tile is logged, left without output
+    and listed in :attr:`LibraryReport.failed`.
+    """
+    root = Path(output_root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(root / MANIFEST_NAME)
+    report = LibraryReport()
+    base = Path(relative_to).resolve() if relative_to is not None else None
+
+    for orphan in manifest.orphans():
+        entry = manifest.forget(orphan)
+        remove_output(entry["output"])
+        report.removed += 1
+        log.info("removed tiles of deleted source %s", orphan)
+
+    owners = {entry["output"]: source for source, entry in manifest.entries.items()}
+    for source in map(Path, sources):
+        source = source.resolve()
+        name = output_name(source, base)
+        sink = make_sink(root / name)
+        if owners.setdefault(str(sink.path), str(source)) != str(source):
+            unique = name.with_name(f"{name.name}_{hashlib.sha256(str(source).encode()).hexdigest()[:8]}")
+            log.warning("%s would share its output with %s; writing to %s", source, owners[str(sink.path)], unique)
+            sink = make_sink(root / unique)
+            owners[str(sink.path)] = str(source)
+        digest = file_digest(source) if force else manifest.check(source, options, sink.path)
+        if digest is None:
+            report.skipped += 1
+            continue
+        entry = manifest.entries.get(str(source))
+        if entry is not None:
+            remove_output(entry["output"])
+        remove_output(sink.path)
+        try:
+            stats = tile_image(source, sink, options, encoder, dedup)
+        except Exception as exc:  # one unreadable original must not stop the library
+            log.warning("cannot tile %s: %r", source, exc)
+            manifest.entries.pop(str(source), None)
+            manifest.save()
+            remove_output(sink.path)
+            report.failed.append(str(source))
+            continue
+        manifest.record(source, digest, options, sink.path, stats)
+        manifest.save()
+        report.add(stats)
+
+    manifest.save()
+    return report
@@ -0,0 +1,198 @@
+"""Single-file tile archives.
+
+Instead of one file per tile, every tile of an image is appended to one
+``.lfpack`` file, which ends with an index mapping ``(level, col, row)`` to a
+byte range. Once a client has the index, any tile is one HTTP Range request
+(or one mmap slice) away.
+
+Layout, all integers little-endian::
+
+    b"LFPPACK1"                       8-byte header
+    tile data ...                     concatenated encoded tiles
+    metadata                          UTF-8 JSON (extension, tile size, ...)
+    index entries                     INDEX_ENTRY per tile, sorted by key
+    trailer                           TRAILER
+
+A reader fetches the last ``TRAILER.size`` bytes first, which gives the
+offset and length of the metadata and index. Several index entries may point
+at the same byte range. Whole-image variants are stored as entries with
+level ``VARIANT_LEVEL``, col = width and row = height.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, BinaryIO, NamedTuple
+
+from .sink import DirectorySink
+from .writer import fsync_path
+
+MAGIC = b"LFPPACK1"
+SUFFIX = ".lfpack"
+INDEX_ENTRY = struct.Struct("<HIIQI")
+"""level, col, row, offset, length"""
+TRAILER = struct.Struct("<QII8s")
+"""metadata offset, metadata length, entry count, magic"""
+VARIANT_LEVEL = 0xFFFF
+
+
+class PackEntry(NamedTuple):
+    level: int
+    col: int
+    row: int
+    offset: int
+    length: int
+
+
+def parse_trailer(data: bytes) -> tuple[int, int, int]:
+    """Decode the trailer into (metadata offset, metadata length, entry count)."""
+    meta_offset, meta_length, count, magic = TRAILER.unpack(data[-TRAILER.size:])
+    if magic != MAGIC:
+        raise ValueError("not an lfpack file (bad trailer)")
+    return meta_offset, meta_length, count
+
+
+def parse_index(data: bytes | memoryview, count: int) -> dict[tuple[int, int, int], tuple[int, int]]:
+    """Decode ``count`` index entries into ``{(level, col, row): (offset, length)}``."""
+    return {
+        (level, col, row): (offset, length)
+        for level, col, row, offset, length in INDEX_ENTRY.iter_unpack(data[:count * INDEX_ENTRY.size])
+    }
+
+
+class PackSink:
+    """:class:`~.sink.TileSink` that appends tiles to one ``.lfpack`` file.
+
+    The file is written under a temporary name and renamed into place by
+    :meth:`close`, so readers never see a pack without its index. With any
+    ``fsync`` but ``"off"`` the pack is synced once, before the rename.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], extension: str, metadata: dict[str, Any] | None = None,
+                 fsync: str = "off"):
+        self.path = Path(path)
+        self.extension = extension
+        self.metadata = dict(metadata or {})
+        self.fsync = fsync
+        self._fh: BinaryIO | None = None
+        self._entries: list[PackEntry] = []
+        self._ranges: dict[tuple[int, int, int], tuple[int, int]] = {}
+
+    def _open(self) -> BinaryIO:
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self._tmp_path, "wb")
+            self._fh.write(MAGIC)
+        return self._fh
+
+    @property
+    def _tmp_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".tmp")
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        pass
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        fh = self._open()
+        self._add(level, col, row, fh.tell(), len(data))
+        fh.write(data)
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        """Point ``(level, col, row)`` at the bytes already written for ``target``."""
+        self._add(level, col, row, *self._ranges[target])
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        self.write(VARIANT_LEVEL, width, height, data)
+
+    def _add(self, level: int, col: int, row: int, offset: int, length: int) -> None:
+        self._entries.append(PackEntry(level, col, row, offset, length))
+        self._ranges[level, col, row] = offset, length
+
+    def close(self) -> None:
+        fh = self._open()
+        meta = json.dumps({"extension": self.extension, **self.metadata}, sort_keys=True).encode()
+        meta_offset = fh.tell()
+        fh.write(meta)
+        self._entries.sort()
+        for entry in self._entries:
+            fh.write(INDEX_ENTRY.pack(*entry))
+        fh.write(TRAILER.pack(meta_offset, len(meta), len(self._entries), MAGIC))
+        if self.fsync != "off":
+            fh.flush()
+            os.fsync(fh.fileno())
+        fh.close()
+        self._fh = None
+        os.replace(self._tmp_path, self.path)
+        if self.fsync != "off":
+            fsync_path(self.path.parent)
+
+    def abort(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class PackReader:
+    """Random access to the tiles of a ``.lfpack`` file through ``mmap``."""
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path}: not an lfpack file")
+        meta_offset, meta_length, count = parse_trailer(self._map)
+        self.metadata: dict[str, Any] = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        index_offset = meta_offset + meta_length
+        self.index = parse_index(self._map[index_offset:index_offset + count * INDEX_ENTRY.size], count)
+
+    def __contains__(self, key: tuple[int, int, int]) -> bool:
+        return key in self.index
+
+    def get(self, level: int, col: int, row: int) -> bytes:
+        offset, length = self.index[level, col, row]
+        return self._map[offset:offset + length]
+
+    def variants(self) -> dict[int, tuple[int, bytes]]:
+        """``{width: (height, data)}`` of the stored variants."""
+        return {
+            col: (row, self.get(level, col, row))
+            for level, col, row in self.index
+            if level == VARIANT_LEVEL
+        }
+
+    def entries(self) -> Iterator[PackEntry]:
+        for (level, col, row), (offset, length) in sorted(self.index.items()):
+            yield PackEntry(level, col, row, offset, length)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> PackReader:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def extract_pack(path: str | os.PathLike[str], destination: str | os.PathLike[str]) -> int:
+    """Unpack into the ``<level>/<col>_<row>.<ext>`` layout of :class:`~.sink.DirectorySink`."""
+    with PackReader(path) as reader:
+        sink = DirectorySink(destination, reader.metadata["extension"])
+        count = 0
+        for entry in reader.entries():
+            data = reader.get(entry.level, entry.col, entry.row)
+            if entry.level == VARIANT_LEVEL:
+                sink.write_variant(entry.col, entry.row, data)
+            else:
+                sink.write(entry.level, entry.col, entry.row, data)
+            count += 1
+        sink.close()
+    return count
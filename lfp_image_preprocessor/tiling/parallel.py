@@ -0,0 +1,142 @@
+"""Process-pool tile encoding.
+
+Raw tiles are copied once into a shared-memory block per batch; workers map
+the block and encode straight out of it, so only the batch layout and the
+compressed results cross the process boundary. At most ``max_pending``
+batches are in flight: once that many are queued the producer waits for the
+oldest, which keeps the decoder from racing ahead of the encoders.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .encode import EncodedTile, UniformCache, encode_with_options
+from .pyramid import Tile, TileOptions
+
+_Layout = list[tuple[int, tuple[int, ...], int, int]]
+_Key = tuple[object, ...] | None
+_Position = tuple[int, int, int, _Key, bytes | None]
+_Result = tuple[bytes, float, int, int, bytes | None]
+_Pending = tuple[list[_Position], SharedMemory | None, Future[list[_Result]]]
+
+
+def _encode_batch(name: str, layout: _Layout, options: TileOptions) -> list[_Result]:
+    shm = SharedMemory(name=name)
+    try:
+        out = []
+        for offset, shape, col, row in layout:
+            pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+            started = time.perf_counter()
+            data, quality, baseline, padded = encode_with_options(pixels, options, col, row)
+            out.append((data, time.perf_counter() - started, quality, baseline, padded))
+            del pixels
+        return out
+    finally:
+        shm.close()
+
+
+class ParallelEncoder:
+    """Encodes tiles in a pool of worker processes, preserving input order.
+
+    One encoder is meant to be reused for many images so the pool is only
+    started once. With ``skip_uniform``, single-colour tiles that have been
+    encoded before are answered in this process and never reach the pool;
+    they still wait their turn behind the tiles queued before them.
+    """
+
+    def __init__(
+        self,
+        jobs: int | None = None,
+        batch_tiles: int = 32,
+        max_pending: int | None = None,
+        skip_uniform: bool = False,
+    ):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_tiles = batch_tiles
+        self.max_pending = max_pending or 2 * self.jobs
+        self._pool = ProcessPoolExecutor(self.jobs)
+        self._uniform = UniformCache() if skip_uniform else None
+
+    def encode(self, tiles: Iterable[Tile], options: TileOptions) -> Iterator[EncodedTile]:
+        pending: deque[_Pending] = deque()
+        batch: list[tuple[Tile, _Key, bytes | None]] = []
+        try:
+            for tile in tiles:
+                key = self._uniform.key(tile.pixels, options) if self._uniform else None
+                data = self._uniform.get(key) if key is not None else None
+                if data is not None and not pending and not batch:
+                    yield EncodedTile(tile.level, tile.col, tile.row, data, reused=True)
+                    continue
+                batch.append((tile, key, data))
+                if len(batch) == self.batch_tiles:
+                    pending.append(self._submit(batch, options))
+                    batch = []
+                    while len(pending) >= self.max_pending:
+                        yield from self._collect(pending.popleft())
+            if batch:
+                pending.append(self._submit(batch, options))
+            while pending:
+                yield from self._collect(pending.popleft())
+        finally:
+            for _, shm, future in pending:
+                future.cancel()
+                if not future.cancelled():
+                    future.exception()
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+    def _submit(self, batch: list[tuple[Tile, _Key, bytes | None]], options: TileOptions) -> _Pending:
+        # Only positions are kept so the source strips can be freed; the
+        # pixels now live in shared memory.
+        positions = [(t.level, t.col, t.row, key, data) for t, key, data in batch]
+        todo = [tile for tile, _, data in batch if data is None]
+        if not todo:
+            done: Future[list[_Result]] = Future()
+            done.set_result([])
+            return positions, None, done
+        layout: _Layout = []
+        offset = 0
+        for tile in todo:
+            layout.append((offset, tile.pixels.shape, tile.col, tile.row))
+            offset += tile.pixels.nbytes
+        shm = SharedMemory(create=True, size=max(offset, 1))
+        for tile, (start, shape, _, _) in zip(todo, layout):
+            view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=start)
+            view[...] = tile.pixels
+            del view
+        return positions, shm, self._pool.submit(_encode_batch, shm.name, layout, options)
+
+    def _collect(self, entry: _Pending) -> Iterator[EncodedTile]:
+        positions, shm, future = entry
+        try:
+            results = iter(future.result())
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        for level, col, row, key, cached in positions:
+            if cached is not None:
+                yield EncodedTile(level, col, row, cached, reused=True)
+                continue
+            data, seconds, quality, baseline, padded = next(results)
+            if key is not None:
+                self._uniform.put(key, data)
+            yield EncodedTile(level, col, row, data, seconds, quality=quality, baseline_bytes=baseline, padded=padded)
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> ParallelEncoder:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,84 @@
+"""64-bit perceptual hashes for near-duplicate detection.
+
+Both hashes are taken from the smallest pyramid level whose short side is
+at least :data:`HASH_SIZE` pixels, tapped while the pyramid is built, so an
+original is never decoded again for them. They follow the usual
+definitions (as in the ``imagehash`` package) on a greyscale thumbnail:
+
+* dHash: 9x8 thumbnail; bit set where a pixel's right neighbour is brighter
+  than it. Robust to re-encoding and mild resizing.
+* pHash: 32x32 thumbnail, 2-D DCT-II; bit set where one of the 8x8
+  lowest-frequency coefficients exceeds their median. Also survives small
+  tone and contrast edits.
+
+Bits are packed row-major, first bit most significant.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from .._optional import require
+
+HASH_SIZE = 32
+"""Minimum short side, in pixels, of the level hashes are taken from."""
+
+
+class ImageHashes(NamedTuple):
+    dhash: int
+    phash: int
+
+
+def hash_level(sizes: Sequence[tuple[int, int]], size: int = HASH_SIZE) -> int:
+    """The smallest level whose short side is at least ``size`` (or the top level)."""
+    return next((level for level, (w, h) in enumerate(sizes) if min(w, h) >= size), len(sizes) - 1)
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _grey(pixels: np.ndarray, width: int, height: int) -> np.ndarray:
+    image_mod = require("PIL.Image", "tiling")
+    bands = pixels.shape[2]
+    image = image_mod.fromarray(pixels[:, :, 0] if bands < 3 else np.ascontiguousarray(pixels[:, :, :3]))
+    return np.asarray(image.convert("L").resize((width, height), image_mod.Resampling.LANCZOS), dtype=np.float64)
+
+
+def dhash(pixels: np.ndarray) -> int:
+    grey = _grey(pixels, 9, 8)
+    return _pack(grey[:, 1:] > grey[:, :-1])
+
+
+_N = 32
+_DCT = np.cos(np.pi * np.outer(np.arange(_N), 2 * np.arange(_N) + 1) / (2 * _N))
+
+
+def phash(pixels: np.ndarray) -> int:
+    grey = _grey(pixels, _N, _N)
+    low = (_DCT @ grey @ _DCT.T)[:8, :8]
+    return _pack(low > np.median(low))
+
+
+def hex_hash(value: int) -> str:
+    """Fixed-width hex, which survives JSON and JavaScript number parsing."""
+    return f"{value:016x}"
+
+
+class HashCollector:
+    """Gathers the strips of one small level and hashes it."""
+
+    def __init__(self, sizes: Sequence[tuple[int, int]]):
+        self.level = hash_level(sizes)
+        self._strips: list[np.ndarray] = []
+
+    def tap(self, strip: np.ndarray) -> None:
+        self._strips.append(strip)
+
+    def hashes(self) -> ImageHashes:
+        pixels = np.concatenate(self._strips)
+        self._strips = []
+        return ImageHashes(dhash(pixels), phash(pixels))
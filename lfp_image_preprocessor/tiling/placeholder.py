@@ -0,0 +1,112 @@
+"""Low-quality placeholders: a BlurHash string and a dominant colour.
+
+Both are computed from the smallest pyramid level at least
+:data:`PLACEHOLDER_SIZE` pixels on its long side, tapped while the pyramid
+is built, so they cost a few thousand pixels of arithmetic per image.
+The BlurHash follows the reference encoder (https://blurha.sh): a DCT of
+the linear-light image, quantised and written in base 83.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+PLACEHOLDER_SIZE = 32
+"""Minimum long side, in pixels, of the level placeholders are taken from."""
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+class Placeholder(NamedTuple):
+    blurhash: str
+    colour: str
+    """Dominant colour as ``#rrggbb``."""
+
+
+def placeholder_level(sizes: Sequence[tuple[int, int]], size: int = PLACEHOLDER_SIZE) -> int:
+    """The smallest level whose long side is at least ``size`` (or the top level)."""
+    return next((level for level, (w, h) in enumerate(sizes) if max(w, h) >= size), len(sizes) - 1)
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(_BASE83[value // 83 ** (length - 1 - i) % 83] for i in range(length))
+
+
+def _to_linear(srgb: np.ndarray) -> np.ndarray:
+    v = srgb / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _to_srgb(linear: float) -> int:
+    v = min(max(linear, 0.0), 1.0)
+    v = v * 12.92 if v <= 0.0031308 else 1.055 * v ** (1 / 2.4) - 0.055
+    return int(v * 255 + 0.5)
+
+
+def _rgb(pixels: np.ndarray) -> np.ndarray:
+    """``(h, w, 3)`` view of 1-, 3- or 4-band pixels; alpha is ignored."""
+    if pixels.shape[2] < 3:
+        return np.repeat(pixels[:, :, :1], 3, axis=2)
+    return pixels[:, :, :3]
+
+
+def blurhash(pixels: np.ndarray, x_components: int = 4, y_components: int = 3) -> str:
+    """BlurHash of ``(h, w, bands)`` uint8 pixels."""
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError("components must be in [1, 9]")
+    linear = _to_linear(_rgb(pixels).astype(np.float64))
+    height, width = linear.shape[:2]
+    xs = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    ys = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    # factors[j, i] = mean over pixels of basis(i, j) * colour, doubled for AC terms.
+    factors = np.einsum("jy,ix,yxc->jic", ys, xs, linear) / (width * height)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    out = _base83(x_components - 1 + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        out += _base83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        out += _base83(0, 1)
+    out += _base83((_to_srgb(dc[0]) << 16) + (_to_srgb(dc[1]) << 8) + _to_srgb(dc[2]), 4)
+    scaled = ac / maximum
+    quant = np.clip(np.floor(np.sign(scaled) * np.abs(scaled) ** 0.5 * 9 + 9.5), 0, 18).astype(int)
+    for r, g, b in quant:
+        out += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return out
+
+
+def dominant_colour(pixels: np.ndarray) -> str:
+    """Mean colour of the most populated cell of a 8x8x8 RGB histogram."""
+    rgb = _rgb(pixels).reshape(-1, 3)
+    cells = (rgb[:, 0] >> 5).astype(np.intp) << 6 | (rgb[:, 1] >> 5).astype(np.intp) << 3 | rgb[:, 2] >> 5
+    members = rgb[cells == np.bincount(cells, minlength=512).argmax()]
+    r, g, b = (int(v + 0.5) for v in members.mean(axis=0))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+class PlaceholderCollector:
+    """Gathers the strips of one small level and summarises it."""
+
+    def __init__(self, sizes: Sequence[tuple[int, int]]):
+        self.level = placeholder_level(sizes)
+        width, height = sizes[self.level]
+        # Keep the BlurHash grid roughly square in image space.
+        self.components = (4, 3) if width >= height else (3, 4)
+        self._strips: list[np.ndarray] = []
+
+    def tap(self, strip: np.ndarray) -> None:
+        self._strips.append(strip)
+
+    def placeholder(self) -> Placeholder:
+        pixels = np.concatenate(self._strips)
+        self._strips = []
+        return Placeholder(blurhash(pixels, *self.components), dominant_colour(pixels))
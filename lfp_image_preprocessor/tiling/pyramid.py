@@ -0,0 +1,182 @@
+"""Streaming tile-pyramid construction.
+
+Strips of the full-resolution image go in the top; tiles of every zoom level
+come out as soon as enough rows have been seen to cut them. Each level keeps
+at most one row of tiles (plus overlap) buffered and hands a 2x-reduced copy
+of every strip it receives to the level below (see :mod:`.resample`), so
+peak memory is a few tile-rows regardless of the image height.
+
+Levels use Deep Zoom numbering: level 0 is 1x1 pixels and the highest level
+is the original resolution.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+
+import numpy as np
+
+from .resample import FILTERS, make_halver
+
+
+@dataclass(frozen=True)
+class TileOptions:
+    tile_size: int = 256
+    overlap: int = 0
+    format: str = "jpeg"
+    quality: int = 85
+    resample: str = "box"
+    variant_widths: tuple[int, ...] = ()
+    """Widths of whole-image gallery variants to emit alongside the tiles."""
+    pad_edges: bool = False
+    """Pad right and bottom edge tiles to the full tile size by repeating their
+    last column and row, for containers with fixed-size tiles (TIFF)."""
+    layouts: tuple[str, ...] = ()
+    """Viewer layouts to write instead of the plain tile directory (see :mod:`.layouts`)."""
+    iiif_base: str = ""
+    """URL the output root is served at, for the ``id`` of IIIF services."""
+    adaptive_quality: tuple[int, int] | None = None
+    """``(low, high)`` range to pick each JPEG/WebP tile's quality from by its
+    detail (see :mod:`.quality`); ``quality`` is then the reference for savings."""
+
+    def __post_init__(self) -> None:
+        if self.tile_size <= 0:
+            raise ValueError("tile_size must be positive")
+        if not 0 <= self.overlap < self.tile_size:
+            raise ValueError("overlap must be in [0, tile_size)")
+        if self.resample not in FILTERS:
+            raise ValueError(f"resample must be one of {FILTERS}")
+        if self.pad_edges and self.overlap:
+            raise ValueError("pad_edges needs overlap 0")
+        if any(width <= 0 for width in self.variant_widths):
+            raise ValueError("variant widths must be positive")
+        object.__setattr__(self, "variant_widths", tuple(self.variant_widths))
+        object.__setattr__(self, "layouts", tuple(self.layouts))
+        if self.adaptive_quality is not None:
+            low, high = self.adaptive_quality
+            if not 1 <= low <= high <= 100:
+                raise ValueError("adaptive_quality must be (low, high) with 1 <= low <= high <= 100")
+            object.__setattr__(self, "adaptive_quality", (low, high))
+
+
+@dataclass(frozen=True)
+class Tile:
+    level: int
+    col: int
+    row: int
+    pixels: np.ndarray
+
+
+def level_sizes(width: int, height: int) -> list[tuple[int, int]]:
+    """Dimensions of every pyramid level, indexed by level number."""
+    sizes = [(width, height)]
+    while sizes[-1] != (1, 1):
+        w, h = sizes[-1]
+        sizes.append(((w + 1) // 2, (h + 1) // 2))
+    sizes.reverse()
+    return sizes
+
+
+def grid_size(width: int, height: int, tile_size: int) -> tuple[int, int]:
+    """Number of tile columns and rows needed to cover a level."""
+    return -(-width // tile_size), -(-height // tile_size)
+
+
+class _LevelCutter:
+    """Buffers one level's rows until a full row of tiles can be cut."""
+
+    def __init__(self, level: int, width: int, height: int, options: TileOptions):
+        self.level = level
+        self.width = width
+        self.height = height
+        self.received = 0
+        self._size = options.tile_size
+        self._overlap = options.overlap
+        self._pad = options.pad_edges
+        self._cols, self._rows = grid_size(width, height, options.tile_size)
+        self._strips: list[np.ndarray] = []
+        self._top = 0
+        self._buffered = 0
+        self._next_row = 0
+
+    def push(self, strip: np.ndarray) -> Iterator[Tile]:
+        self._strips.append(strip)
+        self._buffered += len(strip)
+        self.received += len(strip)
+        size, overlap = self._size, self._overlap
+        while self._next_row < self._rows:
+            row = self._next_row
+            start = max(row * size - overlap, 0)
+            end = min((row + 1) * size + overlap, self.height)
+            if self._top + self._buffered < end:
+                return
+            rows = self._strips[0] if len(self._strips) == 1 else np.concatenate(self._strips)
+            band = rows[start - self._top:end - self._top]
+            for col in range(self._cols):
+                left = max(col * size - overlap, 0)
+                right = min((col + 1) * size + overlap, self.width)
+                pixels = band[:, left:right]
+                if self._pad and pixels.shape[:2] != (size, size):
+                    short = ((0, size - pixels.shape[0]), (0, size - pixels.shape[1]), (0, 0))
+                    pixels = np.pad(pixels, short, mode="edge")
+                yield Tile(self.level, col, row, pixels)
+            self._next_row += 1
+            keep_from = min((row + 1) * size - overlap, self.height)
+            rows = rows[keep_from - self._top:]
+            self._strips = [rows]
+            self._top = keep_from
+            self._buffered = len(rows)
+
+    @property
+    def done(self) -> bool:
+        return self._next_row == self._rows
+
+
+class PyramidTiler:
+    """Cuts every level of a tile pyramid from a stream of full-size strips."""
+
+    def __init__(self, width: int, height: int, options: TileOptions = TileOptions()):
+        self.width = width
+        self.height = height
+        self.options = options
+        self.sizes = level_sizes(width, height)
+        self.max_level = len(self.sizes) - 1
+
+    @property
+    def strip_rows(self) -> int:
+        """Preferred number of source rows per strip."""
+        return self.options.tile_size
+
+    def tiles(
+        self,
+        strips: Iterable[np.ndarray],
+        taps: Mapping[int, Callable[[np.ndarray], None]] | None = None,
+    ) -> Iterator[Tile]:
+        """Yield tiles of all levels, in no particular level order.
+
+        ``taps`` maps a level to a callback that also receives every strip of
+        that level, in order.
+        """
+        taps = taps or {}
+        cutters = [_LevelCutter(level, w, h, self.options) for level, (w, h) in enumerate(self.sizes)]
+        halvers = [make_halver(self.options.resample, h) for _, h in self.sizes]
+
+        def feed(level: int, strip: np.ndarray) -> Iterator[Tile]:
+            cutter = cutters[level]
+            if level in taps:
+                taps[level](strip)
+            yield from cutter.push(strip)
+            if level == 0:
+                return
+            reduced = halvers[level].push(strip, final=cutter.received == cutter.height)
+            if reduced is not None:
+                yield from feed(level - 1, reduced)
+
+        for strip in strips:
+            if strip.shape[1] != self.width:
+                raise ValueError(f"strip width {strip.shape[1]} != image width {self.width}")
+            yield from feed(self.max_level, strip)
+        incomplete = [c.level for c in cutters if not c.done]
+        if incomplete:
+            raise ValueError(f"source ended early; levels {incomplete} are incomplete")
@@ -0,0 +1,149 @@
+"""2x reductions used to build each pyramid level from the one above.
+
+Both filters work on whole strips with NumPy array operations and are
+streamed: a halver is fed consecutive strips of one level and returns the
+corresponding rows of the level below as soon as they can be computed.
+
+``box``
+    2x2 mean. Cheap and the default.
+``lanczos``
+    Separable Lanczos-3 at scale 2 (12 taps per axis). Sharper, at several
+    times the cost. Edges are handled by clamping.
+"""
+
+from __future__ import annotations
+
+from typing import Protocol
+
+import numpy as np
+
+FILTERS = ("box", "lanczos")
+
+
+class Halver(Protocol):
+    def push(self, strip: np.ndarray, final: bool) -> np.ndarray | None:
+        """Consume the next strip; return any finished output rows."""
+        ...
+
+
+def box_halve(strip: np.ndarray) -> np.ndarray:
+    """2x2 box-mean reduction of a strip with an even number of rows.
+
+    An odd trailing column is averaged with itself.
+    """
+    if strip.shape[1] % 2:
+        strip = np.concatenate((strip, strip[:, -1:]), axis=1)
+    wide = strip.astype(np.uint16)
+    total = wide[0::2, 0::2] + wide[1::2, 0::2] + wide[0::2, 1::2] + wide[1::2, 1::2]
+    return ((total + 2) >> 2).astype(np.uint8)
+
+
+class BoxHalver:
+    """Streams strips through :func:`box_halve`.
+
+    Strips are not guaranteed to have an even number of rows, so an odd row
+    is carried over to the next call; on the final strip it is paired with
+    itself.
+    """
+
+    def __init__(self) -> None:
+        self._carry: np.ndarray | None = None
+
+    def push(self, strip: np.ndarray, final: bool) -> np.ndarray | None:
+        if self._carry is not None:
+            strip = np.concatenate((self._carry, strip))
+            self._carry = None
+        if len(strip) % 2:
+            if final:
+                strip = np.concatenate((strip, strip[-1:]))
+            else:
+                self._carry = strip[-1:].copy()
+                strip = strip[:-1]
+        if not len(strip):
+            return None
+        return box_halve(strip)
+
+
+def lanczos_weights(lobes: int = 3) -> np.ndarray:
+    """Normalised taps of a Lanczos kernel stretched for a 2x reduction.
+
+    Output sample ``j`` is centred between source samples ``2j`` and
+    ``2j + 1``; tap ``k`` applies to source sample ``2j - (2 * lobes - 1) + k``.
+    """
+    taps = 4 * lobes
+    offsets = (np.arange(taps) - (2 * lobes - 1) - 0.5) / 2.0
+    weights = np.sinc(offsets) * np.sinc(offsets / lobes)
+    return (weights / weights.sum()).astype(np.float32)
+
+
+def _lanczos_axis1(strip: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Filter and decimate along the column axis of a ``(rows, cols, bands)`` array."""
+    cols = strip.shape[1]
+    out_cols = (cols + 1) // 2
+    reach = len(weights) // 2 - 1
+    index = np.clip(np.arange(-reach, 2 * out_cols + reach + 1), 0, cols - 1)
+    padded = strip[:, index].astype(np.float32)
+    out = np.zeros((strip.shape[0], out_cols, strip.shape[2]), dtype=np.float32)
+    for k, weight in enumerate(weights):
+        out += weight * padded[:, k:k + 2 * out_cols:2]
+    return out
+
+
+def _to_uint8(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+class LanczosHalver:
+    """Streaming separable Lanczos reduction for a level of known height.
+
+    Rows are filtered horizontally as they arrive and kept until every
+    output row that needs them has been produced, i.e. a halo of
+    ``2 * lobes`` rows is carried between strips.
+    """
+
+    def __init__(self, height: int, lobes: int = 3):
+        self._height = height
+        self._out_height = (height + 1) // 2
+        self._weights = lanczos_weights(lobes)
+        self._reach = len(self._weights) // 2 - 1
+        self._rows: np.ndarray | None = None
+        self._top = 0
+        self._next = 0
+
+    def push(self, strip: np.ndarray, final: bool) -> np.ndarray | None:
+        filtered = _lanczos_axis1(strip, self._weights)
+        self._rows = filtered if self._rows is None else np.concatenate((self._rows, filtered))
+        received = self._top + len(self._rows)
+
+        # Output row j reads source rows up to 2j + reach + 1 (clamped).
+        ready = self._out_height if received >= self._height else max((received - self._reach) // 2, 0)
+        ready = min(ready, self._out_height)
+        if ready <= self._next:
+            return None
+        out_rows = np.arange(self._next, ready)
+        out = np.zeros((len(out_rows), self._rows.shape[1], self._rows.shape[2]), dtype=np.float32)
+        for k, weight in enumerate(self._weights):
+            source = np.clip(2 * out_rows - self._reach + k, 0, self._height - 1)
+            out += weight * self._rows[source - self._top]
+        self._next = ready
+
+        keep_from = min(max(2 * self._next - self._reach, 0), received)
+        self._rows = self._rows[keep_from - self._top:]
+        self._top = keep_from
+        return _to_uint8(out)
+
+
+def make_halver(kind: str, height: int) -> Halver:
+    """Build a streaming halver for a level ``height`` rows tall."""
+    if kind == "box":
+        return BoxHalver()
+    if kind == "lanczos":
+        return LanczosHalver(height)
+    raise ValueError(f"unknown resampling filter {kind!r}")
+
+
+def halve(image: np.ndarray, kind: str = "box") -> np.ndarray:
+    """Reduce a whole ``(rows, cols, bands)`` array by 2x in one call."""
+    result = make_halver(kind, image.shape[0]).push(image, final=True)
+    assert result is not None
+    return result
@@ -0,0 +1,83 @@
+"""Destinations for encoded tiles."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Protocol
+
+from .writer import TileFiles
+
+
+class TileSink(Protocol):
+    path: Path
+    """Where the tiles end up; removed wholesale when the image is re-tiled."""
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        """Called once with the original's geometry, before any tile."""
+        ...
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        ...
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        """Make ``(level, col, row)`` resolve to the already-written ``target``."""
+        ...
+
+    def write_padded(self, level: int, col: int, row: int, data: bytes) -> None:
+        """Receive an edge tile's full-size form just before its :meth:`write`.
+
+        Only called when ``options.layouts`` asks for a padded layout, so
+        only :class:`~.layouts.LayoutSink` (and wrappers) implement it.
+        """
+        ...
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        """Store a whole-image variant ``width`` pixels wide."""
+        ...
+
+    def close(self) -> None:
+        ...
+
+    def abort(self) -> None:
+        """Release resources after a failed run instead of :meth:`close`.
+
+        The output is left incomplete; the caller removes it.
+        """
+        ...
+
+
+class DirectorySink:
+    """Writes tiles as ``<root>/<level>/<col>_<row>.<ext>`` loose files.
+
+    Variants go to ``<root>/variants/<width>.<ext>``. ``fsync`` is one of
+    :data:`~.writer.FSYNC_MODES`.
+    """
+
+    def __init__(self, root: str | os.PathLike[str], extension: str, fsync: str = "off"):
+        self.path = Path(root)
+        self.extension = extension
+        self._files = TileFiles(fsync)
+
+    def path_for(self, level: int, col: int, row: int) -> Path:
+        return self.path / str(level) / f"{col}_{row}.{self.extension}"
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        pass
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        self._files.write(self.path_for(level, col, row), data)
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        """Relative symlink, so the tree can be moved or rsynced with ``-l``."""
+        link = self.path_for(level, col, row)
+        self._files.symlink(os.path.relpath(self.path_for(*target), link.parent), link)
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        self._files.write(self.path / "variants" / f"{width}.{self.extension}", data)
+
+    def close(self) -> None:
+        self._files.close()
+
+    def abort(self) -> None:
+        self._files.abort()
@@ -0,0 +1,286 @@
+"""Strip-oriented readers for original images.
+
+A source exposes the image geometry up front and then yields the pixels
+top-to-bottom as ``(rows, width, bands)`` uint8 arrays, so the tiler never
+has to hold more than a strip of the original in memory.
+
+Uncompressed 8-bit rasters (binary PNM, and strip-organised TIFF) are
+memory-mapped: their strips are read-only NumPy views of the mapping, so
+no pixel is copied into Python bytes, and pages the tiler has moved past
+are handed back to the kernel, so resident memory stays at a few strips
+however large the file.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+import numpy as np
+
+from .._optional import require
+from .._pnm import read_pnm_header
+from ..discovery import tiff
+
+log = logging.getLogger(__name__)
+
+PNM_SUFFIXES = frozenset({".pnm", ".ppm", ".pgm"})
+TIFF_SUFFIXES = frozenset({".tif", ".tiff"})
+
+
+class StripSource(Protocol):
+    """Anything that can hand out an image as horizontal strips."""
+
+    width: int
+    height: int
+    bands: int
+
+    def strips(self, rows: int) -> Iterator[np.ndarray]:
+        """Yield consecutive strips of at most ``rows`` rows each."""
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class _Mapping:
+    """Read-only map of a file whose pages can be dropped once passed.
+
+    Dropping is only advice: a view that still covers a dropped page simply
+    faults it back in from the page cache.
+    """
+
+    def __init__(self, fh: BinaryIO):
+        self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._mm)
+        self._released = 0
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._mm.madvise(mmap.MADV_SEQUENTIAL)
+
+    def view(self, offset: int, count: int, dtype: str | np.dtype = np.uint8) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if offset + count * dtype.itemsize > self.size:
+            raise ValueError("truncated pixel data")
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+
+    def release_before(self, offset: int) -> None:
+        end = offset - offset % mmap.PAGESIZE
+        if end > self._released and hasattr(mmap, "MADV_DONTNEED"):
+            self._mm.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+            self._released = end
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        except BufferError:
+            # Tiles still reference the map; it is unmapped when they go.
+            pass
+
+
+def _to_uint8(samples: np.ndarray, maxval: int) -> np.ndarray:
+    if samples.dtype == np.uint8 and maxval == 255:
+        return samples
+    wide = samples.astype(np.uint32)
+    return (wide * 255 // maxval).astype(np.uint8)
+
+
+class PNMSource:
+    """Streaming reader for binary PGM (P5) and PPM (P6) files.
+
+    The raster is memory-mapped and strips are views of it, which makes
+    this the memory-bounded path for very large originals. 16-bit samples
+    (and maxvals other than 255) are scaled to 8 bits, which copies.
+    ``use_mmap=False`` reads each strip with ``read()`` instead, for files
+    that cannot be mapped.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], use_mmap: bool = True):
+        self.path = Path(path)
+        self._fh: BinaryIO = open(self.path, "rb")
+        try:
+            magic, self.width, self.height, maxval = read_pnm_header(self._fh)
+            self._mapping = _Mapping(self._fh) if use_mmap else None
+        except Exception:
+            self._fh.close()
+            raise
+        self.bands = 1 if magic == b"P5" else 3
+        self._dtype = np.dtype(np.uint8) if maxval < 256 else np.dtype(">u2")
+        self._maxval = maxval
+        self._data_offset = self._fh.tell()
+
+    def strips(self, rows: int) -> Iterator[np.ndarray]:
+        row_samples = self.width * self.bands
+        row_bytes = row_samples * self._dtype.itemsize
+        self._fh.seek(self._data_offset)
+        top = 0
+        while top < self.height:
+            n = min(rows, self.height - top)
+            offset = self._data_offset + top * row_bytes
+            if self._mapping is not None:
+                samples = self._mapping.view(offset, n * row_samples, self._dtype)
+            else:
+                buf = self._fh.read(n * row_bytes)
+                if len(buf) != n * row_bytes:
+                    raise ValueError(f"{self.path}: truncated pixel data")
+                samples = np.frombuffer(buf, dtype=self._dtype)
+            yield _to_uint8(samples, self._maxval).reshape(n, self.width, self.bands)
+            if self._mapping is not None:
+                # The tiler has cut everything it can from this strip by now;
+                # the few rows it may keep fault back in from the page cache.
+                self._mapping.release_before(self._data_offset + (top + n) * row_bytes)
+            top += n
+
+    def close(self) -> None:
+        if self._mapping is not None:
+            self._mapping.close()
+        self._fh.close()
+
+    def __enter__(self) -> PNMSource:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class PillowSource:
+    """Fallback reader for every format Pillow understands.
+
+    Pillow decodes the whole image on first access, so this source is not
+    memory-bounded; it exists so JPEG/PNG/TIFF originals work at all.
+    Convert very large masters to PNM for the streaming path.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]):
+        image_mod = require("PIL.Image", "tiling")
+        self.path = Path(path)
+        self._image = image_mod.open(self.path)
+        if self._image.mode not in ("L", "RGB", "RGBA"):
+            self._image = self._image.convert("RGBA" if "A" in self._image.getbands() else "RGB")
+        self.width, self.height = self._image.size
+        self.bands = len(self._image.getbands())
+
+    def strips(self, rows: int) -> Iterator[np.ndarray]:
+        pixels = np.asarray(self._image)
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, np.newaxis]
+        for top in range(0, self.height, rows):
+            yield pixels[top:top + rows]
+
+    def close(self) -> None:
+        self._image.close()
+
+    def __enter__(self) -> PillowSource:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class TiffSource:
+    """Memory-mapped reader for uncompressed, strip-organised TIFF/BigTIFF.
+
+    Handles 8- and 16-bit unsigned grey, RGB and RGBA in chunky (interleaved)
+    order. When the strips are stored back to back, as almost every writer
+    does, each yielded strip is a view spanning as many TIFF strips as it
+    needs; otherwise the pieces are concatenated. Any other layout
+    (compression, tiles, planar or float samples) raises ``ValueError``.
+    """
+
+    _TAGS = (
+        tiff.IMAGE_WIDTH, tiff.IMAGE_LENGTH, tiff.BITS_PER_SAMPLE, tiff.COMPRESSION, tiff.PHOTOMETRIC,
+        tiff.STRIP_OFFSETS, tiff.SAMPLES_PER_PIXEL, tiff.ROWS_PER_STRIP, tiff.STRIP_BYTE_COUNTS,
+        tiff.PLANAR_CONFIGURATION, tiff.TILE_WIDTH, tiff.SAMPLE_FORMAT,
+    )
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = Path(path)
+        self._fh: BinaryIO = open(self.path, "rb")
+        try:
+            self._parse()
+            self._mapping = _Mapping(self._fh)
+        except Exception:
+            self._fh.close()
+            raise
+
+    def _parse(self) -> None:
+        order = "<" if self._fh.read(2) == b"II" else ">"
+        ifd, _ = tiff.read_tiff_tags(self._fh, self._TAGS, max_value_bytes=None)
+        width, height = ifd.get_int(tiff.IMAGE_WIDTH), ifd.get_int(tiff.IMAGE_LENGTH)
+        bits = set(ifd.get_ints(tiff.BITS_PER_SAMPLE) or (1,))
+        self.bands = ifd.get_int(tiff.SAMPLES_PER_PIXEL) or 1
+        offsets = ifd.get_ints(tiff.STRIP_OFFSETS)
+        counts = ifd.get_ints(tiff.STRIP_BYTE_COUNTS)
+        photometric = ifd.get_int(tiff.PHOTOMETRIC)
+        if not (width and height and offsets and counts):
+            raise ValueError(f"{self.path}: no strip layout")
+        if (ifd.get_int(tiff.COMPRESSION) or 1) != 1 or ifd.get_int(tiff.TILE_WIDTH) is not None:
+            raise ValueError(f"{self.path}: compressed or tiled TIFF")
+        if (ifd.get_int(tiff.PLANAR_CONFIGURATION) or 1) != 1 or (ifd.get_int(tiff.SAMPLE_FORMAT) or 1) != 1:
+            raise ValueError(f"{self.path}: planar or non-integer samples")
+        if bits not in ({8}, {16}) or self.bands not in (1, 3, 4) or photometric not in (0, 1, 2):
+            raise ValueError(f"{self.path}: unsupported sample layout")
+        self.width, self.height = width, height
+        self._invert = photometric == 0
+        self._dtype = np.dtype(np.uint8) if bits == {8} else np.dtype(order + "u2")
+        self._rows_per_strip = min(ifd.get_int(tiff.ROWS_PER_STRIP) or height, height)
+        self._row_bytes = width * self.bands * self._dtype.itemsize
+        if len(offsets) != -(-height // self._rows_per_strip):
+            raise ValueError(f"{self.path}: strip count does not match the image height")
+        strip_bytes = self._rows_per_strip * self._row_bytes
+        self._offsets = offsets
+        self._contiguous = all(offset == offsets[0] + i * strip_bytes for i, offset in enumerate(offsets))
+
+    def _rows(self, top: int, n: int) -> np.ndarray:
+        """Raw samples of rows ``[top, top + n)``."""
+        row_samples = self.width * self.bands
+        if self._contiguous:
+            return self._mapping.view(self._offsets[0] + top * self._row_bytes, n * row_samples, self._dtype)
+        pieces = []
+        row = top
+        while row < top + n:
+            strip, skip = divmod(row, self._rows_per_strip)
+            take = min(self._rows_per_strip - skip, top + n - row)
+            pieces.append(self._mapping.view(self._offsets[strip] + skip * self._row_bytes,
+                                             take * row_samples, self._dtype))
+            row += take
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+    def strips(self, rows: int) -> Iterator[np.ndarray]:
+        maxval = 255 if self._dtype.itemsize == 1 else 65535
+        top = 0
+        while top < self.height:
+            n = min(rows, self.height - top)
+            pixels = _to_uint8(self._rows(top, n), maxval)
+            if self._invert:
+                pixels = 255 - pixels
+            yield pixels.reshape(n, self.width, self.bands)
+            if self._contiguous:
+                self._mapping.release_before(self._offsets[0] + (top + n) * self._row_bytes)
+            top += n
+
+    def close(self) -> None:
+        self._mapping.close()
+        self._fh.close()
+
+    def __enter__(self) -> TiffSource:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_source(path: str | os.PathLike[str]) -> PNMSource | TiffSource | PillowSource:
+    """Pick the most memory-friendly reader for ``path``."""
+    suffix = Path(path).suffix.lower()
+    if suffix in PNM_SUFFIXES:
+        return PNMSource(path)
+    if suffix in TIFF_SUFFIXES:
+        try:
+            return TiffSource(path)
+        except ValueError as exc:
+            log.debug("not mapping %s: %s", path, exc)
+    return PillowSource(path)
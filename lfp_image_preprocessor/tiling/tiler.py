@@ -0,0 +1,178 @@
+"""End-to-end tiling of one original: read, cut, encode, write."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+
+from .encode import EncodedTile, SerialEncoder
+from .phash import HashCollector, ImageHashes
+from .placeholder import Placeholder, PlaceholderCollector
+from .pyramid import PyramidTiler, Tile, TileOptions
+from .sink import TileSink
+from .source import StripSource, open_source
+from .variants import VariantCollector
+
+log = logging.getLogger(__name__)
+
+
+class TileEncoder(Protocol):
+    def encode(self, tiles: Iterable[Tile], options: TileOptions) -> Iterator[EncodedTile]:
+        ...
+
+
+@dataclass
+class TileStats:
+    width: int = 0
+    height: int = 0
+    levels: int = 0
+    tiles: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+    encode_seconds: float = 0.0
+    duplicates: int = 0
+    """Tiles stored as aliases of an identical, already-written tile."""
+    bytes_deduplicated: int = 0
+    uniform_reused: int = 0
+    """Single-colour tiles whose encode was skipped."""
+    variants: int = 0
+    variant_bytes: int = 0
+    placeholder: Placeholder | None = None
+    hashes: ImageHashes | None = None
+    quality_total: int = 0
+    """Sum of the quality of every encoded tile."""
+    sample_bytes: int = 0
+    """Adaptive-quality size of the tiles also encoded at the uniform quality."""
+    sample_baseline_bytes: int = 0
+
+    @property
+    def encode_seconds_saved(self) -> float:
+        """Estimated from the mean encode time of the tiles that were encoded."""
+        encoded = self.tiles - self.uniform_reused
+        return self.uniform_reused * self.encode_seconds / encoded if encoded else 0.0
+
+    @property
+    def mean_quality(self) -> float:
+        encoded = self.tiles - self.uniform_reused
+        return self.quality_total / encoded if encoded else 0.0
+
+    @property
+    def adaptive_bytes_saved(self) -> int:
+        """Bytes adaptive quality saved against the uniform one, scaled up from the sample.
+
+        Negative when detailed tiles were given more than the uniform quality.
+        """
+        if not self.sample_bytes:
+            return 0
+        return round(self.bytes_written * (self.sample_baseline_bytes / self.sample_bytes - 1))
+
+
+def _merge_taps(*maps: Mapping[int, Callable[[np.ndarray], None]]) -> dict[int, Callable[[np.ndarray], None]]:
+    """One tap per level that calls every given tap of that level."""
+    merged: dict[int, list[Callable[[np.ndarray], None]]] = {}
+    for taps in maps:
+        for level, tap in taps.items():
+            merged.setdefault(level, []).append(tap)
+
+    def fan_out(callbacks: list[Callable[[np.ndarray], None]]) -> Callable[[np.ndarray], None]:
+        def tap(strip: np.ndarray) -> None:
+            for callback in callbacks:
+                callback(strip)
+        return callbacks[0] if len(callbacks) == 1 else tap
+
+    return {level: fan_out(callbacks) for level, callbacks in merged.items()}
+
+
+def tile_source(
+    source: StripSource,
+    sink: TileSink,
+    options: TileOptions = TileOptions(),
+    encoder: TileEncoder | None = None,
+    dedup: bool = False,
+) -> TileStats:
+    """Tile an already-open source into ``sink``.
+
+    ``encoder`` defaults to encoding in this process; pass a
+    :class:`~.parallel.ParallelEncoder` to spread the work over a pool.
+    With ``dedup``, a tile whose encoded bytes match an earlier tile of the
+    same image is written as a :meth:`~.sink.TileSink.alias` of it.
+    """
+    started = time.perf_counter()
+    tiler = PyramidTiler(source.width, source.height, options)
+    stats = TileStats(source.width, source.height, tiler.max_level + 1)
+    collector = VariantCollector(tiler.sizes, options) if options.variant_widths else None
+    placeholder = PlaceholderCollector(tiler.sizes)
+    hasher = HashCollector(tiler.sizes)
+    taps = _merge_taps(collector.taps if collector else {}, {placeholder.level: placeholder.tap},
+                       {hasher.level: hasher.tap})
+    tiles = tiler.tiles(source.strips(tiler.strip_rows), taps)
+    sink.begin(source.width, source.height, source.bands)
+    try:
+        _write_tiles(sink, (encoder or SerialEncoder()).encode(tiles, options), stats, dedup)
+        if collector is not None:
+            for variant in collector.variants():
+                sink.write_variant(variant.width, variant.height, variant.data)
+                stats.variants += 1
+                stats.variant_bytes += len(variant.data)
+        stats.placeholder = placeholder.placeholder()
+        stats.hashes = hasher.hashes()
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _write_tiles(sink: TileSink, tiles: Iterable[EncodedTile], stats: TileStats, dedup: bool) -> None:
+    seen: dict[bytes, tuple[int, int, int]] = {}
+    for tile in tiles:
+        stats.tiles += 1
+        stats.encode_seconds += tile.seconds
+        stats.uniform_reused += tile.reused
+        stats.quality_total += tile.quality
+        if tile.baseline_bytes:
+            stats.sample_bytes += len(tile.data)
+            stats.sample_baseline_bytes += tile.baseline_bytes
+        if dedup:
+            digest = hashlib.blake2b(tile.data, digest_size=16).digest()
+            target = seen.setdefault(digest, (tile.level, tile.col, tile.row))
+            if target != (tile.level, tile.col, tile.row):
+                sink.alias(tile.level, tile.col, tile.row, target)
+                stats.duplicates += 1
+                stats.bytes_deduplicated += len(tile.data)
+                continue
+        if tile.padded is not None:
+            sink.write_padded(tile.level, tile.col, tile.row, tile.padded)
+        sink.write(tile.level, tile.col, tile.row, tile.data)
+        stats.bytes_written += len(tile.data)
+
+
+def tile_image(
+    path: str | os.PathLike[str],
+    sink: TileSink,
+    options: TileOptions = TileOptions(),
+    encoder: TileEncoder | None = None,
+    dedup: bool = False,
+) -> TileStats:
+    """Tile the image file at ``path`` into ``sink``."""
+    with open_source(path) as source:
+        stats = tile_source(source, sink, options, encoder, dedup)
+    log.info("tiled %s: %dx%d, %d levels, %d tiles, %d bytes in %.2fs",
+             path, stats.width, stats.height, stats.levels, stats.tiles,
+             stats.bytes_written, stats.seconds)
+    if stats.duplicates or stats.uniform_reused:
+        log.info("%s: %d duplicate tiles (%d bytes) aliased, %d uniform encodes skipped (~%.2fs)",
+                 path, stats.duplicates, stats.bytes_deduplicated, stats.uniform_reused,
+                 stats.encode_seconds_saved)
+    if options.adaptive_quality is not None and stats.sample_bytes:
+        log.info("%s: adaptive quality averaged %.1f, saving ~%d bytes against quality %d",
+                 path, stats.mean_quality, stats.adaptive_bytes_saved, options.quality)
+    return stats
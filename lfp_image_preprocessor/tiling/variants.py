@@ -0,0 +1,66 @@
+"""Responsive gallery variants cut from the pyramid while it is built.
+
+Each requested width is taken from the smallest pyramid level at least
+that wide, which is under twice the target, and resized down from there
+with Lanczos. The level's strips are collected as they pass through the
+tiler (see ``taps`` in :meth:`.pyramid.PyramidTiler.tiles`), so variants
+cost no extra read or decode of the original. Widths at or above the
+original's are skipped rather than upscaled.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator, Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from .._optional import require
+from .encode import encode_tile
+from .pyramid import TileOptions
+
+
+class Variant(NamedTuple):
+    width: int
+    height: int
+    data: bytes
+
+
+def plan_variants(sizes: Sequence[tuple[int, int]], widths: Sequence[int]) -> dict[int, list[int]]:
+    """``{level: [target widths]}`` for the widths below the full width."""
+    full_width, _ = sizes[-1]
+    plan: dict[int, list[int]] = {}
+    for width in sorted(set(widths)):
+        if width >= full_width:
+            continue
+        level = next(level for level, (w, _) in enumerate(sizes) if w >= width)
+        plan.setdefault(level, []).append(width)
+    return plan
+
+
+class VariantCollector:
+    """Gathers the strips of the levels variants are cut from."""
+
+    def __init__(self, sizes: Sequence[tuple[int, int]], options: TileOptions):
+        self.sizes = sizes
+        self.options = options
+        self.plan = plan_variants(sizes, options.variant_widths)
+        self._strips: dict[int, list[np.ndarray]] = {level: [] for level in self.plan}
+
+    @property
+    def taps(self) -> dict[int, Callable[[np.ndarray], None]]:
+        return {level: strips.append for level, strips in self._strips.items()}
+
+    def variants(self) -> Iterator[Variant]:
+        """Resize and encode every planned variant, releasing each level after use."""
+        image_mod = require("PIL.Image", "tiling")
+        for level in sorted(self.plan, reverse=True):
+            pixels = np.concatenate(self._strips.pop(level))
+            source = image_mod.fromarray(pixels[:, :, 0] if pixels.shape[2] == 1 else pixels)
+            level_width, level_height = self.sizes[level]
+            for width in self.plan[level]:
+                height = max(1, round(level_height * width / level_width))
+                resized = np.asarray(source.resize((width, height), image_mod.Resampling.LANCZOS))
+                if resized.ndim == 2:
+                    resized = resized[:, :, np.newaxis]
+                yield Variant(width, height, encode_tile(resized, self.options.format, self.options.quality))
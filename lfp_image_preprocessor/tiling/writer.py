@@ -0,0 +1,232 @@
+"""Tile I/O off the encode path.
+
+On network storage every loose tile costs a few round trips (path lookup,
+create, write, close), so the time goes into latency, not bandwidth. Two
+pieces cut that down:
+
+* :class:`TileFiles` does the file operations of the directory sinks. It
+  creates each directory once and keeps descriptors of recently used ones
+  open. Tiles are then created relative to the descriptor, so all the tiles
+  of a level share one lookup of its path. Durability is a policy, one of
+  :data:`FSYNC_MODES`: ``off`` leaves flushing to the OS, ``batch`` fsyncs
+  every ``batch`` files, and ``end`` fsyncs everything in :meth:`close`.
+  Both of the last two sync the directories too, so the names survive a
+  crash as well as the data.
+* :class:`ThreadedSink` runs any :class:`~.sink.TileSink` on a writer
+  thread fed through a bounded queue. The tiling loop, and the encoders
+  behind it, only wait for I/O when the writer falls ``max_pending`` calls
+  behind.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .sink import TileSink
+
+log = logging.getLogger(__name__)
+
+FSYNC_MODES = ("off", "batch", "end")
+
+_DIR_FD = {os.open, os.link, os.symlink} <= os.supports_dir_fd
+_CREATE = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0)
+
+
+def fsync_path(path: str | os.PathLike[str]) -> None:
+    """fsync a file or directory by name."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class TileFiles:
+    """Writes, links and syncs loose files through cached directory descriptors."""
+
+    def __init__(self, fsync: str = "off", batch: int = 256, open_dirs: int = 64):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {FSYNC_MODES}")
+        self.fsync = fsync
+        self.batch = batch
+        self.open_dirs = open_dirs
+        self._dirs: OrderedDict[Path, int | None] = OrderedDict()
+        self._made: set[Path] = set()
+        self._unsynced: list[Path] = []
+        self._unsynced_dirs: set[Path] = set()
+
+    def _dir(self, directory: Path) -> int | None:
+        """Descriptor of ``directory``, created if needed; ``None`` without dir_fd support."""
+        if directory in self._dirs:
+            self._dirs.move_to_end(directory)
+            return self._dirs[directory]
+        if directory not in self._made:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._made.add(directory)
+            if self.fsync != "off":
+                self._unsynced_dirs.add(directory.parent)
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY) if _DIR_FD else None
+        self._dirs[directory] = fd
+        if len(self._dirs) > self.open_dirs:
+            _, old = self._dirs.popitem(last=False)
+            if old is not None:
+                os.close(old)
+        return fd
+
+    def _target(self, path: Path) -> tuple[str | Path, int | None]:
+        fd = self._dir(path.parent)
+        return (path.name, fd) if fd is not None else (path, None)
+
+    def write(self, path: Path, data: bytes) -> None:
+        name, dir_fd = self._target(path)
+        fd = os.open(name, _CREATE, 0o666, dir_fd=dir_fd)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        self._written(path)
+
+    def link(self, source: Path, path: Path) -> None:
+        """Hard link, or a copy where the filesystem refuses one (e.g. its link limit)."""
+        name, dir_fd = self._target(path)
+        try:
+            os.link(source, name, dst_dir_fd=dir_fd)
+        except OSError:
+            shutil.copyfile(source, path)
+        self._written(path)
+
+    def symlink(self, target: str, path: Path) -> None:
+        name, dir_fd = self._target(path)
+        os.symlink(target, name, dir_fd=dir_fd)
+        if self.fsync != "off":
+            self._unsynced_dirs.add(path.parent)
+
+    def _written(self, path: Path) -> None:
+        if self.fsync == "off":
+            return
+        self._unsynced.append(path)
+        self._unsynced_dirs.add(path.parent)
+        if self.fsync == "batch" and len(self._unsynced) >= self.batch:
+            self.sync()
+
+    def sync(self) -> None:
+        """fsync every file written since the last sync, then their directories."""
+        for path in self._unsynced:
+            fsync_path(path)
+        for directory in sorted(self._unsynced_dirs, key=lambda d: len(d.parts), reverse=True):
+            fsync_path(directory)
+        self._unsynced.clear()
+        self._unsynced_dirs.clear()
+
+    def close(self) -> None:
+        try:
+            if self.fsync != "off":
+                self.sync()
+        finally:
+            self.abort()
+
+    def abort(self) -> None:
+        """Close the cached descriptors without syncing."""
+        for fd in self._dirs.values():
+            if fd is not None:
+                os.close(fd)
+        self._dirs.clear()
+        self._unsynced.clear()
+        self._unsynced_dirs.clear()
+
+
+class ThreadedSink:
+    """Runs another sink's calls in order on a writer thread.
+
+    Calls are queued, at most ``max_pending`` at a time. An error raised by
+    the wrapped sink is re-raised by the next call after it, at the latest
+    by :meth:`close`; calls queued after the error are dropped and the
+    wrapped sink is aborted. Whatever happens, :meth:`close` and
+    :meth:`abort` stop and join the thread.
+    """
+
+    def __init__(self, sink: TileSink, max_pending: int = 256):
+        self.sink = sink
+        self.path = sink.path
+        self.stalled = 0.0
+        """Seconds callers spent waiting for room in the queue."""
+        self._queue: queue.Queue[tuple[Callable[..., None], tuple[object, ...]] | None] = queue.Queue(max_pending)
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+        self._aborted = False
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            if self._error is None and not self._aborted:
+                call, args = item
+                try:
+                    call(*args)
+                except BaseException as exc:
+                    self._error = exc
+
+    def _put(self, call: Callable[..., None], *args: object) -> None:
+        if self._error is not None:
+            raise self._error
+        try:
+            self._queue.put_nowait((call, args))
+        except queue.Full:
+            started = time.perf_counter()
+            self._queue.put((call, args))
+            self.stalled += time.perf_counter() - started
+
+    def begin(self, width: int, height: int, bands: int) -> None:
+        # Daemonic, so a tiling run that dies before close() cannot hang exit.
+        self._thread = threading.Thread(target=self._run, name="tile-writer", daemon=True)
+        self._thread.start()
+        self._put(self.sink.begin, width, height, bands)
+
+    def write(self, level: int, col: int, row: int, data: bytes) -> None:
+        self._put(self.sink.write, level, col, row, data)
+
+    def alias(self, level: int, col: int, row: int, target: tuple[int, int, int]) -> None:
+        self._put(self.sink.alias, level, col, row, target)
+
+    def write_padded(self, level: int, col: int, row: int, data: bytes) -> None:
+        self._put(self.sink.write_padded, level, col, row, data)
+
+    def write_variant(self, width: int, height: int, data: bytes) -> None:
+        self._put(self.sink.write_variant, width, height, data)
+
+    def _stop(self) -> None:
+        """Send the sentinel and wait for the thread to drain the queue."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        assert self._thread is not None, "begin() was not called"
+        try:
+            if self._error is None:
+                self._queue.put((self.sink.close, ()))
+        finally:
+            self._stop()
+        if self.stalled:
+            log.debug("%s: waited %.2fs on the tile writer", self.path, self.stalled)
+        if self._error is not None:
+            self.sink.abort()
+            raise self._error
+
+    def abort(self) -> None:
+        self._aborted = True
+        try:
+            self._stop()
+        finally:
+            self.sink.abort()
@@ -0,0 +1,215 @@
+"""Noticing changes to the photo library: inotify on Linux, polling elsewhere.
+
+Both watchers answer :meth:`poll` with the set of paths that changed since
+the last call, or ``None`` when changes were lost (inotify queue overflow)
+and the caller should resynchronise from scratch. :class:`Debouncer` turns
+that stream into batches, so a photographer copying in a few hundred files
+triggers one update rather than hundreds.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+from collections.abc import Iterable
+from typing import Protocol
+
+log = logging.getLogger(__name__)
+
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    def poll(self, timeout: float) -> set[str] | None:
+        """Changed paths, waiting up to ``timeout`` seconds for the first one."""
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class InotifyWatcher:
+    """Recursive inotify watch; new subdirectories are picked up as they appear.
+
+    Only one watch descriptor per directory is held, and it is dropped when
+    the directory goes away, so memory tracks the directory count.
+    """
+
+    def __init__(self, roots: Iterable[str | os.PathLike[str]]):
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, str] = {}
+        try:
+            for root in roots:
+                self._watch_tree(os.fspath(root))
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, top: str) -> list[str]:
+        """Watch ``top`` and everything below it; return the files found."""
+        files: list[str] = []
+        for directory, subdirs, names in os.walk(top):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK | IN_ONLYDIR)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+                if err in (errno.ENOENT, errno.ENOTDIR):
+                    subdirs.clear()
+                    continue
+                raise OSError(err, f"cannot watch {directory}")
+            self._dirs[wd] = directory
+            files.extend(os.path.join(directory, name) for name in names)
+        return files
+
+    def poll(self, timeout: float) -> set[str] | None:
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        changed: set[str] = set()
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\x00")
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    log.warning("inotify queue overflowed; resynchronising")
+                    return None
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land before the new watch exists; report them too.
+                    changed.update(self._watch_tree(path))
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._dirs.clear()
+
+
+class PollingWatcher:
+    """Re-walks the roots every ``interval`` seconds and diffs size and mtime."""
+
+    def __init__(self, roots: Iterable[str | os.PathLike[str]], interval: float = 5.0):
+        self._roots = [os.fspath(root) for root in roots]
+        self.interval = interval
+        self._snapshot = self._walk()
+        self._next = time.monotonic() + interval
+
+    def _walk(self) -> dict[str, tuple[int, int]]:
+        snapshot: dict[str, tuple[int, int]] = {}
+        for root in self._roots:
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float) -> set[str] | None:
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(timeout, 0))
+            return set()
+        time.sleep(max(wait, 0))
+        self._next = time.monotonic() + self.interval
+        current = self._walk()
+        previous, self._snapshot = self._snapshot, current
+        changed = {path for path, stamp in current.items() if previous.get(path) != stamp}
+        changed.update(previous.keys() - current.keys())
+        return changed
+
+    def close(self) -> None:
+        self._snapshot = {}
+
+
+def open_watcher(roots: Iterable[str | os.PathLike[str]], poll_interval: float | None = None) -> Watcher:
+    """inotify where available, else (or with ``poll_interval``) polling."""
+    roots = list(roots)
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as exc:  # AttributeError: no inotify in libc
+            log.warning("inotify unavailable (%s); polling every 5s instead", exc)
+            poll_interval = 5.0
+    return PollingWatcher(roots, poll_interval)
+
+
+class Debouncer:
+    """Collects changes until the library has been quiet for ``quiet`` seconds.
+
+    ``max_delay`` bounds how long a steady trickle of changes can postpone a
+    batch. A lost-events signal (``None``) is carried through as a request
+    to resynchronise.
+    """
+
+    def __init__(self, quiet: float = 2.0, max_delay: float = 30.0):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self._pending: set[str] = set()
+        self._resync = False
+        self._first = self._last = 0.0
+
+    def add(self, changes: set[str] | None, now: float | None = None) -> None:
+        if changes is not None and not changes:
+            return
+        now = time.monotonic() if now is None else now
+        if not (self._pending or self._resync):
+            self._first = now
+        self._last = now
+        if changes is None:
+            self._resync = True
+            self._pending.clear()
+        elif not self._resync:
+            self._pending |= changes
+
+    def ready(self, now: float | None = None) -> bool:
+        if not (self._pending or self._resync):
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self._last >= self.quiet or now - self._first >= self.max_delay
+
+    def take(self) -> set[str] | None:
+        """The batch (``None`` for a full resync); resets the debouncer."""
+        batch = None if self._resync else self._pending
+        self._pending, self._resync = set(), False
+        return batch
@@ -0,0 +1,19 @@
+import pytest
+
+
+def _tagged_jpeg(path, tags=(), size=(50, 40), seed=0):
+    """Write a JPEG whose EXIF XPKeywords hold ``tags``; returns ``path``."""
+    np = pytest.importorskip("numpy")
+    image_mod = pytest.importorskip("PIL.Image")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    exif = image_mod.Exif()
+    if tags:
+        exif[0x9C9E] = ";".join(tags).encode("utf-16-le") + b"\0\0"
+    image_mod.fromarray(pixels).save(path, exif=exif)
+    return path
+
+
+@pytest.fixture
+def tagged_jpeg():
+    return _tagged_jpeg
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from lfp_image_preprocessor.search.autocomplete import Autocomplete, autocomplete_from_index, build_autocomplete
+from lfp_image_preprocessor.search.index import TagIndexBuilder
+
+ALPHABET = "abcé日 -"
+
+
+def _brute(counts, prefix, k):
+    matches = sorted((-count, tag) for tag, count in counts.items() if tag.startswith(prefix))
+    return [(tag, -count) for count, tag in matches[:k]]
+
+
+def _counts(seed, size):
+    rng = random.Random(seed)
+    counts = {}
+    while len(counts) < size:
+        tag = "".join(rng.choices(ALPHABET, k=rng.randrange(1, 8)))
+        # Few distinct counts, so ties are common.
+        counts[tag] = rng.choice([1, 2, 3, 5, 8, 100, rng.randrange(1000)])
+    return counts
+
+
+@pytest.mark.parametrize("seed,size", [(0, 1), (1, 20), (2, 500), (3, 3000)])
+def test_top_k_matches_brute_force(seed, size):
+    counts = _counts(seed, size)
+    trie = Autocomplete(build_autocomplete(counts))
+    assert len(trie) == len(counts)
+    rng = random.Random(seed)
+    prefixes = {""} | {tag[:rng.randrange(len(tag) + 1)] for tag in counts}
+    prefixes |= {"".join(rng.choices(ALPHABET, k=rng.randrange(1, 4))) for _ in range(100)}
+    for prefix in sorted(prefixes):
+        for k in (1, 3, 10):
+            assert trie.complete(prefix, k) == _brute(counts, prefix, k), (prefix, k)
+
+
+def test_prefixes_of_other_tags_and_exact_matches():
+    counts = {"film": 10, "films": 3, "filmic": 30, "fig": 99, "f": 1}
+    trie = Autocomplete(build_autocomplete(counts))
+    assert trie.complete("film") == [("filmic", 30), ("film", 10), ("films", 3)]
+    assert trie.complete("f", 2) == [("fig", 99), ("filmic", 30)]
+    assert trie.complete("filmx") == []
+    assert trie.complete("g") == []
+    assert trie.complete("f", 0) == []
+
+
+def test_empty_trie_and_bad_magic():
+    empty = Autocomplete(build_autocomplete({}))
+    assert len(empty) == 0
+    assert empty.complete("") == []
+    with pytest.raises(ValueError, match="magic"):
+        Autocomplete(b"NOTATRIE")
+
+
+def test_counts_come_from_the_index():
+    builder = TagIndexBuilder()
+    for image_id in range(10):
+        builder.add(image_id, ["sea"] + (["seal"] if image_id < 3 else []) + (["sky"] if image_id % 2 else []))
+    trie = Autocomplete(autocomplete_from_index(builder.build()))
+    assert trie.complete("s") == [("sea", 10), ("sky", 5), ("seal", 3)]
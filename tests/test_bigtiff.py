@@ -0,0 +1,103 @@
+import io
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.tiling.bigtiff import COMPRESSION, TiffSink, tiff_options  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import TileOptions, level_sizes  # noqa: E402
+from lfp_image_preprocessor.tiling.tiler import tile_image  # noqa: E402
+
+_TYPES = {2: "B", 3: "H", 4: "I", 16: "Q", 18: "Q"}
+
+
+def _read_ifd(data, offset):
+    """``{tag: values}`` of the BigTIFF IFD at ``offset``, and the next IFD offset."""
+    (count,) = struct.unpack_from("<Q", data, offset)
+    tags = {}
+    for index in range(count):
+        tag, kind, n, inline = struct.unpack_from("<HHQ8s", data, offset + 8 + 20 * index)
+        fmt = f"<{n}{_TYPES[kind]}"
+        size = struct.calcsize(fmt)
+        raw = inline if size <= 8 else data[struct.unpack("<Q", inline)[0]:][:size]
+        tags[tag] = struct.unpack(fmt, raw[:size])
+    (following,) = struct.unpack_from("<Q", data, offset + 8 + 20 * count)
+    return tags, following
+
+
+def _pyramid(tmp_path, width, height, options, bands=3):
+    # Smooth gradients, so lossy tiles stay close to the source.
+    y, x = np.mgrid[:height, :width]
+    image = np.stack([x * 255 // width, y * 255 // height, (x + y) * 127 // (width + height)][:bands], axis=2)
+    source = tmp_path / "source.png"
+    Image.fromarray(image.astype(np.uint8).squeeze(axis=2) if bands == 1 else image.astype(np.uint8)).save(source)
+    options = tiff_options(options)
+    output = tmp_path / "out.tif"
+    tile_image(source, TiffSink(output, options), options)
+    return np.asarray(Image.open(source)), output
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "webp"])
+def test_subifd_layout(tmp_path, fmt):
+    options = TileOptions(tile_size=64, format=fmt)
+    image, output = _pyramid(tmp_path, 300, 170, options)
+    data = output.read_bytes()
+    assert data[:4] == b"II+\x00"
+    ifd0, following = _read_ifd(data, struct.unpack_from("<Q", data, 8)[0])
+    assert following == 0
+    # Every level from the full size down to the first that fits in one tile.
+    expected = level_sizes(300, 170)[::-1]
+    expected = expected[:next(i for i, (w, h) in enumerate(expected) if w <= 64 and h <= 64) + 1]
+    levels = [ifd0] + [_read_ifd(data, offset)[0] for offset in ifd0[330]]
+    assert [(level[256][0], level[257][0]) for level in levels] == expected
+    assert [level[254][0] for level in levels] == [0] + [1] * (len(levels) - 1)
+    for level in levels:
+        assert level[259] == (COMPRESSION[fmt],)
+        assert level[322] == level[323] == (64,)
+        cols, rows = -(-level[256][0] // 64), -(-level[257][0] // 64)
+        assert len(level[324]) == len(level[325]) == cols * rows
+        assert all(level[325])
+    for index, (offset, count) in enumerate(zip(ifd0[324], ifd0[325])):
+        tile = np.asarray(Image.open(io.BytesIO(data[offset:offset + count])).convert("RGB"))
+        assert tile.shape == (64, 64, 3)
+        row, col = divmod(index, -(-300 // 64))
+        original = image[row * 64:(row + 1) * 64, col * 64:(col + 1) * 64]
+        h, w = original.shape[:2]
+        assert np.abs(tile[:h, :w].astype(int) - original).mean() < 4
+
+
+def test_pillow_reads_the_full_resolution_level(tmp_path):
+    image, output = _pyramid(tmp_path, 200, 130, TileOptions(tile_size=64))
+    with Image.open(output) as tiff:
+        assert tiff.size == (200, 130)
+        tiff.load()
+        assert np.abs(np.asarray(tiff.convert("RGB")).astype(int) - image).mean() < 4
+
+
+def test_grey_jpeg(tmp_path):
+    _, output = _pyramid(tmp_path, 100, 100, TileOptions(tile_size=32), bands=1)
+    data = output.read_bytes()
+    ifd0, _ = _read_ifd(data, struct.unpack_from("<Q", data, 8)[0])
+    assert ifd0[277] == (1,) and ifd0[262] == (1,)
+
+
+@pytest.mark.parametrize("options", [TileOptions(format="png"), TileOptions(tile_size=100),
+                                     TileOptions(overlap=1)])
+def test_unsupported_options(options):
+    with pytest.raises(ValueError):
+        tiff_options(options)
+
+
+def test_sink_needs_padded_tiles(tmp_path):
+    with pytest.raises(ValueError):
+        TiffSink(tmp_path / "out.tif", TileOptions())
+
+
+def test_abort_leaves_no_file(tmp_path):
+    sink = TiffSink(tmp_path / "out.tif", tiff_options(TileOptions(tile_size=64)))
+    sink.begin(100, 100, 3)
+    sink.write(7, 0, 0, b"tile")
+    sink.abort()
+    assert list(tmp_path.iterdir()) == []
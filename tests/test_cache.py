@@ -0,0 +1,147 @@
+import importlib
+import os
+import sqlite3
+import time
+
+import pytest
+
+from lfp_image_preprocessor.discovery import cache as cache_module
+from lfp_image_preprocessor.discovery.cache import MetadataCache
+from lfp_image_preprocessor.discovery.metadata import ImageRecord
+from lfp_image_preprocessor.discovery.scan import scan
+
+# The package re-exports the scan() function under the module's name.
+scan_module = importlib.import_module("lfp_image_preprocessor.discovery.scan")
+
+
+class Stat:
+    def __init__(self, size, mtime_ns):
+        self.st_size = size
+        self.st_mtime_ns = mtime_ns
+
+
+def _record(path, size=10, mtime_ns=5, **kwargs):
+    return ImageRecord(path, size, mtime_ns, **kwargs)
+
+
+def test_round_trip_and_invalidation(tmp_path):
+    full = _record("/lib/a.jpg", format="jpeg", width=3, height=2, keywords=("sea", "sky"),
+                   caption="Dusk", date="2020-01-02")
+    bare = _record("/lib/b.png")
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        cache.store([full, bare])
+        assert len(cache) == 2
+        found = cache.lookup([("/lib/a.jpg", Stat(10, 5)), ("/lib/b.png", Stat(10, 5)), ("/lib/c.jpg", Stat(1, 1))])
+        assert found == {"/lib/a.jpg": full, "/lib/b.png": bare}
+        assert cache.lookup([("/lib/a.jpg", Stat(11, 5)), ("/lib/b.png", Stat(10, 6))]) == {}
+        assert (cache.hits, cache.misses) == (2, 3)
+    # The cache survives reopening.
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        assert cache.lookup([("/lib/a.jpg", Stat(10, 5))]) == {"/lib/a.jpg": full}
+
+
+def test_bulk_lookup_spans_several_batches(tmp_path):
+    records = [_record(f"/lib/{i:05}.jpg", keywords=(f"t{i}",)) for i in range(3 * cache_module._BATCH + 7)]
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        cache.store(records)
+        found = cache.lookup((record.path, Stat(10, 5)) for record in records)
+    assert found == {record.path: record for record in records}
+
+
+def test_evict_only_touches_vanished_files_under_the_roots(tmp_path):
+    paths = ["/lib/a.jpg", "/lib/sub/b.jpg", "/libx/c.jpg", "/other/d.jpg"]
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        cache.store(_record(path) for path in paths)
+        assert cache.evict(["/lib"], {"/lib/a.jpg"}) == 1
+        remaining = cache.lookup((path, Stat(10, 5)) for path in paths)
+    assert sorted(remaining) == ["/lib/a.jpg", "/libx/c.jpg", "/other/d.jpg"]
+
+
+def test_undecodable_paths_are_never_stored(tmp_path):
+    odd = "/lib/\udcff.jpg"
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        cache.store([_record(odd), _record("/lib/a.jpg")])
+        assert len(cache) == 1
+        assert cache.lookup([(odd, Stat(10, 5))]) == {}
+
+
+def test_other_schema_versions_are_rebuilt(tmp_path):
+    db = sqlite3.connect(tmp_path / "meta.db")
+    db.execute("CREATE TABLE records (path TEXT)")
+    db.execute("INSERT INTO records VALUES ('/lib/a.jpg')")
+    db.execute("PRAGMA user_version=99")
+    db.commit()
+    db.close()
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        assert len(cache) == 0
+        cache.store([_record("/lib/a.jpg")])
+        assert len(cache) == 1
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    opened = []
+    real = scan_module.probe
+
+    def counting(path, stat=None):
+        opened.append(path)
+        return real(path, stat)
+
+    monkeypatch.setattr(scan_module, "probe", counting)
+    return opened
+
+
+def test_warm_scan_opens_no_files_and_evicts_vanished_ones(tmp_path, tagged_jpeg, probes):
+    library = tmp_path / "library"
+    for index in range(30):
+        tagged_jpeg(library / f"d{index % 3}" / f"{index}.jpg", [f"t{index}"], size=(8, 8), seed=index)
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        cold = {record.path: record for record in scan([library], cache=cache)}
+        assert len(probes) == 30 and len(cache) == 30
+        probes.clear()
+        warm = {record.path: record for record in scan([library], cache=cache)}
+        assert warm == cold and probes == []
+        assert cache.hits == 30
+
+        changed = library / "d0" / "0.jpg"
+        tagged_jpeg(changed, ["new"], size=(9, 9))
+        os.utime(changed, ns=(1, 1))
+        (library / "d1" / "1.jpg").unlink()
+        records = {record.path: record for record in scan([library], cache=cache)}
+        assert probes == [str(changed)]
+        assert records[str(changed)].keywords == ("new",)
+        assert len(records) == 29 and len(cache) == 29 and cache.evicted == 1
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root can list anything")
+def test_incomplete_walk_does_not_evict(tmp_path, tagged_jpeg):
+    library = tmp_path / "library"
+    tagged_jpeg(library / "locked" / "a.jpg")
+    with MetadataCache(tmp_path / "meta.db") as cache:
+        list(scan([library], cache=cache))
+        (library / "locked").chmod(0)
+        try:
+            list(scan([library], cache=cache))
+        finally:
+            (library / "locked").chmod(0o755)
+        assert len(cache) == 1 and cache.evicted == 0
+
+
+def test_no_change_build_finishes_well_under_a_second(tmp_path, tagged_jpeg, probes):
+    pytest.importorskip("numpy")
+    from lfp_image_preprocessor.build import BuildOptions, library_pipeline
+
+    library = tmp_path / "library"
+    for index in range(200):
+        tagged_jpeg(library / f"{index // 50}" / f"{index}.jpg", [f"t{index % 7}"], size=(16, 16), seed=index)
+    options = BuildOptions(tile_size=16, variant_widths=(), write_queue=0)
+    library_pipeline(library, tmp_path / "out", options).run()
+
+    probes.clear()
+    started = time.perf_counter()
+    report = library_pipeline(library, tmp_path / "out", options).run()
+    assert time.perf_counter() - started < 0.5
+    assert report.ran == [] and sorted(report.skipped) == ["index", "scan", "tiles"]
+    # Even a forced scan answers every file from the metadata cache.
+    report = library_pipeline(library, tmp_path / "out", options).run(force=["scan"])
+    assert "scan" in report.ran and probes == []
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor import daemon as daemon_module  # noqa: E402
+from lfp_image_preprocessor.build import BuildOptions  # noqa: E402
+from lfp_image_preprocessor.daemon import LibraryDaemon  # noqa: E402
+from lfp_image_preprocessor.search import ShardedIndex  # noqa: E402
+
+
+@pytest.fixture
+def library(tmp_path, tagged_jpeg):
+    tagged_jpeg(tmp_path / "lib" / "a.jpg", ["sky", "beach"], seed=1)
+    tagged_jpeg(tmp_path / "lib" / "b.jpg", ["sky"], seed=2)
+    daemon = LibraryDaemon(tmp_path / "lib", tmp_path / "out",
+                           BuildOptions(tile_size=32, variant_widths=(), write_queue=0))
+    daemon.resync()
+    return daemon
+
+
+def _postings(daemon, tag):
+    return ShardedIndex.open(daemon.output / "search").postings(tag)
+
+
+def _id(daemon, path):
+    return daemon.rows[str(path)]["id"]
+
+
+def test_apply_adds_updates_and_removes(library, tagged_jpeg):
+    lib = library.library
+    new = tagged_jpeg(lib / "c.jpg", ["city"], seed=3)
+    tagged_jpeg(lib / "b.jpg", ["forest"], seed=2)
+    (lib / "a.jpg").unlink()
+    assert library.apply({str(new), str(lib / "b.jpg"), str(lib / "a.jpg")}) == (2, 1)
+    assert _postings(library, "city") == [_id(library, new)]
+    assert _postings(library, "sky") == []
+    assert _postings(library, "forest") == [_id(library, lib / "b.jpg")]
+    assert (library.output / "tiles" / "c_jpg").is_dir()
+    assert not (library.output / "tiles" / "a_jpg").exists()
+
+
+def test_unreadable_file_is_retried_without_losing_the_batch(library, tagged_jpeg):
+    lib = library.library
+    good = tagged_jpeg(lib / "good.jpg", ["city"], seed=3)
+    partial = tagged_jpeg(lib / "partial.jpg", ["night"], seed=4)
+    data = partial.read_bytes()
+    partial.write_bytes(data[:23])  # cut inside the EXIF segment, still being copied
+    assert library.apply({str(good), str(partial)}) == (1, 0)
+    assert _postings(library, "city") == [_id(library, good)]
+    assert str(partial) not in library.rows
+    partial.write_bytes(data)
+    assert library.apply(set()) == (1, 0)
+    assert _postings(library, "night") == [_id(library, partial)]
+
+
+def test_failed_delta_stays_pending(library, tagged_jpeg, monkeypatch):
+    new = tagged_jpeg(library.library / "c.jpg", ["city"], seed=3)
+
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(daemon_module, "apply_delta", broken)
+        with pytest.raises(OSError):
+            library.apply({str(new)})
+    assert _postings(library, "city") == []
+    assert library.apply(set()) == (0, 0)
+    assert _postings(library, "city") == [_id(library, new)]
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from lfp_image_preprocessor.search.duplicates import HASH_BITS, MultiIndexHash, duplicate_clusters, hamming
+
+
+def _flip(value, bits, rng):
+    for bit in rng.sample(range(HASH_BITS), bits):
+        value ^= 1 << bit
+    return value
+
+
+def _hashes(seed=0, families=40, size=4, loners=200):
+    """Random hashes plus families of near copies a few bits apart."""
+    rng = random.Random(seed)
+    hashes = {}
+    for _ in range(families):
+        root = rng.getrandbits(HASH_BITS)
+        for _ in range(size):
+            hashes[len(hashes)] = _flip(root, rng.randrange(6), rng)
+    for _ in range(loners):
+        hashes[len(hashes)] = rng.getrandbits(HASH_BITS)
+    keys = list(hashes)
+    rng.shuffle(keys)
+    return {key: hashes[key] for key in keys}
+
+
+def _brute_clusters(hashes, threshold):
+    keys = list(hashes)
+    parent = {key: key for key in keys}
+
+    def find(key):
+        while parent[key] != key:
+            key = parent[key]
+        return key
+
+    for i, a in enumerate(keys):
+        for b in keys[i + 1:]:
+            if hamming(hashes[a], hashes[b]) <= threshold:
+                parent[find(a)] = find(b)
+    groups = {}
+    for key in keys:
+        groups.setdefault(find(key), []).append(key)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3, 5, 6, 8, 11])
+def test_search_finds_exactly_the_hashes_within_radius(radius):
+    rng = random.Random(radius)
+    hashes = _hashes(radius)
+    table = MultiIndexHash(radius)
+    for key, value in hashes.items():
+        table.add(value, key)
+    assert len(table) == len(hashes)
+    queries = [_flip(value, rng.randrange(radius + 2), rng) for value in rng.sample(list(hashes.values()), 60)]
+    for query in queries:
+        expected = {key: hamming(value, query) for key, value in hashes.items() if hamming(value, query) <= radius}
+        assert dict(table.search(query)) == expected
+        smaller = radius // 2
+        assert dict(table.search(query, smaller)) == {k: d for k, d in expected.items() if d <= smaller}
+
+
+def test_search_rejects_a_larger_radius():
+    with pytest.raises(ValueError):
+        MultiIndexHash(4).search(0, 5)
+    with pytest.raises(ValueError):
+        MultiIndexHash(HASH_BITS)
+
+
+@pytest.mark.parametrize("threshold", [0, 2, 4, 6, 9])
+def test_clusters_match_brute_force(threshold):
+    hashes = _hashes(threshold + 100)
+    clusters = duplicate_clusters(hashes, threshold)
+    assert sorted(clusters) == _brute_clusters(hashes, threshold)
+    assert [len(group) for group in clusters] == sorted((len(group) for group in clusters), reverse=True)
+
+
+def test_clusters_chain_through_intermediate_hashes():
+    # 10 and 12 are 8 bits apart, but both are within 4 of 11.
+    hashes = {10: 0, 11: 0xF, 12: 0xFF, 13: 0xFFFF << 48}
+    assert duplicate_clusters(hashes, 4) == [[10, 11, 12]]
+    assert duplicate_clusters(hashes, 3) == []
+    assert duplicate_clusters({}, 6) == []
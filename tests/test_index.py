@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from lfp_image_preprocessor.search.index import MAGIC, TagIndex, TagIndexBuilder, TagIndexReader, intersect
+from lfp_image_preprocessor.search.varint import decode_deltas, encode_deltas, read_varint, write_varint
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 16383, 16384, 2**32 - 1, 2**63])
+def test_varint_round_trip(value):
+    out = bytearray(b"x")
+    write_varint(out, value)
+    assert read_varint(out, 1) == (value, len(out))
+
+
+def test_varint_sizes():
+    for value, size in [(0, 1), (127, 1), (128, 2), (16383, 2), (16384, 3)]:
+        out = bytearray()
+        write_varint(out, value)
+        assert len(out) == size
+
+
+def test_negative_varint():
+    with pytest.raises(ValueError):
+        write_varint(bytearray(), -1)
+
+
+def test_deltas_store_gaps_minus_one():
+    assert encode_deltas([0, 1, 2]) == b"\0\0\0"
+    assert encode_deltas([5, 7, 200]) == bytes([5, 1, 192, 1])
+    assert encode_deltas([]) == b""
+
+
+def test_deltas_fuzz():
+    rng = random.Random(0)
+    for _ in range(200):
+        ids = sorted(rng.sample(range(rng.choice([10, 1000, 2**40])), rng.randrange(0, 10)))
+        data = encode_deltas(ids)
+        assert decode_deltas(data) == ids
+        if ids:
+            # Blocks sit back to back; the count stops decoding at the block's end.
+            assert decode_deltas(data + b"\x05\x07", len(ids)) == ids
+
+
+@pytest.mark.parametrize("ids", [[3, 3], [4, 2]])
+def test_deltas_need_strictly_increasing_ids(ids):
+    with pytest.raises(ValueError):
+        encode_deltas(ids)
+
+
+def _library(seed=0, images=400):
+    rng = random.Random(seed)
+    tags = ["sky", "beach", "ünïcode", "a", "a b", "x" * 200] + [f"tag{i}" for i in range(30)]
+    return {image_id: rng.sample(tags, rng.randrange(0, 6)) for image_id in rng.sample(range(10**6), images)}
+
+
+def _index(library):
+    builder = TagIndexBuilder()
+    for image_id, tags in library.items():
+        builder.add(image_id, tags)
+    return builder.build()
+
+
+def test_index_round_trip():
+    library = _library()
+    index = _index(library)
+    data = index.to_bytes()
+    assert data.startswith(MAGIC)
+    reader = TagIndexReader(data)
+    assert reader.tags() == sorted(index.tags())
+    for tag in reader.tags():
+        expected = sorted(image_id for image_id, tags in library.items() if tag in tags)
+        assert reader.postings(tag) == index.postings(tag) == expected
+        assert reader.count(tag) == len(expected)
+        assert reader.bitmap(tag).to_list() == expected
+    assert dict(TagIndex.from_bytes(data).items()) == dict(index.items())
+
+
+def test_missing_tags():
+    reader = TagIndexReader(_index({1: ["a"]}).to_bytes())
+    assert "b" not in reader
+    assert reader.postings("b") == []
+    assert reader.count("b") == 0
+
+
+def test_empty_index(tmp_path):
+    path = tmp_path / "tags.bin"
+    assert TagIndex({}).write(path) == len(MAGIC) + 1
+    assert len(TagIndex.read(path)) == 0
+
+
+def test_bad_magic():
+    with pytest.raises(ValueError, match="magic"):
+        TagIndexReader(b"LFPTAGS1\0")
+
+
+def test_builder_rejects_negative_ids():
+    with pytest.raises(ValueError):
+        TagIndexBuilder().add(-1, ["a"])
+
+
+def test_intersect_fuzz():
+    rng = random.Random(1)
+    for _ in range(200):
+        lists = [sorted(rng.sample(range(500), rng.choice([1, 5, 50, 400]))) for _ in range(rng.randrange(1, 4))]
+        assert intersect(*lists) == sorted(set(lists[0]).intersection(*lists[1:]))
+    assert intersect() == []
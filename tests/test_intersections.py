@@ -0,0 +1,102 @@
+import random
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from lfp_image_preprocessor.search.index import TagIndexBuilder, TagIndexReader
+from lfp_image_preprocessor.search.intersections import (
+    CACHE_MAGIC,
+    CacheOptions,
+    TagSearch,
+    build_intersection_cache,
+    combination_key,
+    mine_combinations,
+)
+
+TAGS = [f"tag{i:02}" for i in range(30)]
+
+
+def _library(seed=0, images=3000):
+    """Images with a handful of tags each, popular tags far more common."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(TAGS))]
+    library = {}
+    for image_id in range(images):
+        library[image_id] = set(rng.choices(TAGS, weights, k=rng.randrange(1, 7)))
+    builder = TagIndexBuilder()
+    for image_id, tags in library.items():
+        builder.add(image_id, tags)
+    return library, builder.build()
+
+
+def _brute(library, tags):
+    return sorted(image_id for image_id, have in library.items() if set(tags) <= have)
+
+
+def test_mined_counts_match_brute_force():
+    library, index = _library()
+    options = CacheOptions(top_n=10_000, min_support=5)
+    mined = mine_combinations(index, options)
+    assert mined == sorted(mined, key=lambda item: (-item[1], item[0]))
+    for combo, count in mined:
+        assert combo == tuple(sorted(combo)) and len(combo) in (2, 3)
+        assert count == len(_brute(library, combo)) >= 5
+    pairs = Counter(pair for tags in library.values() for pair in combinations(sorted(tags), 2))
+    expected_pairs = {pair for pair, count in pairs.items() if count >= 5}
+    assert {combo for combo, _ in mined if len(combo) == 2} == expected_pairs
+    # Apriori: a triple is only counted when all three of its pairs made the cut.
+    for combo, _ in mined:
+        if len(combo) == 3:
+            assert all(pair in expected_pairs for pair in combinations(combo, 2))
+
+
+def test_pairs_only_and_top_n():
+    _, index = _library()
+    assert all(len(combo) == 2 for combo, _ in mine_combinations(index, CacheOptions(max_arity=2)))
+    top = mine_combinations(index, CacheOptions(top_n=5))
+    assert len(top) == 5
+    assert top == mine_combinations(index, CacheOptions(top_n=10_000))[:5]
+
+
+def test_cache_holds_exact_intersections_within_budget():
+    library, index = _library()
+    full = build_intersection_cache(index, CacheOptions(top_n=200, byte_budget=1 << 30))
+    assert len(full) == len(mine_combinations(index, CacheOptions(top_n=200)))
+    for key, ids in full.items():
+        assert ids == _brute(library, key.split("\x00"))
+
+    small = build_intersection_cache(index, CacheOptions(top_n=200, byte_budget=2000))
+    assert 0 < len(small) < len(full)
+    assert set(small.tags()) <= set(full.tags())
+    assert len(small.to_bytes(CACHE_MAGIC)) < len(full.to_bytes(CACHE_MAGIC))
+    assert len(build_intersection_cache(index, CacheOptions(byte_budget=0))) == 0
+
+
+@pytest.mark.parametrize("with_cache", [False, True])
+def test_queries_match_brute_force(with_cache):
+    library, index = _library(1)
+    cache = build_intersection_cache(index, CacheOptions(top_n=100)) if with_cache else None
+    search = TagSearch.from_bytes(index.to_bytes(), cache.to_bytes(CACHE_MAGIC) if cache else None)
+    rng = random.Random(2)
+    for _ in range(300):
+        tags = rng.sample(TAGS[:12], rng.randrange(1, 5))
+        assert search.query(tags) == _brute(library, tags), tags
+    assert search.query([]) == []
+    assert search.query(["nope", TAGS[0]]) == []
+    if with_cache:
+        assert search.hits > 0 and search.misses > 0
+
+
+def test_cached_pair_is_a_hit_and_seeds_larger_queries():
+    library, index = _library(3)
+    cache = TagIndexReader(build_intersection_cache(index).to_bytes(CACHE_MAGIC), CACHE_MAGIC)
+    search = TagSearch(TagIndexReader(index.to_bytes()), cache)
+    pair = (TAGS[0], TAGS[1])
+    assert combination_key(pair) in cache
+    assert search.query(reversed(pair)) == _brute(library, pair)
+    assert (search.hits, search.misses) == (1, 0)
+    quad = [TAGS[0], TAGS[1], TAGS[2], TAGS[25]]
+    assert search.query(quad) == _brute(library, quad)
+    assert search._smallest_cached_subset(sorted(quad)) is not None
+    assert search.misses == 1
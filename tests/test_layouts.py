@@ -0,0 +1,164 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.tiling.layouts import LayoutSink, check_layouts  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import TileOptions  # noqa: E402
+from lfp_image_preprocessor.tiling.tiler import tile_image  # noqa: E402
+
+ALL = ("dzi", "iiif", "xyz", "tms")
+
+
+def _tile(tmp_path, width=300, height=170, fmt="png", dedup=False, image=None, **kwargs):
+    if image is None:
+        image = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    source = tmp_path / "source.png"
+    Image.fromarray(image).save(source)
+    options = TileOptions(tile_size=64, format=fmt, layouts=kwargs.pop("layouts", ALL), **kwargs)
+    root = tmp_path / "out"
+    tile_image(source, LayoutSink(root, options, "photos/a"), options, dedup=dedup)
+    return image, root
+
+
+def _pixels(path):
+    return np.asarray(Image.open(path))
+
+
+def test_dzi(tmp_path):
+    image, root = _tile(tmp_path)
+    descriptor = (root / "dzi" / "image.dzi").read_text()
+    assert 'TileSize="64"' in descriptor and 'Overlap="0"' in descriptor and 'Format="png"' in descriptor
+    assert '<Size Width="300" Height="170"/>' in descriptor
+    files = root / "dzi" / "image_files"
+    assert sorted(int(p.name) for p in files.iterdir()) == list(range(10))
+    assert len(list((files / "9").iterdir())) == 5 * 3
+    np.testing.assert_array_equal(_pixels(files / "9" / "1_0.png"), image[:64, 64:128])
+    np.testing.assert_array_equal(_pixels(files / "9" / "4_2.png"), image[128:, 256:])
+
+
+def test_dzi_keeps_overlap(tmp_path):
+    image, root = _tile(tmp_path, layouts=("dzi",), overlap=2)
+    assert 'Overlap="2"' in (root / "dzi" / "image.dzi").read_text()
+    np.testing.assert_array_equal(_pixels(root / "dzi" / "image_files" / "9" / "1_1.png"), image[62:130, 62:130])
+
+
+def test_iiif_paths(tmp_path):
+    image, root = _tile(tmp_path, iiif_base="https://example.org/tiles/")
+    iiif = root / "iiif"
+    info = json.loads((iiif / "info.json").read_text())
+    assert info["id"] == "https://example.org/tiles/photos/a/iiif"
+    assert (info["width"], info["height"]) == (300, 170)
+    assert info["tiles"] == [{"width": 64, "scaleFactors": [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]}]
+    assert info["preferredFormats"] == ["png"]
+    # Full resolution: region and size agree, edge tiles are cut short.
+    np.testing.assert_array_equal(_pixels(iiif / "64,0,64,64" / "64,64" / "0" / "default.png"), image[:64, 64:128])
+    np.testing.assert_array_equal(_pixels(iiif / "256,128,44,42" / "44,42" / "0" / "default.png"), image[128:, 256:])
+    assert (iiif / "256,128,44,42" / "44," / "0" / "default.png").exists()
+    # Half resolution: the region is in full-resolution pixels.
+    assert _pixels(iiif / "128,0,128,128" / "64,64" / "0" / "default.png").shape == (64, 64, 3)
+    assert _pixels(iiif / "256,128,44,42" / "22,21" / "0" / "default.png").shape == (21, 22, 3)
+    # The largest single-tile level answers the whole-image request.
+    assert _pixels(iiif / "full" / "38,22" / "0" / "default.png").shape == (22, 38, 3)
+    assert (iiif / "0,0,300,170" / "38," / "0" / "default.png").exists()
+    assert not (iiif / "full" / "max").exists()
+
+
+def test_iiif_max_for_single_tile_images(tmp_path):
+    _, root = _tile(tmp_path, width=50, height=40, layouts=("iiif",))
+    assert _pixels(root / "iiif" / "full" / "max" / "0" / "default.png").shape == (40, 50, 3)
+
+
+@pytest.mark.parametrize("scheme", ["xyz", "tms"])
+def test_slippy_map_paths(tmp_path, scheme):
+    image, root = _tile(tmp_path, fmt="png")
+    directory = root / scheme
+    tilejson = json.loads((directory / "tilejson.json").read_text())
+    assert tilejson["scheme"] == scheme
+    assert (tilejson["minzoom"], tilejson["maxzoom"], tilejson["tileSize"]) == (0, 3, 64)
+    assert sorted(int(p.name) for p in directory.iterdir() if p.is_dir()) == [0, 1, 2, 3]
+
+    def path(z, x, y):
+        return directory / str(z) / str(x) / f"{y if scheme == 'xyz' else (1 << z) - 1 - y}.png"
+
+    # Zoom 0 is the 38x22 level, padded to a full transparent-edged tile.
+    zoom0 = _pixels(path(0, 0, 0))
+    assert zoom0.shape == (64, 64, 4)
+    assert (zoom0[:22, :38, 3] == 255).all() and (zoom0[22:, :, 3] == 0).all() and (zoom0[:, 38:, 3] == 0).all()
+    np.testing.assert_array_equal(_pixels(path(3, 1, 0)), image[:64, 64:128])
+    edge = _pixels(path(3, 4, 2))
+    assert edge.shape == (64, 64, 4)
+    np.testing.assert_array_equal(edge[:42, :44, :3], image[128:, 256:])
+    assert (edge[42:, :, 3] == 0).all()
+
+
+def test_jpeg_edges_are_padded_black(tmp_path):
+    _, root = _tile(tmp_path, fmt="jpeg", layouts=("xyz",), image=np.full((170, 300, 3), 200, np.uint8))
+    edge = _pixels(root / "xyz" / "3" / "4" / "2.jpg")
+    assert edge.shape == (64, 64, 3)
+    assert edge[:40, :40].min() > 180 and edge[50:, 50:].max() < 30
+
+
+def test_edges_are_padded_before_encoding(tmp_path, monkeypatch):
+    image = np.random.default_rng(1).integers(0, 256, (170, 300, 3), dtype=np.uint8)
+    source = tmp_path / "source.ppm"
+    Image.fromarray(image).save(source)
+    options = TileOptions(tile_size=64, format="jpeg", layouts=("dzi", "xyz"))
+
+    def no_decoding(*args, **kwargs):
+        raise AssertionError("tiles must not be decoded")
+
+    monkeypatch.setattr(Image, "open", no_decoding)
+    sink = LayoutSink(tmp_path / "out", options)
+    tile_image(source, sink, options)
+    monkeypatch.undo()
+    # Right and bottom edge tiles of zooms 3 (5x3 grid), 2 (3x2), 1 (2x1) and 0 (1x1).
+    assert sink.padded == 7 + 4 + 2 + 1
+    assert _pixels(tmp_path / "out" / "xyz" / "3" / "4" / "2.jpg").shape == (64, 64, 3)
+
+
+def test_edge_tile_without_its_padded_form_is_rejected(tmp_path):
+    options = TileOptions(tile_size=64, format="png", layouts=("xyz",))
+    sink = LayoutSink(tmp_path / "out", options)
+    sink.begin(100, 64, 3)
+    with pytest.raises(ValueError, match="padded form"):
+        sink.write(7, 1, 0, b"tile")
+    sink.abort()
+
+
+def test_layouts_share_files(tmp_path):
+    _, root = _tile(tmp_path)
+    dzi = root / "dzi" / "image_files" / "9" / "1_0.png"
+    assert dzi.stat().st_ino == (root / "iiif" / "64,0,64,64" / "64,64" / "0" / "default.png").stat().st_ino
+    assert dzi.stat().st_ino == (root / "xyz" / "3" / "1" / "0.png").stat().st_ino
+    assert dzi.stat().st_ino == (root / "tms" / "3" / "1" / "7.png").stat().st_ino
+    padded = root / "xyz" / "3" / "4" / "2.png"
+    assert padded.stat().st_ino == (root / "tms" / "3" / "4" / "5.png").stat().st_ino
+    assert padded.stat().st_ino != (root / "dzi" / "image_files" / "9" / "4_2.png").stat().st_ino
+
+
+@pytest.mark.parametrize("layouts", [ALL, ("xyz",)])
+def test_dedup_aliases_every_layout(tmp_path, layouts):
+    flat = np.zeros((170, 300, 3), np.uint8)
+    (tmp_path / "plain").mkdir()
+    (tmp_path / "dedup").mkdir()
+    _, plain = _tile(tmp_path / "plain", image=flat, layouts=layouts)
+    _, deduped = _tile(tmp_path / "dedup", image=flat, dedup=True, layouts=layouts)
+    listing = sorted(p.relative_to(plain).as_posix() for p in plain.rglob("*") if p.is_file())
+    assert listing == sorted(p.relative_to(deduped).as_posix() for p in deduped.rglob("*") if p.is_file())
+    for name in listing:
+        if not name.endswith(".json") and not name.endswith(".dzi"):
+            assert (plain / name).read_bytes() == (deduped / name).read_bytes(), name
+    inodes = {(deduped / name).stat().st_ino for name in listing}
+    assert len(inodes) < len({(plain / name).stat().st_ino for name in listing})
+
+
+@pytest.mark.parametrize("kwargs", [{"layouts": ()}, {"layouts": ("dzi", "nope")},
+                                    {"layouts": ("dzi", "iiif"), "overlap": 1},
+                                    {"layouts": ("xyz",), "pad_edges": True}])
+def test_check_layouts(kwargs):
+    with pytest.raises(ValueError):
+        check_layouts(TileOptions(**kwargs))
+    check_layouts(TileOptions(layouts=("dzi",), overlap=1))
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.cli import main  # noqa: E402
+from lfp_image_preprocessor.tiling.manifest import MANIFEST_NAME, output_name, tile_library  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import TileOptions  # noqa: E402
+from lfp_image_preprocessor.tiling.sink import DirectorySink  # noqa: E402
+
+OPTIONS = TileOptions(tile_size=32, format="png")
+
+
+def _image(path, value=0, size=(40, 30)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pixels = np.random.default_rng(value).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+    return path
+
+
+def _run(sources, output, relative_to=None, **kwargs):
+    return tile_library(sources, output, lambda path: DirectorySink(path, "png"), OPTIONS,
+                        relative_to=relative_to, **kwargs)
+
+
+def _outputs(output):
+    return json.loads((output / MANIFEST_NAME).read_text())["entries"]
+
+
+def test_unchanged_sources_are_skipped(tmp_path):
+    sources = [_image(tmp_path / "in" / "a.png", 1), _image(tmp_path / "in" / "b.png", 2)]
+    first = _run(sources, tmp_path / "out", tmp_path / "in")
+    assert (first.tiled, first.skipped) == (2, 0)
+    second = _run(sources, tmp_path / "out", tmp_path / "in")
+    assert (second.tiled, second.skipped) == (0, 2)
+    # Touched but identical content is not re-tiled either.
+    sources[0].touch()
+    assert _run(sources, tmp_path / "out", tmp_path / "in").skipped == 2
+    _image(sources[0], 3)
+    third = _run(sources, tmp_path / "out", tmp_path / "in")
+    assert (third.tiled, third.skipped) == (1, 1)
+
+
+def test_deleted_sources_lose_their_tiles(tmp_path):
+    sources = [_image(tmp_path / "in" / "a.png", 1), _image(tmp_path / "in" / "b.png", 2)]
+    _run(sources, tmp_path / "out", tmp_path / "in")
+    sources[0].unlink()
+    report = _run(sources[1:], tmp_path / "out", tmp_path / "in")
+    assert report.removed == 1
+    assert not (tmp_path / "out" / "a_png").exists()
+    assert (tmp_path / "out" / "b_png").is_dir()
+    assert list(_outputs(tmp_path / "out")) == [str(sources[1].resolve())]
+
+
+@pytest.mark.parametrize("relative", [True, False])
+def test_same_stem_sources_get_separate_outputs(tmp_path, relative):
+    sources = [_image(tmp_path / "in" / "a" / "cat.png", 1), _image(tmp_path / "in" / "b" / "cat.png", 2),
+               _image(tmp_path / "in" / "a" / "cat.tif", 3)]
+    report = _run(sources, tmp_path / "out", tmp_path / "in" if relative else None)
+    assert report.tiled == 3
+    outputs = {entry["output"] for entry in _outputs(tmp_path / "out").values()}
+    assert len(outputs) == 3
+    assert all((tmp_path / "out" / output).is_dir() for output in outputs)
+    assert _run(sources, tmp_path / "out", tmp_path / "in" if relative else None).skipped == 3
+
+
+def test_colliding_names_are_disambiguated(tmp_path):
+    sources = [_image(tmp_path / "in" / "a.b.png", 1), _image(tmp_path / "in" / "a_b.png", 2)]
+    assert output_name(sources[0], tmp_path / "in") == output_name(sources[1], tmp_path / "in")
+    _run(sources, tmp_path / "out", tmp_path / "in")
+    outputs = {entry["output"] for entry in _outputs(tmp_path / "out").values()}
+    assert len(outputs) == 2
+    # Re-tiling one must not remove the other's output.
+    _image(sources[1], 5)
+    assert _run(sources, tmp_path / "out", tmp_path / "in").tiled == 1
+    assert all((tmp_path / "out" / output).is_dir() for output in outputs)
+    assert _run(sources[::-1], tmp_path / "out", tmp_path / "in").skipped == 2
+
+
+def test_failed_sources_are_reported_and_retried(tmp_path):
+    good = _image(tmp_path / "in" / "good.png", 1)
+    bad = tmp_path / "in" / "bad.png"
+    bad.write_bytes(good.read_bytes()[:100])
+    report = _run([bad, good], tmp_path / "out", tmp_path / "in")
+    assert report.failed == [str(bad.resolve())]
+    assert report.tiled == 1
+    assert not (tmp_path / "out" / "bad_png").exists()
+    assert str(bad.resolve()) not in _outputs(tmp_path / "out")
+    _image(bad, 2)
+    retry = _run([bad, good], tmp_path / "out", tmp_path / "in")
+    assert (retry.tiled, retry.skipped, retry.failed) == (1, 1, [])
+
+
+def test_cli_keeps_dotted_names_apart(tmp_path, capsys):
+    sources = [_image(tmp_path / "in" / "img.v2.png", 1), _image(tmp_path / "in" / "img.v3.png", 2)]
+    args = ["tile", *map(str, sources), "-o", str(tmp_path / "out"), "--tile-size", "32"]
+    assert main(args + ["--container", "pack"]) == 0
+    assert sorted(p.name for p in (tmp_path / "out").glob("*.lfpack")) == ["img_v2_png.lfpack", "img_v3_png.lfpack"]
+    assert main(args + ["--container", "pack"]) == 0
+    assert "tiled 0, unchanged 2" in capsys.readouterr().out
+
+
+def test_cli_reports_failures(tmp_path, capsys):
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(b"\x89PNG\r\n\x1a\n")
+    assert main(["tile", str(bad), "-o", str(tmp_path / "out")]) == 1
+    assert "failed 1" in capsys.readouterr().err
@@ -0,0 +1,179 @@
+import io
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+PngImagePlugin = pytest.importorskip("PIL.PngImagePlugin")
+
+from lfp_image_preprocessor.discovery import iptc  # noqa: E402
+from lfp_image_preprocessor.discovery.metadata import probe, read_header  # noqa: E402
+from lfp_image_preprocessor.discovery.xmp import XMP_HEADER, xmp_caption, xmp_date, xmp_keywords  # noqa: E402
+
+
+def _xmp(keywords=(), caption=None, date=None):
+    items = "".join(f"<rdf:li>{keyword}</rdf:li>" for keyword in keywords)
+    parts = [f'<x:xmpmeta><rdf:Description photoshop:DateCreated="{date}">' if date else "<x:xmpmeta>"]
+    if items:
+        parts.append(f"<dc:subject><rdf:Bag>{items}</rdf:Bag></dc:subject>")
+    if caption:
+        parts.append(f'<dc:description><rdf:Alt><rdf:li xml:lang="x-default">{caption}</rdf:li></rdf:Alt>'
+                     "</dc:description>")
+    parts.append("</rdf:Description></x:xmpmeta>" if date else "</x:xmpmeta>")
+    return "".join(parts).encode()
+
+
+def _dataset(record, dataset, value):
+    return struct.pack(">BBBH", 0x1C, record, dataset, len(value)) + value
+
+
+def _iptc(keywords=(), caption=None, date=None, time=None):
+    block = _dataset(1, 90, b"\x1b%G")
+    block += b"".join(_dataset(*iptc.KEYWORDS, keyword.encode()) for keyword in keywords)
+    if caption:
+        block += _dataset(*iptc.CAPTION, caption.encode())
+    if date:
+        block += _dataset(*iptc.DATE_CREATED, date.encode())
+    if time:
+        block += _dataset(*iptc.TIME_CREATED, time.encode())
+    resource = b"8BIM" + struct.pack(">HBBI", 0x0404, 0, 0, len(block)) + block + b"\0" * (len(block) & 1)
+    return iptc.PHOTOSHOP_HEADER + resource
+
+
+def _segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _exif(keywords=(), caption=None, date=None):
+    exif = Image.Exif()
+    if keywords:
+        exif[0x9C9E] = ";".join(keywords).encode("utf-16-le") + b"\0\0"
+    if caption:
+        exif[0x010E] = caption
+    if date:
+        exif.get_ifd(0x8769)[0x9003] = date
+    return exif
+
+
+def _jpeg(size=(40, 30), exif=None, segments=(), seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", exif=exif if exif is not None else Image.Exif())
+    data = out.getvalue()
+    return data[:2] + b"".join(_segment(marker, payload) for marker, payload in segments) + data[2:]
+
+
+def _header(data):
+    return read_header(io.BytesIO(data))
+
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+def test_jpeg_exif_fields():
+    found = _header(_jpeg((64, 48), _exif(["sea", "dusk"], "Harbour", "2021:05:04 10:11:12")))
+    assert (found.format, found.width, found.height) == ("jpeg", 64, 48)
+    assert found.merged_keywords() == ("sea", "dusk")
+    assert found.caption() == "Harbour"
+    assert found.date() == "2021-05-04T10:11:12"
+
+
+def test_jpeg_blocks_are_merged_in_priority_order():
+    data = _jpeg(exif=_exif(["exif-only", "shared"], "exif caption", "2020:01:02 03:04:05"), segments=[
+        (0xE1, XMP_HEADER + _xmp(["xmp-only", "shared"], "xmp caption", "2019-07-08")),
+        (0xED, _iptc(["iptc-only", "shared"], "iptc caption", "20180910", "111213+0000")),
+    ])
+    found = _header(data)
+    assert found.merged_keywords() == ("xmp-only", "shared", "iptc-only", "exif-only")
+    assert found.caption() == "xmp caption"
+    assert found.date() == "2020-01-02T03:04:05"
+    assert found.dates["iptc"] == "2018-09-10T11:12:13"
+    assert found.dates["xmp"] == "2019-07-08"
+
+
+def test_iptc_alone_and_latin1_fallback():
+    block = _dataset(*iptc.KEYWORDS, "café".encode("latin-1")) + _dataset(*iptc.KEYWORDS, "naïve".encode())
+    resources = b"8BIM" + struct.pack(">HBBI", 0x0404, 0, 0, len(block)) + block + b"\0" * (len(block) & 1)
+    found = _header(_jpeg(segments=[(0xED, iptc.PHOTOSHOP_HEADER + resources)]))
+    assert found.merged_keywords() == ("café", "naïve")
+    assert found.date() is None
+    # Other resources before the IPTC one are skipped.
+    other = b"8BIM" + struct.pack(">HBBI", 0x03ED, 0, 0, 3) + b"abc\0"
+    assert iptc.photoshop_iptc(other + resources) == block
+    assert iptc.photoshop_iptc(other) is None
+
+
+def test_header_only_read_of_a_large_jpeg():
+    data = _jpeg((1500, 1000), _exif(["big"]), segments=[(0xE1, XMP_HEADER + _xmp(["big"]))])
+    assert len(data) > 500_000
+    reader = CountingReader(data)
+    found = read_header(reader)
+    assert (found.width, found.height) == (1500, 1000)
+    assert reader.consumed < 2000
+
+
+def test_png_text_chunks():
+    pixels = np.zeros((10, 20, 3), np.uint8)
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Description", "Garden")
+    info.add_itxt("XML:com.adobe.xmp", _xmp(["rose", "tulip"]).decode(), zip=True)
+    info.add_text("Creation Time", "2022-02-03")
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "PNG", pnginfo=info)
+    found = _header(out.getvalue())
+    assert (found.format, found.width, found.height) == ("png", 20, 10)
+    assert found.merged_keywords() == ("rose", "tulip")
+    assert found.caption() == "Garden"
+    assert found.date() == "2022-02-03"
+
+
+def test_png_exif_chunk():
+    out = io.BytesIO()
+    Image.fromarray(np.zeros((4, 4, 3), np.uint8)).save(out, "PNG", exif=_exif(["pixel"], "Tiny"))
+    found = _header(out.getvalue())
+    assert found.merged_keywords() == ("pixel",)
+    assert found.caption() == "Tiny"
+
+
+def test_tiff_tags(tmp_path):
+    path = tmp_path / "image.tif"
+    tiffinfo = {270: "Mountains", 306: "2019:12:31 23:59:58", 700: _xmp(["peak"])}
+    Image.fromarray(np.zeros((30, 50), np.uint8)).save(path, tiffinfo=tiffinfo)
+    record = probe(path)
+    assert (record.format, record.width, record.height) == ("tiff", 50, 30)
+    assert record.keywords == ("peak",)
+    assert record.caption == "Mountains"
+    assert record.date == "2019-12-31T23:59:58"
+
+
+def test_pnm_and_unknown_files(tmp_path):
+    path = tmp_path / "image.ppm"
+    Image.fromarray(np.zeros((7, 9, 3), np.uint8)).save(path)
+    record = probe(path)
+    assert (record.format, record.width, record.height) == ("pnm", 9, 7)
+    assert record.keywords == () and record.caption is None
+    other = tmp_path / "notes.jpg"
+    other.write_bytes(b"hello world")
+    assert probe(other).format is None
+
+
+def test_blank_exif_dates_are_ignored():
+    found = _header(_jpeg(exif=_exif(date="0000:00:00 00:00:00")))
+    assert found.date() is None
+
+
+def test_xmp_helpers():
+    packet = _xmp(["a &amp; b", " ", "c"], "Caption &lt;1&gt;")
+    assert xmp_keywords(packet) == ("a & b", "c")
+    assert xmp_caption(packet) == "Caption <1>"
+    assert xmp_date(b"<exif:DateTimeOriginal>2001-02-03T04:05:06</exif:DateTimeOriginal>") == "2001-02-03T04:05:06"
+    assert xmp_keywords(b"<x:xmpmeta/>") == () and xmp_caption(b"") is None and xmp_date(b"") is None
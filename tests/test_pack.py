@@ -0,0 +1,121 @@
+import os
+import random
+
+import pytest
+
+from lfp_image_preprocessor.tiling.pack import (
+    INDEX_ENTRY,
+    MAGIC,
+    TRAILER,
+    VARIANT_LEVEL,
+    PackEntry,
+    PackReader,
+    PackSink,
+    extract_pack,
+    parse_index,
+    parse_trailer,
+)
+
+
+def _tiles(seed=0, count=50):
+    rng = random.Random(seed)
+    return {(rng.randrange(12), rng.randrange(1 << 20), rng.randrange(1 << 20)): rng.randbytes(rng.randrange(1, 300))
+            for _ in range(count)}
+
+
+def _write(path, tiles, aliases=(), variants=(), metadata=None):
+    sink = PackSink(path, "jpg", metadata)
+    sink.begin(1, 1, 3)
+    for key, data in tiles.items():
+        sink.write(*key, data)
+    for key, target in aliases:
+        sink.alias(*key, target)
+    for width, height, data in variants:
+        sink.write_variant(width, height, data)
+    sink.close()
+
+
+def test_round_trip(tmp_path):
+    tiles = _tiles()
+    path = tmp_path / "a.lfpack"
+    _write(path, tiles, metadata={"tile_size": 256})
+    with PackReader(path) as reader:
+        assert reader.metadata == {"extension": "jpg", "tile_size": 256}
+        assert set(reader.index) == set(tiles)
+        for key, data in tiles.items():
+            assert key in reader
+            assert reader.get(*key) == data
+        entries = list(reader.entries())
+    assert entries == sorted(entries)
+    assert not (tmp_path / "a.lfpack.tmp").exists()
+
+
+def test_aliases_share_a_byte_range(tmp_path):
+    path = tmp_path / "a.lfpack"
+    _write(path, {(3, 0, 0): b"tile", (3, 1, 0): b"other"}, aliases=[((3, 2, 0), (3, 0, 0)), ((2, 0, 0), (3, 1, 0))])
+    with PackReader(path) as reader:
+        assert reader.index[3, 2, 0] == reader.index[3, 0, 0]
+        assert reader.get(2, 0, 0) == b"other"
+    assert os.path.getsize(path) == (len(MAGIC) + len(b"tileother") + len(b'{"extension": "jpg"}')
+                                     + 4 * INDEX_ENTRY.size + TRAILER.size)
+
+
+def test_variants(tmp_path):
+    path = tmp_path / "a.lfpack"
+    _write(path, {(0, 0, 0): b"t"}, variants=[(320, 200, b"small"), (640, 400, b"large")])
+    with PackReader(path) as reader:
+        assert reader.variants() == {320: (200, b"small"), 640: (400, b"large")}
+        assert (VARIANT_LEVEL, 320, 200) in reader
+
+
+def test_index_is_readable_from_the_tail(tmp_path):
+    """A client needs only the trailer, then one range for metadata and index."""
+    tiles = _tiles(1)
+    path = tmp_path / "a.lfpack"
+    _write(path, tiles)
+    data = path.read_bytes()
+    meta_offset, meta_length, count = parse_trailer(data[-TRAILER.size:])
+    assert count == len(tiles)
+    index = parse_index(data[meta_offset + meta_length:-TRAILER.size], count)
+    assert {key: data[offset:offset + length] for key, (offset, length) in index.items()} == tiles
+
+
+def test_empty_pack(tmp_path):
+    path = tmp_path / "a.lfpack"
+    _write(path, {})
+    with PackReader(path) as reader:
+        assert reader.index == {}
+        assert list(reader.entries()) == []
+
+
+def test_bad_files_are_rejected(tmp_path):
+    path = tmp_path / "a.lfpack"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        PackReader(path)
+    path.write_bytes(MAGIC + b"\0" * 64)
+    with pytest.raises(ValueError, match="trailer"):
+        PackReader(path)
+
+
+def test_abort_removes_the_partial_file(tmp_path):
+    sink = PackSink(tmp_path / "a.lfpack", "jpg")
+    sink.begin(1, 1, 3)
+    sink.write(0, 0, 0, b"data")
+    sink.abort()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_extract_pack(tmp_path):
+    tiles = {(1, 0, 0): b"a", (1, 1, 0): b"b", (0, 0, 0): b"c"}
+    path = tmp_path / "a.lfpack"
+    _write(path, tiles, variants=[(320, 200, b"v")])
+    assert extract_pack(path, tmp_path / "out") == 4
+    for (level, col, row), data in tiles.items():
+        assert (tmp_path / "out" / str(level) / f"{col}_{row}.jpg").read_bytes() == data
+    assert (tmp_path / "out" / "variants" / "320.jpg").read_bytes() == b"v"
+
+
+def test_entry_layout():
+    entry = PackEntry(VARIANT_LEVEL, 2**32 - 1, 7, 2**40, 123)
+    assert INDEX_ENTRY.unpack(INDEX_ENTRY.pack(*entry)) == tuple(entry)
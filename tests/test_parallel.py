@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lfp_image_preprocessor.tiling.encode import SerialEncoder  # noqa: E402
+from lfp_image_preprocessor.tiling.parallel import ParallelEncoder  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import Tile, TileOptions  # noqa: E402
+
+OPTIONS = TileOptions(tile_size=16, format="png")
+
+
+def _tiles(count, seed=0):
+    """Noise tiles interleaved with runs of a few flat colours."""
+    rng = np.random.default_rng(seed)
+    tiles = []
+    for i in range(count):
+        if rng.random() < 0.5:
+            pixels = np.full((16, 16, 3), (0, 128, 255)[i % 3], dtype=np.uint8)
+        else:
+            pixels = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+        tiles.append(Tile(2, i % 8, i // 8, pixels))
+    return tiles
+
+
+def _summary(encoded):
+    return [(tile.level, tile.col, tile.row, tile.data) for tile in encoded]
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    with ParallelEncoder(2, batch_tiles=7, max_pending=2, skip_uniform=True) as encoder:
+        yield encoder
+
+
+def test_output_order_matches_serial_with_uniform_tiles(encoder):
+    tiles = _tiles(60)
+    expected = _summary(SerialEncoder(skip_uniform=True).encode(tiles, OPTIONS))
+    assert _summary(encoder.encode(tiles, OPTIONS)) == expected
+    # The second pass answers every flat tile from the cache, including
+    # ones that arrive while noise tiles are still in the pool.
+    second = list(encoder.encode(tiles, OPTIONS))
+    assert _summary(second) == expected
+    flat = [t.pixels.min() == t.pixels.max() for t in tiles]
+    assert [t.reused for t in second] == flat
+
+
+def test_batches_of_only_cached_tiles_keep_their_place(encoder):
+    flat = [Tile(0, i, 0, np.full((16, 16, 3), 7, dtype=np.uint8)) for i in range(20)]
+    rng = np.random.default_rng(1)
+    noise = [Tile(0, 20 + i, 0, rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)) for i in range(3)]
+    tiles = noise + flat + noise
+    expected = _summary(SerialEncoder(skip_uniform=True).encode(tiles, OPTIONS))
+    assert _summary(encoder.encode(tiles, OPTIONS)) == expected
+
+
+def test_abandoned_generator_releases_pending_batches(encoder):
+    tiles = _tiles(40, seed=3)
+    stream = encoder.encode(tiles, OPTIONS)
+    first = next(stream)
+    stream.close()
+    assert (first.col, first.row) == (tiles[0].col, tiles[0].row)
+    # The encoder is still usable afterwards.
+    assert len(list(encoder.encode(tiles[:5], OPTIONS))) == 5
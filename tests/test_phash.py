@@ -0,0 +1,113 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.search.duplicates import hamming  # noqa: E402
+from lfp_image_preprocessor.tiling.phash import HASH_SIZE, HashCollector, dhash, hash_level, hex_hash, phash  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import PyramidTiler, TileOptions, level_sizes  # noqa: E402
+from lfp_image_preprocessor.tiling.sink import DirectorySink  # noqa: E402
+from lfp_image_preprocessor.tiling.tiler import tile_image  # noqa: E402
+
+THRESHOLD = 6
+"""The default ``duplicates --threshold``."""
+
+
+def _scene(seed, size=(400, 300)):
+    """A smooth random picture: a few colour blobs blown up, like an out-of-focus photo."""
+    blobs = np.random.default_rng(seed).integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return np.asarray(Image.fromarray(blobs).resize(size, Image.Resampling.BICUBIC))
+
+
+def _reencoded(pixels, quality=40):
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=quality)
+    return np.asarray(Image.open(io.BytesIO(out.getvalue())))
+
+
+def _edits(pixels):
+    yield "jpeg", _reencoded(pixels)
+    yield "resize", np.asarray(Image.fromarray(pixels).resize((280, 210), Image.Resampling.BILINEAR))
+    yield "brighter", np.clip(pixels.astype(int) + 15, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("hash_fn", [dhash, phash])
+def test_near_copies_stay_within_the_threshold(hash_fn):
+    for seed in range(20):
+        pixels = _scene(seed)
+        for edit, copy in _edits(pixels):
+            assert hamming(hash_fn(pixels), hash_fn(copy)) <= THRESHOLD, (seed, edit)
+
+
+@pytest.mark.parametrize("hash_fn", [dhash, phash])
+def test_different_pictures_are_far_apart(hash_fn):
+    hashes = [hash_fn(_scene(seed)) for seed in range(20)]
+    distances = [hamming(a, b) for i, a in enumerate(hashes) for b in hashes[i + 1:]]
+    assert min(distances) > 2 * THRESHOLD
+    assert 24 < sum(distances) / len(distances) < 40
+
+
+def test_dhash_bits_follow_horizontal_gradients():
+    rising = np.tile(np.arange(0, 250, 5, dtype=np.uint8), (40, 1))[:, :, np.newaxis]
+    assert dhash(rising) == (1 << 64) - 1
+    assert dhash(rising[:, ::-1]) == 0
+    # Only the top half rises: its 32 bits come first.
+    mixed = rising.copy()
+    mixed[20:] = rising[20:, ::-1]
+    assert dhash(mixed) == ((1 << 32) - 1) << 32
+
+
+def test_phash_is_balanced_and_ignores_the_band_layout():
+    pixels = _scene(3)
+    value = phash(pixels)
+    assert 0 <= value < 1 << 64
+    assert bin(value).count("1") in (32, 31, 33)  # split at the median of 64 coefficients
+    grey = np.asarray(Image.fromarray(pixels).convert("L"))[:, :, np.newaxis]
+    rgba = np.dstack([pixels, np.full(pixels.shape[:2], 255, np.uint8)])
+    assert phash(grey) == phash(rgba) == value
+    assert dhash(grey) == dhash(rgba) == dhash(pixels)
+
+
+@pytest.mark.parametrize("size", [(3000, 2000), (40, 700), (64, 64), (20, 500), (1, 1)])
+def test_hash_level_is_the_smallest_big_enough(size):
+    sizes = level_sizes(*size)
+    level = hash_level(sizes)
+    if min(size) >= HASH_SIZE:
+        assert HASH_SIZE <= min(sizes[level]) < 2 * HASH_SIZE
+    else:
+        assert level == len(sizes) - 1
+
+
+def test_hex_hash_is_fixed_width():
+    assert hex_hash(0) == "0" * 16
+    assert hex_hash(0xABC) == "0000000000000abc"
+    assert int(hex_hash((1 << 64) - 1), 16) == (1 << 64) - 1
+
+
+def test_collector_hashes_the_tapped_level():
+    pixels = _scene(4, (500, 300))
+    tiler = PyramidTiler(500, 300, TileOptions(tile_size=64))
+    collector = HashCollector(tiler.sizes)
+    assert tiler.sizes[collector.level] == (63, 38)
+    level_pixels = []
+    taps = {collector.level: lambda strip: (collector.tap(strip), level_pixels.append(strip))}
+    for _ in tiler.tiles((pixels[top:top + 50] for top in range(0, 300, 50)), taps):
+        pass
+    small = np.concatenate(level_pixels)
+    assert collector.hashes() == (dhash(small), phash(small))
+
+
+def test_two_exports_of_one_shot_hash_alike_when_tiled(tmp_path):
+    pixels = _scene(5, (800, 600))
+    Image.fromarray(pixels).save(tmp_path / "original.png")
+    Image.fromarray(pixels).resize((640, 480), Image.Resampling.LANCZOS).save(tmp_path / "export.jpg", quality=70)
+    Image.fromarray(_scene(6, (800, 600))).save(tmp_path / "other.png")
+    options = TileOptions(tile_size=256, format="png")
+    stats = {name: tile_image(tmp_path / name, DirectorySink(tmp_path / name.split(".")[0], "png"), options)
+             for name in ("original.png", "export.jpg", "other.png")}
+    original, export, other = (stats[name].hashes for name in ("original.png", "export.jpg", "other.png"))
+    assert hamming(original.phash, export.phash) <= THRESHOLD
+    assert hamming(original.dhash, export.dhash) <= THRESHOLD
+    assert hamming(original.phash, other.phash) > 2 * THRESHOLD
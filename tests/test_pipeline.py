@@ -0,0 +1,150 @@
+import json
+import threading
+
+import pytest
+
+from lfp_image_preprocessor.pipeline import Pipeline, Stage
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def stage(self, name, **kwargs):
+        def run():
+            with self.lock:
+                self.events.append(("start", name))
+            with self.lock:
+                self.events.append(("end", name))
+
+        return Stage(name, run, **kwargs)
+
+    def ran(self):
+        ran = [name for event, name in self.events if event == "start"]
+        self.events.clear()
+        return sorted(ran)
+
+
+def _diamond(tmp_path, recorder, params=None):
+    source = tmp_path / "source.txt"
+    if not source.exists():
+        source.write_text("one")
+    stages = [
+        recorder.stage("report", after=["left", "right"]),
+        recorder.stage("left", after=["load"], params=params or {}),
+        recorder.stage("right", after=["load"]),
+        recorder.stage("load", inputs=[source]),
+    ]
+    return Pipeline(stages, tmp_path / "state.json")
+
+
+def test_stages_run_after_their_dependencies(tmp_path):
+    recorder = Recorder()
+    pipeline = _diamond(tmp_path, recorder)
+    assert pipeline.order.index("load") < pipeline.order.index("left") < pipeline.order.index("report")
+    assert pipeline.order.index("right") < pipeline.order.index("report")
+    report = pipeline.run(jobs=4)
+    assert sorted(report.ran) == ["left", "load", "report", "right"]
+    position = {event: i for i, event in enumerate(recorder.events)}
+    for name, stage in pipeline.stages.items():
+        for dependency in stage.after:
+            assert position[("end", dependency)] < position[("start", name)]
+
+
+def test_unknown_dependency_and_cycles_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="unknown stage 'missing'"):
+        Pipeline([Stage("a", lambda: None, after=["missing"])], tmp_path / "state.json")
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline([Stage("a", lambda: None, after=["b"]), Stage("b", lambda: None, after=["a"])],
+                 tmp_path / "state.json")
+
+
+def test_unchanged_pipeline_skips_everything(tmp_path):
+    recorder = Recorder()
+    _diamond(tmp_path, recorder).run()
+    recorder.ran()
+    report = _diamond(tmp_path, recorder).run()
+    assert recorder.ran() == []
+    assert sorted(report.skipped) == ["left", "load", "report", "right"]
+
+
+def test_changed_input_invalidates_downstream(tmp_path):
+    recorder = Recorder()
+    _diamond(tmp_path, recorder).run()
+    recorder.ran()
+    (tmp_path / "source.txt").write_text("changed")
+    _diamond(tmp_path, recorder).run()
+    assert recorder.ran() == ["left", "load", "report", "right"]
+
+
+def test_changed_params_invalidate_the_stage_and_its_dependents_only(tmp_path):
+    recorder = Recorder()
+    _diamond(tmp_path, recorder, {"level": 1}).run()
+    recorder.ran()
+    _diamond(tmp_path, recorder, {"level": 2}).run()
+    assert recorder.ran() == ["left", "report"]
+
+
+def test_missing_output_reruns_the_stage(tmp_path):
+    output = tmp_path / "out.txt"
+    runs = []
+
+    def build():
+        runs.append(1)
+        output.write_text("built")
+
+    pipeline = Pipeline([Stage("build", build, outputs=[output])], tmp_path / "state.json")
+    pipeline.run()
+    pipeline.run()
+    assert len(runs) == 1
+    output.unlink()
+    pipeline.run()
+    assert len(runs) == 2
+
+
+def test_rerun_propagates_downstream(tmp_path):
+    recorder = Recorder()
+    pipeline = _diamond(tmp_path, recorder)
+    pipeline.run()
+    recorder.ran()
+    assert pipeline.downstream(["left"]) == {"left", "report"}
+    pipeline.run(force=["left"])
+    assert recorder.ran() == ["left", "report"]
+    pipeline.run(force=["load"])
+    assert recorder.ran() == ["left", "load", "report", "right"]
+    with pytest.raises(ValueError, match="unknown stages: bogus"):
+        pipeline.run(force=["bogus"])
+
+
+def test_failure_stops_dependents_and_is_not_recorded(tmp_path):
+    recorder = Recorder()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    stages = [recorder.stage("load"), Stage("flaky", fail, after=["load"]), recorder.stage("report", after=["flaky"])]
+    with pytest.raises(RuntimeError, match="boom"):
+        Pipeline(stages, tmp_path / "state.json").run()
+    assert recorder.ran() == ["load"]
+    state = json.loads((tmp_path / "state.json").read_text())["stages"]
+    assert set(state) == {"load"}
+    Pipeline(stages, tmp_path / "state.json").run()
+    assert recorder.ran() == ["report"]
+    assert len(calls) == 2
+
+
+def test_cli_rejects_unknown_rerun_stage(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL.Image")
+    from lfp_image_preprocessor.cli import main
+
+    (tmp_path / "library").mkdir()
+    with pytest.raises(SystemExit) as excinfo:
+        main(["build", str(tmp_path / "library"), "-o", str(tmp_path / "out"), "--rerun", "bogus"])
+    assert excinfo.value.code == 2
+    error = capsys.readouterr().err
+    assert "unknown stage bogus" in error and "scan" in error
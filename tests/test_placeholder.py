@@ -0,0 +1,156 @@
+import json
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.tiling.placeholder import (  # noqa: E402
+    PLACEHOLDER_SIZE,
+    PlaceholderCollector,
+    blurhash,
+    dominant_colour,
+    placeholder_level,
+)
+from lfp_image_preprocessor.tiling.pyramid import PyramidTiler, TileOptions, level_sizes  # noqa: E402
+
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value, length):
+    digits = ""
+    for _ in range(length):
+        digits = BASE83[value % 83] + digits
+        value //= 83
+    return digits
+
+
+def _linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _srgb(value):
+    v = max(0.0, min(1.0, value))
+    return int((v * 12.92 if v <= 0.0031308 else 1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _reference(pixels, x_components, y_components):
+    """Pixel-by-pixel port of the reference BlurHash encoder."""
+    height, width = pixels.shape[:2]
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1 if i == j == 0 else 2
+            total = [0.0, 0.0, 0.0]
+            for y in range(height):
+                for x in range(width):
+                    basis = norm * math.cos(math.pi * i * x / width) * math.cos(math.pi * j * y / height)
+                    for c in range(3):
+                        total[c] += basis * _linear(int(pixels[y, x, c]))
+            factors.append([value / (width * height) for value in total])
+    dc, ac = factors[0], factors[1:]
+    out = _encode83(x_components - 1 + (y_components - 1) * 9, 1)
+    if ac:
+        quantised = max(0, min(82, math.floor(max(abs(v) for f in ac for v in f) * 166 - 0.5)))
+        maximum = (quantised + 1) / 166
+    else:
+        quantised, maximum = 0, 1.0
+    out += _encode83(quantised, 1)
+    out += _encode83((_srgb(dc[0]) << 16) + (_srgb(dc[1]) << 8) + _srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (max(0, min(18, math.floor(math.copysign(abs(v / maximum) ** 0.5, v) * 9 + 9.5))) for v in factor)
+        out += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return out
+
+
+@pytest.mark.parametrize("components", [(4, 3), (3, 4), (1, 1), (9, 9), (5, 1)])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_blurhash_matches_the_reference_encoder(components, seed):
+    pixels = np.random.default_rng(seed).integers(0, 256, (7, 11, 3), dtype=np.uint8)
+    assert blurhash(pixels, *components) == _reference(pixels, *components)
+
+
+def test_blurhash_of_a_smooth_image_and_its_length():
+    y, x = np.mgrid[0:24, 0:32]
+    pixels = np.stack([x * 8, y * 10, np.full_like(x, 90)], axis=2).astype(np.uint8)
+    found = blurhash(pixels)
+    assert found == _reference(pixels, 4, 3)
+    assert len(found) == 4 + 2 * 4 * 3
+
+
+def test_solid_colour_round_trips_through_the_dc_term():
+    found = blurhash(np.full((5, 8, 3), (200, 30, 120), np.uint8))
+    value = sum(BASE83.index(char) * 83 ** (3 - i) for i, char in enumerate(found[2:6]))
+    assert (value >> 16, value >> 8 & 255, value & 255) == (200, 30, 120)
+    assert len(found) == 4 + 2 * 4 * 3
+
+
+def test_grey_and_alpha_inputs_use_the_colour_bands():
+    grey = np.random.default_rng(2).integers(0, 256, (6, 6, 1), dtype=np.uint8)
+    assert blurhash(grey) == blurhash(np.repeat(grey, 3, axis=2))
+    rgba = np.random.default_rng(3).integers(0, 256, (6, 6, 4), dtype=np.uint8)
+    assert blurhash(rgba) == blurhash(rgba[:, :, :3])
+    assert dominant_colour(rgba) == dominant_colour(rgba[:, :, :3])
+
+
+def test_component_counts_are_validated():
+    pixels = np.zeros((4, 4, 3), np.uint8)
+    with pytest.raises(ValueError, match="components"):
+        blurhash(pixels, 0, 3)
+    with pytest.raises(ValueError, match="components"):
+        blurhash(pixels, 4, 10)
+
+
+def test_dominant_colour_is_the_mean_of_the_busiest_bin():
+    pixels = np.zeros((10, 10, 3), np.uint8)
+    pixels[:7] = (250, 10, 10)
+    pixels[:7, ::2] = (240, 20, 0)  # same histogram bin, shifts the mean
+    pixels[7:] = (0, 0, 255)
+    assert dominant_colour(pixels) == "#f50f05"
+    assert dominant_colour(np.full((3, 3, 1), 17, np.uint8)) == "#111111"
+
+
+@pytest.mark.parametrize("size", [(3000, 2000), (40, 7), (7, 40), (10, 10), (1, 1)])
+def test_placeholder_level_is_the_smallest_big_enough(size):
+    sizes = level_sizes(*size)
+    level = placeholder_level(sizes)
+    if max(size) >= PLACEHOLDER_SIZE:
+        assert PLACEHOLDER_SIZE <= max(sizes[level]) < 2 * PLACEHOLDER_SIZE
+    else:
+        assert level == len(sizes) - 1
+
+
+def test_collector_taps_the_small_level_while_tiling():
+    pixels = np.random.default_rng(4).integers(0, 256, (300, 500, 3), dtype=np.uint8)
+    tiler = PyramidTiler(500, 300, TileOptions(tile_size=64))
+    collector = PlaceholderCollector(tiler.sizes)
+    assert tiler.sizes[collector.level] == (32, 19)
+    level_pixels = []
+    taps = {collector.level: lambda strip: (collector.tap(strip), level_pixels.append(strip))}
+    for _ in tiler.tiles((pixels[top:top + 50] for top in range(0, 300, 50)), taps):
+        pass
+    small = np.concatenate(level_pixels)
+    assert small.shape == (19, 32, 3)
+    assert collector.placeholder() == (blurhash(small, 4, 3), dominant_colour(small))
+    assert PlaceholderCollector(level_sizes(300, 500)).components == (3, 4)
+
+
+def test_search_records_carry_the_placeholders(tmp_path):
+    from lfp_image_preprocessor.build import BuildOptions, library_pipeline
+
+    colours = {"red.png": (220, 20, 40), "teal.png": (0, 128, 128), "grey.png": (90, 90, 90)}
+    library = tmp_path / "library"
+    library.mkdir()
+    for name, colour in colours.items():
+        Image.fromarray(np.full((60, 90, 3), colour, np.uint8)).save(library / name)
+    library_pipeline(library, tmp_path / "out", BuildOptions(tile_size=32, variant_widths=(), write_queue=0)).run()
+    with open(tmp_path / "out" / "search" / "records.jsonl", encoding="utf-8") as fh:
+        rows = {row["path"].rsplit("/", 1)[-1]: row for row in map(json.loads, fh)}
+    assert sorted(rows) == sorted(colours)
+    width, height = level_sizes(90, 60)[placeholder_level(level_sizes(90, 60))]
+    for name, colour in colours.items():
+        solid = np.full((height, width, 3), colour, np.uint8)
+        assert rows[name]["colour"] == "#{:02x}{:02x}{:02x}".format(*colour)
+        assert rows[name]["blurhash"] == blurhash(solid)
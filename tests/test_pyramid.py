@@ -0,0 +1,98 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lfp_image_preprocessor.tiling.pyramid import PyramidTiler, TileOptions, grid_size, level_sizes  # noqa: E402
+from lfp_image_preprocessor.tiling.resample import halve  # noqa: E402
+
+
+def _image(width, height, bands=3, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, bands), dtype=np.uint8)
+
+
+def _strips(image, rows):
+    return (image[top:top + rows] for top in range(0, len(image), rows))
+
+
+def _levels(image, kind="box"):
+    """Every level's pixels, computed from the whole image at once."""
+    levels = [image]
+    while levels[-1].shape[:2] != (1, 1):
+        levels.append(halve(levels[-1], kind))
+    return levels[::-1]
+
+
+@pytest.mark.parametrize("size", [(1, 1), (2, 1), (5, 3), (256, 256), (257, 129), (1000, 3)])
+def test_level_sizes(size):
+    sizes = level_sizes(*size)
+    assert sizes[0] == (1, 1)
+    assert sizes[-1] == size
+    for (w, h), (big_w, big_h) in zip(sizes, sizes[1:]):
+        assert (w, h) == ((big_w + 1) // 2, (big_h + 1) // 2)
+
+
+def test_grid_size():
+    assert grid_size(256, 256, 256) == (1, 1)
+    assert grid_size(257, 1, 256) == (2, 1)
+    assert grid_size(1, 513, 256) == (1, 3)
+
+
+@pytest.mark.parametrize("width, height, strip_rows", [(300, 200, 64), (129, 257, 7), (64, 64, 64), (1, 90, 1)])
+@pytest.mark.parametrize("overlap", [0, 3])
+def test_tiles_cover_every_level(width, height, strip_rows, overlap):
+    options = TileOptions(tile_size=64, overlap=overlap)
+    image = _image(width, height)
+    tiler = PyramidTiler(width, height, options)
+    tiles = list(tiler.tiles(_strips(image, strip_rows)))
+    expected = _levels(image)
+    seen = set()
+    for tile in tiles:
+        level = expected[tile.level]
+        h, w = level.shape[:2]
+        left, top = max(tile.col * 64 - overlap, 0), max(tile.row * 64 - overlap, 0)
+        right, bottom = min((tile.col + 1) * 64 + overlap, w), min((tile.row + 1) * 64 + overlap, h)
+        np.testing.assert_array_equal(tile.pixels, level[top:bottom, left:right])
+        seen.add((tile.level, tile.col, tile.row))
+    assert len(seen) == len(tiles)
+    wanted = {(level, col, row) for level, (w, h) in enumerate(tiler.sizes)
+              for col in range(grid_size(w, h, 64)[0]) for row in range(grid_size(w, h, 64)[1])}
+    assert seen == wanted
+
+
+def test_lanczos_matches_whole_image_reduction():
+    image = _image(150, 101, bands=1)
+    options = TileOptions(tile_size=32, resample="lanczos")
+    tiles = PyramidTiler(150, 101, options).tiles(_strips(image, 13))
+    expected = _levels(image, "lanczos")
+    for tile in tiles:
+        top, left = tile.row * 32, tile.col * 32
+        np.testing.assert_array_equal(tile.pixels, expected[tile.level][top:top + 32, left:left + 32])
+
+
+def test_pad_edges_repeats_last_row_and_column():
+    image = _image(70, 40)
+    tiles = {(t.level, t.col, t.row): t.pixels
+             for t in PyramidTiler(70, 40, TileOptions(tile_size=32, pad_edges=True)).tiles([image])}
+    assert all(pixels.shape == (32, 32, 3) for pixels in tiles.values())
+    edge = tiles[7, 2, 1]
+    np.testing.assert_array_equal(edge[:8, :6], image[32:40, 64:70])
+    np.testing.assert_array_equal(edge[8:], np.repeat(edge[7:8], 24, axis=0))
+    np.testing.assert_array_equal(edge[:, 6:], np.repeat(edge[:, 5:6], 26, axis=1))
+
+
+def test_short_source_is_an_error():
+    image = _image(40, 40)
+    with pytest.raises(ValueError, match="ended early"):
+        list(PyramidTiler(40, 50, TileOptions(tile_size=16)).tiles([image]))
+
+
+def test_wrong_strip_width_is_an_error():
+    with pytest.raises(ValueError, match="strip width"):
+        list(PyramidTiler(40, 40).tiles([_image(39, 40)]))
+
+
+@pytest.mark.parametrize("kwargs", [{"tile_size": 0}, {"overlap": 256}, {"resample": "cubic"},
+                                    {"pad_edges": True, "overlap": 1}, {"adaptive_quality": (90, 50)}])
+def test_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        TileOptions(**kwargs)
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.tiling.encode import UniformCache, encode_with_options  # noqa: E402
+from lfp_image_preprocessor.tiling.manifest import MANIFEST_NAME, tile_library  # noqa: E402
+from lfp_image_preprocessor.tiling.pyramid import TileOptions  # noqa: E402
+from lfp_image_preprocessor.tiling.quality import (  # noqa: E402
+    KNEE,
+    SAMPLE_EVERY,
+    gradient_energy,
+    sampled,
+    tile_quality,
+)
+from lfp_image_preprocessor.tiling.sink import DirectorySink  # noqa: E402
+from lfp_image_preprocessor.tiling.tiler import TileStats, tile_image  # noqa: E402
+
+ADAPTIVE = TileOptions(tile_size=64, format="jpeg", quality=85, adaptive_quality=(40, 95))
+
+
+def _noise(amplitude, seed=0, size=64):
+    rng = np.random.default_rng(seed)
+    return np.clip(128 + rng.normal(0, amplitude, (size, size, 3)), 0, 255).astype(np.uint8)
+
+
+def _smooth(width=320, height=192):
+    y, x = np.mgrid[:height, :width]
+    grey = (x * 200 // width + y * 50 // height).astype(np.uint8)
+    return np.repeat(grey[:, :, np.newaxis], 3, axis=2)
+
+
+def test_gradient_energy():
+    assert gradient_energy(np.full((8, 8, 3), 77, np.uint8)) == 0.0
+    stripes = np.zeros((8, 8, 1), np.uint8)
+    stripes[:, ::2] = 10
+    # Every horizontal step is 10, every vertical step 0.
+    assert gradient_energy(stripes) == 5.0
+    # Only the green band of colour tiles counts.
+    rgb = np.zeros((8, 8, 3), np.uint8)
+    rgb[:, ::2, 0] = 200
+    assert gradient_energy(rgb) == 0.0
+    assert gradient_energy(np.zeros((1, 1, 3), np.uint8)) == 0.0
+
+
+def test_quality_mapping():
+    low, high = ADAPTIVE.adaptive_quality
+    assert tile_quality(np.full((64, 64, 3), 9, np.uint8), ADAPTIVE) == low
+    # An energy of KNEE lands in the middle of the range.
+    knee = np.zeros((64, 64, 1), np.uint8)
+    knee[:, ::2] = 2 * KNEE
+    assert gradient_energy(knee) == KNEE
+    assert tile_quality(knee, ADAPTIVE) == round((low + high) / 2)
+    assert tile_quality(_noise(80), ADAPTIVE) > high - 5
+
+
+def test_quality_is_monotonic_in_energy():
+    tiles = [_noise(amplitude) for amplitude in (0, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)]
+    energies = [gradient_energy(tile) for tile in tiles]
+    qualities = [tile_quality(tile, ADAPTIVE) for tile in tiles]
+    assert energies == sorted(energies)
+    assert qualities == sorted(qualities)
+    assert all(40 <= quality <= 95 for quality in qualities)
+
+
+def test_fixed_quality_without_adaptive_or_for_png():
+    tile = _noise(40)
+    assert tile_quality(tile, TileOptions(quality=70)) == 70
+    assert tile_quality(tile, TileOptions(format="png", quality=70, adaptive_quality=(10, 20))) == 70
+
+
+def test_sample_pattern_takes_one_tile_in_sample_every():
+    grid = [(col, row) for col in range(SAMPLE_EVERY) for row in range(SAMPLE_EVERY)]
+    chosen = [position for position in grid if sampled(*position)]
+    assert len(chosen) == SAMPLE_EVERY
+    # One per row and one per column, so every band of the image is sampled.
+    assert sorted(col for col, _ in chosen) == list(range(SAMPLE_EVERY))
+    assert sorted(row for _, row in chosen) == list(range(SAMPLE_EVERY))
+
+
+def test_baseline_is_measured_on_sampled_tiles_only():
+    tile = _noise(10)
+    _, quality, baseline, _ = encode_with_options(tile, ADAPTIVE, 0, 0)
+    assert sampled(0, 0) and baseline > 0 and quality != ADAPTIVE.quality
+    assert encode_with_options(tile, ADAPTIVE, 1, 0)[2] == 0
+    assert encode_with_options(tile, TileOptions(tile_size=64), 0, 0)[2] == 0
+
+
+def test_savings_scale_up_from_the_sample():
+    stats = TileStats(bytes_written=1000, sample_bytes=100, sample_baseline_bytes=150)
+    assert stats.adaptive_bytes_saved == 500
+    stats = TileStats(bytes_written=1000, sample_bytes=100, sample_baseline_bytes=80)
+    assert stats.adaptive_bytes_saved == -200
+    assert TileStats(bytes_written=1000).adaptive_bytes_saved == 0
+
+
+def test_smooth_image_saves_bytes_and_the_manifest_records_it(tmp_path):
+    source = tmp_path / "in" / "smooth.png"
+    source.parent.mkdir()
+    Image.fromarray(_smooth()).save(source)
+    stats = tile_image(source, DirectorySink(tmp_path / "single", "jpg"), ADAPTIVE)
+    assert stats.sample_bytes and stats.sample_baseline_bytes > stats.sample_bytes
+    assert stats.adaptive_bytes_saved > 0
+    assert stats.mean_quality < ADAPTIVE.quality
+
+    report = tile_library([source], tmp_path / "out", lambda path: DirectorySink(path, "jpg"), ADAPTIVE,
+                          relative_to=tmp_path / "in")
+    assert report.adaptive_bytes_saved == stats.adaptive_bytes_saved
+    (entry,) = json.loads((tmp_path / "out" / MANIFEST_NAME).read_text())["entries"].values()
+    assert entry["adaptive_bytes_saved"] == stats.adaptive_bytes_saved
+
+
+def test_uniform_cache_key_includes_adaptive_quality():
+    flat = np.full((64, 64, 3), 50, np.uint8)
+    fixed = UniformCache.key(flat, TileOptions(quality=85))
+    adaptive = UniformCache.key(flat, TileOptions(quality=85, adaptive_quality=(30, 90)))
+    assert fixed is not None and adaptive is not None and fixed != adaptive
+    cache = UniformCache()
+    cache.put(fixed, b"fixed")
+    assert cache.get(adaptive) is None
+    assert UniformCache.key(_noise(20), ADAPTIVE) is None
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from lfp_image_preprocessor.search.index import ROARING_MIN_POSTINGS, TagIndex, TagIndexReader, encode_postings
+from lfp_image_preprocessor.search.roaring import RoaringBitmap
+
+
+def _chunk(rng, kind):
+    """Low halves that pack into an array, bitmap or run container."""
+    if kind == "array":
+        return rng.sample(range(1 << 16), rng.randrange(1, 200))
+    if kind == "bitmap":
+        return rng.sample(range(1 << 16), rng.randrange(5000, 30000))
+    lows = set()
+    for _ in range(rng.randrange(1, 20)):
+        start = rng.randrange(1 << 16)
+        lows.update(range(start, min(start + rng.randrange(1, 3000), 1 << 16)))
+    return list(lows)
+
+
+def _ids(rng):
+    ids = set()
+    for high in rng.sample(range(6), rng.randrange(0, 5)):
+        ids.update(high << 16 | low for low in _chunk(rng, rng.choice(["array", "bitmap", "run"])))
+    if rng.random() < 0.3:
+        ids.update([0, 0xFFFF, 0x10000, 2**32 - 1])
+    return sorted(ids)
+
+
+def _kinds(bitmap):
+    return set(repr(bitmap).split("containers=")[1].rstrip(")").split(","))
+
+
+@pytest.mark.parametrize("kind, letter", [("array", "a"), ("bitmap", "b"), ("run", "r")])
+def test_container_kinds(kind, letter):
+    bitmap = RoaringBitmap.from_sorted(sorted(_chunk(random.Random(kind), kind)))
+    assert _kinds(bitmap) == {letter}
+
+
+def test_round_trip_fuzz():
+    rng = random.Random(0)
+    for _ in range(40):
+        ids = _ids(rng)
+        bitmap = RoaringBitmap.from_sorted(ids)
+        assert bitmap.to_list() == ids
+        assert len(bitmap) == len(ids)
+        assert RoaringBitmap.from_bytes(bitmap.to_bytes()) == bitmap
+        assert RoaringBitmap.from_bytes(memoryview(bitmap.to_bytes())).to_list() == ids
+
+
+def test_set_operations_fuzz():
+    rng = random.Random(1)
+    kinds = set()
+    for _ in range(50):
+        a_ids, b_ids = _ids(rng), _ids(rng)
+        a, b = RoaringBitmap.from_sorted(a_ids), RoaringBitmap.from_sorted(b_ids)
+        kinds |= {(x, y) for x in _kinds(a) for y in _kinds(b)}
+        for result, expected in [(a & b, set(a_ids) & set(b_ids)), (a | b, set(a_ids) | set(b_ids)),
+                                 (a - b, set(a_ids) - set(b_ids)), (b - a, set(b_ids) - set(a_ids))]:
+            assert result.to_list() == sorted(expected)
+            # Results are re-packed and survive serialisation like any other bitmap.
+            assert RoaringBitmap.from_bytes(result.to_bytes()).to_list() == sorted(expected)
+    assert {(x, y) for x in "abr" for y in "abr"} <= kinds
+
+
+def test_results_are_repacked():
+    runs = RoaringBitmap.from_sorted(range(0, 20000))
+    sparse = RoaringBitmap.from_sorted(range(0, 20000, 100))
+    assert _kinds(runs & sparse) == {"a"}
+    assert _kinds(runs - RoaringBitmap.from_sorted(range(1, 20000, 2))) == {"b"}
+    assert _kinds(sparse | RoaringBitmap.from_sorted(range(1, 20000, 100))) == {"a"}
+    assert (runs - runs).to_list() == []
+    assert repr(runs - runs) == "RoaringBitmap(0 ids, containers=-)"
+
+
+def test_empty():
+    empty = RoaringBitmap()
+    full = RoaringBitmap.from_sorted(range(100))
+    assert (empty | full) == full
+    assert (empty & full) == empty
+    assert (full - empty) == full
+    assert RoaringBitmap.from_bytes(empty.to_bytes()) == empty
+
+
+def test_run_gaps_start_after_the_previous_run():
+    bitmap = RoaringBitmap.from_sorted([*range(0, 50), *range(51, 100)])
+    # key 0, run kind, two runs: (gap 0, length - 1 = 49), (gap 1 for the missing 50, 48)
+    assert bitmap.to_bytes() == bytes([1, 0, 2, 2, 0, 49, 1, 48])
+
+
+def test_unknown_container_kind():
+    with pytest.raises(ValueError):
+        RoaringBitmap.from_bytes(bytes([1, 0, 7]))
+
+
+def test_index_stores_dense_tags_as_bitmaps():
+    dense = list(range(0, 3 * ROARING_MIN_POSTINGS))
+    sparse = list(range(0, 10**6, 997))[:ROARING_MIN_POSTINGS]
+    assert encode_postings(dense)[1]
+    assert not encode_postings(sparse)[1]
+    assert not encode_postings(dense[:10])[1]
+    reader = TagIndexReader(TagIndex({"dense": dense, "sparse": sparse}).to_bytes())
+    assert reader.is_roaring("dense") and not reader.is_roaring("sparse")
+    assert reader.postings("dense") == dense
+    assert (reader.bitmap("dense") & reader.bitmap("sparse")).to_list() == sorted(set(dense) & set(sparse))
@@ -0,0 +1,81 @@
+import logging
+import os
+
+import pytest
+
+from lfp_image_preprocessor.discovery.scan import scan
+
+
+def _library(root, tagged_jpeg):
+    paths = [
+        tagged_jpeg(root / "a.jpg", ["sea"]),
+        tagged_jpeg(root / "2020" / "b.JPG", ["sky", "sea"], size=(30, 20)),
+        tagged_jpeg(root / "2020" / "06" / "c.jpeg", seed=1),
+    ]
+    for index in range(25):
+        paths.append(tagged_jpeg(root / "bulk" / f"{index:02}.jpg", [f"n{index}"], size=(8, 8), seed=index))
+    (root / "notes.txt").write_text("not an image")
+    (root / "2020" / "06" / ".DS_Store").write_bytes(b"\0" * 10)
+    return paths
+
+
+def test_finds_every_image_with_its_metadata(tmp_path, tagged_jpeg):
+    paths = _library(tmp_path / "library", tagged_jpeg)
+    records = {record.path: record for record in scan([tmp_path / "library"], workers=3)}
+    assert sorted(records) == sorted(str(path) for path in paths)
+    record = records[str(tmp_path / "library" / "2020" / "b.JPG")]
+    assert (record.format, record.width, record.height) == ("jpeg", 30, 20)
+    assert record.keywords == ("sky", "sea")
+    st = os.stat(record.path)
+    assert (record.size, record.mtime_ns) == (st.st_size, st.st_mtime_ns)
+
+
+def test_one_worker_finds_everything(tmp_path, tagged_jpeg):
+    paths = _library(tmp_path / "library", tagged_jpeg)
+    assert sorted(record.path for record in scan([tmp_path / "library"], workers=1)) == sorted(map(str, paths))
+
+
+def test_several_roots_and_suffix_filter(tmp_path, tagged_jpeg):
+    first = tagged_jpeg(tmp_path / "one" / "a.jpg")
+    tagged_jpeg(tmp_path / "two" / "b.jpg")
+    records = scan([tmp_path / "one", tmp_path / "two"], suffixes=frozenset({".jpg"}))
+    assert len(list(records)) == 2
+    assert [record.path for record in scan([tmp_path / "one"], suffixes=frozenset({".png"}))] == []
+    assert [record.path for record in scan([first.parent])] == [str(first)]
+
+
+def test_symlinked_directories_are_not_followed(tmp_path, tagged_jpeg):
+    tagged_jpeg(tmp_path / "library" / "a.jpg")
+    tagged_jpeg(tmp_path / "elsewhere" / "b.jpg")
+    os.symlink(tmp_path / "elsewhere", tmp_path / "library" / "link")
+    assert [os.path.basename(record.path) for record in scan([tmp_path / "library"])] == ["a.jpg"]
+
+
+def test_unreadable_files_and_missing_roots_are_skipped(tmp_path, tagged_jpeg, caplog):
+    good = tagged_jpeg(tmp_path / "library" / "good.jpg", ["ok"])
+    data = good.read_bytes()
+    (tmp_path / "library" / "cut.jpg").write_bytes(data[:23])  # mid-segment: the probe raises
+    with caplog.at_level(logging.WARNING):
+        records = list(scan([tmp_path / "library", tmp_path / "missing"]))
+    assert [record.path for record in records] == [str(good)]
+    assert "cut.jpg" in caplog.text and "missing" in caplog.text
+
+
+def test_records_stream_before_the_walk_ends(tmp_path, tagged_jpeg):
+    _library(tmp_path / "library", tagged_jpeg)
+    records = scan([tmp_path / "library"], workers=2)
+    first = next(records)
+    assert first.format == "jpeg"
+    records.close()
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root can read anything")
+def test_unlistable_directory_is_skipped(tmp_path, tagged_jpeg):
+    good = tagged_jpeg(tmp_path / "library" / "a.jpg")
+    locked = tmp_path / "library" / "locked"
+    tagged_jpeg(locked / "b.jpg")
+    locked.chmod(0)
+    try:
+        assert [record.path for record in scan([tmp_path / "library"])] == [str(good)]
+    finally:
+        locked.chmod(0o755)
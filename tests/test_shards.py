@@ -0,0 +1,118 @@
+import json
+import random
+
+import pytest
+
+from lfp_image_preprocessor.search.index import TagIndex
+from lfp_image_preprocessor.search.segments import DELTA_SUFFIX, DeltaSegment, encode_delta
+from lfp_image_preprocessor.search.shards import (
+    ROOT_NAME,
+    ShardedIndex,
+    ShardOptions,
+    apply_delta,
+    compact_shards,
+    prune_shards,
+    write_shards,
+)
+
+TAGS = [f"{prefix}{i}" for prefix in ("animal-", "city-", "sky-", "zz-") for i in range(25)]
+
+
+def _random_index(rng):
+    return {tag: set(rng.sample(range(5000), rng.randrange(1, 200))) for tag in rng.sample(TAGS, 60)}
+
+
+def _random_delta(rng, model):
+    added, removed = {}, {}
+    for tag in rng.sample(TAGS, rng.randrange(1, 8)):
+        added[tag] = rng.sample(range(5000), rng.randrange(0, 30))
+        current = sorted(model.get(tag, ()))
+        removed[tag] = rng.sample(current, rng.randrange(0, len(current) + 1)) if current else []
+    return added, removed
+
+
+def _apply(model, added, removed):
+    for tag in set(added) | set(removed):
+        model[tag] = (model.get(tag, set()) - set(removed.get(tag, ()))) | set(added.get(tag, ()))
+
+
+def _check(directory, model):
+    index = ShardedIndex.open(directory)
+    for tag in TAGS:
+        assert index.postings(tag) == sorted(model.get(tag, ())), tag
+        assert index.bitmap(tag).to_list() == sorted(model.get(tag, ())), tag
+
+
+def test_delta_segment_round_trip():
+    segment = DeltaSegment(encode_delta({"a": [3, 1, 1], "b": []}, {"a": [2], "c": [9]}))
+    assert segment.tags() == {"a", "c"}
+    assert segment.apply("a", [2, 5]) == [1, 3, 5]
+    assert segment.apply("c", [1, 9]) == [1]
+    assert segment.apply("z", [4]) == [4]
+    with pytest.raises(ValueError):
+        DeltaSegment(b"LFPTAGS2")
+
+
+@pytest.mark.parametrize("partition", ["prefix", "hash"])
+def test_deltas_and_compaction_fuzz(tmp_path, partition):
+    rng = random.Random(partition)
+    options = ShardOptions(target_bytes=1024, partition=partition, compact_bytes=600, max_deltas=3)
+    model = _random_index(rng)
+    write_shards(TagIndex({tag: sorted(ids) for tag, ids in model.items()}), tmp_path, options)
+    _check(tmp_path, model)
+    compacted = 0
+    for step in range(25):
+        added, removed = _random_delta(rng, model)
+        touched = apply_delta(tmp_path, added, removed)
+        assert touched == sorted(set(touched))
+        _apply(model, added, removed)
+        _check(tmp_path, model)
+        if step % 4 == 3:
+            compacted += compact_shards(tmp_path, options)
+            _check(tmp_path, model)
+    compacted += compact_shards(tmp_path, options, force=True)
+    assert compacted
+    manifest = json.loads((tmp_path / ROOT_NAME).read_text())
+    assert manifest["version"] == 1
+    assert not any(entry.get("deltas") for entry in manifest["shards"])
+    _check(tmp_path, model)
+
+
+def test_compaction_splits_grown_prefix_shards(tmp_path):
+    options = ShardOptions(target_bytes=512, partition="prefix")
+    write_shards(TagIndex({"a": [1], "b": [2]}), tmp_path, options)
+    model = {"a": {1}, "b": {2}}
+    added = {tag: list(range(0, 600, 3)) for tag in TAGS[:40]}
+    apply_delta(tmp_path, added, {})
+    _apply(model, added, {})
+    assert compact_shards(tmp_path, options, force=True) == 1
+    manifest = json.loads((tmp_path / ROOT_NAME).read_text())
+    assert len(manifest["shards"]) > 1
+    firsts = [entry["first"] for entry in manifest["shards"]]
+    assert firsts == sorted(firsts)
+    index = ShardedIndex.open(tmp_path)
+    for tag, ids in model.items():
+        assert index.postings(tag) == sorted(ids)
+
+
+def test_old_manifest_stays_readable_until_pruned(tmp_path):
+    options = ShardOptions(target_bytes=256)
+    write_shards(TagIndex({tag: [1, 2, 3] for tag in TAGS[:10]}), tmp_path, options)
+    apply_delta(tmp_path, {TAGS[0]: [4]}, {TAGS[1]: [1]})
+    before = ShardedIndex.open(tmp_path)
+    compact_shards(tmp_path, options, force=True)
+    assert before.postings(TAGS[0]) == [1, 2, 3, 4]
+    assert before.postings(TAGS[1]) == [2, 3]
+    assert prune_shards(tmp_path) == 0
+    assert prune_shards(tmp_path, older_than=0) > 0
+    assert not list(tmp_path.glob("*" + DELTA_SUFFIX))
+    _check(tmp_path, {tag: {1, 2, 3} for tag in TAGS[:10]} | {TAGS[0]: {1, 2, 3, 4}, TAGS[1]: {2, 3}})
+
+
+def test_a_delta_can_empty_a_tag(tmp_path):
+    write_shards(TagIndex({"a": [1, 2], "b": [3]}), tmp_path)
+    apply_delta(tmp_path, {}, {"a": [1, 2]})
+    assert ShardedIndex.open(tmp_path).postings("a") == []
+    compact_shards(tmp_path, force=True)
+    assert ShardedIndex.open(tmp_path).postings("a") == []
+    assert ShardedIndex.open(tmp_path).postings("b") == [3]
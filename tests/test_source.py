@@ -0,0 +1,111 @@
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.discovery import tiff  # noqa: E402
+from lfp_image_preprocessor.tiling.source import PillowSource, PNMSource, TiffSource, open_source  # noqa: E402
+
+
+def _strip_tiff(path, pixels, rows_per_strip=1):
+    """Uncompressed 8-bit grey TIFF with the strip tables after the IFD."""
+    height, width = pixels.shape
+    strips = -(-height // rows_per_strip)
+    offsets = [8 + i * rows_per_strip * width for i in range(strips)]
+    counts = [min(rows_per_strip, height - i * rows_per_strip) * width for i in range(strips)]
+    ifd = 8 + pixels.nbytes
+    tables = ifd + 2 + 9 * 12 + 4
+    entries = [
+        (256, 4, 1, width), (257, 4, 1, height), (258, 3, 1, 8), (259, 3, 1, 1), (262, 3, 1, 1),
+        (273, 4, strips, tables), (277, 3, 1, 1), (278, 4, 1, rows_per_strip), (279, 4, strips, tables + 4 * strips),
+    ]
+    out = [b"II*\0", struct.pack("<I", ifd), pixels.tobytes(), struct.pack("<H", len(entries))]
+    for tag, kind, count, value in entries:
+        out.append(struct.pack("<HHI" + ("I" if kind == 4 else "H2x"), tag, kind, count, value))
+    out += [b"\0" * 4, struct.pack(f"<{strips}I", *offsets), struct.pack(f"<{strips}I", *counts)]
+    path.write_bytes(b"".join(out))
+    return path
+
+
+def _read(source, rows=7):
+    with source:
+        return np.concatenate(list(source.strips(rows)))
+
+
+@pytest.mark.parametrize("mode,shape", [("L", (37, 23)), ("RGB", (37, 23, 3)), ("RGBA", (37, 23, 4))])
+def test_pillow_written_tiff_is_mapped(tmp_path, mode, shape):
+    pixels = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    path = tmp_path / "image.tif"
+    Image.fromarray(pixels, mode).save(path, tiffinfo={278: 5})
+    source = open_source(path)
+    assert isinstance(source, TiffSource)
+    assert (source.width, source.height, source.bands) == (23, 37, len(mode))
+    assert np.array_equal(_read(source), pixels.reshape(37, 23, -1))
+
+
+def test_huge_strip_table_is_read_past_the_metadata_cap(tmp_path):
+    pixels = np.random.default_rng(1).integers(0, 256, (300_000, 1), dtype=np.uint8)
+    path = _strip_tiff(tmp_path / "tall.tif", pixels)
+    with open(path, "rb") as fh:
+        ifd, _ = tiff.read_tiff_tags(fh, [tiff.STRIP_OFFSETS])
+        assert ifd.get_ints(tiff.STRIP_OFFSETS) is None  # over 1 MiB, skipped for metadata reads
+    source = open_source(path)
+    assert isinstance(source, TiffSource)
+    assert np.array_equal(_read(source, 4096), pixels[:, :, np.newaxis])
+
+
+def test_truncated_strip_table_raises_value_error_and_falls_back(tmp_path):
+    pixels = np.random.default_rng(2).integers(0, 256, (64, 8), dtype=np.uint8)
+    data = _strip_tiff(tmp_path / "full.tif", pixels).read_bytes()
+    path = tmp_path / "cut.tif"
+    path.write_bytes(data[:-20])
+    with open(path, "rb") as fh, pytest.raises(ValueError, match="past the end"):
+        tiff.read_tiff_tags(fh, [tiff.STRIP_BYTE_COUNTS], max_value_bytes=None)
+    with pytest.raises(ValueError):
+        TiffSource(path)
+    with pytest.warns(UserWarning):
+        source = open_source(path)
+    assert isinstance(source, PillowSource)
+    source.close()
+
+
+@pytest.mark.parametrize("cut", [0, 1, 8, 30, 100])
+def test_truncated_ifd_raises_value_error(tmp_path, cut):
+    pixels = np.zeros((4, 4), dtype=np.uint8)
+    data = _strip_tiff(tmp_path / "full.tif", pixels).read_bytes()
+    path = tmp_path / "cut.tif"
+    path.write_bytes(data[:8 + pixels.nbytes + cut])
+    if cut < 2:  # not even the entry count; a partial table keeps its complete entries
+        with open(path, "rb") as fh, pytest.raises(ValueError, match="truncated"):
+            tiff.read_tiff_tags(fh, [tiff.IMAGE_WIDTH], max_value_bytes=None)
+    with pytest.raises(ValueError):
+        TiffSource(path)
+
+
+def test_truncated_bigtiff_header_raises_value_error(tmp_path):
+    path = tmp_path / "cut.tif"
+    path.write_bytes(b"II+\0\x08\0\0\0\x10\0")
+    with open(path, "rb") as fh, pytest.raises(ValueError, match="truncated"):
+        tiff.read_tiff_tags(fh, [tiff.IMAGE_WIDTH])
+
+
+def test_compressed_tiff_falls_back_to_pillow(tmp_path):
+    pixels = np.random.default_rng(3).integers(0, 256, (20, 30, 3), dtype=np.uint8)
+    path = tmp_path / "packed.tif"
+    Image.fromarray(pixels).save(path, compression="tiff_lzw")
+    with pytest.raises(ValueError, match="compressed"):
+        TiffSource(path)
+    source = open_source(path)
+    assert isinstance(source, PillowSource)
+    assert np.array_equal(_read(source), pixels)
+
+
+def test_pnm_source(tmp_path):
+    pixels = np.random.default_rng(4).integers(0, 256, (19, 11, 3), dtype=np.uint8)
+    path = tmp_path / "image.ppm"
+    Image.fromarray(pixels).save(path)
+    source = open_source(path)
+    assert isinstance(source, PNMSource)
+    assert np.array_equal(_read(source, 4), pixels)
@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lfp_image_preprocessor.tiling.pyramid import PyramidTiler, TileOptions, level_sizes  # noqa: E402
+from lfp_image_preprocessor.tiling.sink import DirectorySink  # noqa: E402
+from lfp_image_preprocessor.tiling.tiler import tile_source  # noqa: E402
+from lfp_image_preprocessor.tiling.variants import VariantCollector, plan_variants  # noqa: E402
+
+
+def _smooth(width, height, bands=3):
+    """Low-frequency content, so resizing through a pyramid level stays close to resizing directly."""
+    y, x = np.mgrid[0:height, 0:width]
+    channels = [127 + 120 * np.sin(x / (37 + 11 * band) + y / (53 - 7 * band)) for band in range(bands)]
+    return np.stack(channels, axis=2).round().astype(np.uint8)
+
+
+class CountingSource:
+    """An in-memory original that counts how often its rows are read."""
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+        self.height, self.width, self.bands = pixels.shape
+        self.reads = 0
+        self.rows_read = 0
+
+    def strips(self, rows):
+        self.reads += 1
+        for top in range(0, self.height, rows):
+            strip = self.pixels[top:top + rows]
+            self.rows_read += len(strip)
+            yield strip
+
+
+def _decode(data):
+    pixels = np.asarray(Image.open(io.BytesIO(data)))
+    return pixels if pixels.ndim == 3 else pixels[:, :, np.newaxis]
+
+
+@pytest.mark.parametrize("size", [(3000, 2000), (2049, 17), (641, 641), (100, 3000)])
+def test_plan_uses_the_smallest_level_at_least_as_wide(size):
+    sizes = level_sizes(*size)
+    widths = (320, 640, 1280, 2048, 4096, 640)
+    plan = plan_variants(sizes, widths)
+    planned = sorted(width for targets in plan.values() for width in targets)
+    assert planned == sorted({width for width in widths if width < size[0]})
+    for level, targets in plan.items():
+        for width in targets:
+            assert width <= sizes[level][0] < 2 * width
+            assert level == 0 or sizes[level - 1][0] < width
+
+
+def test_widths_at_or_above_the_original_are_skipped():
+    assert plan_variants(level_sizes(640, 480), (640, 1280)) == {}
+    assert plan_variants(level_sizes(640, 480), ()) == {}
+
+
+def test_variants_and_tiles_come_from_one_read(tmp_path):
+    pixels = _smooth(1500, 1000)
+    source = CountingSource(pixels)
+    options = TileOptions(tile_size=256, format="png", variant_widths=(320, 640, 1280, 2048))
+    stats = tile_source(source, DirectorySink(tmp_path / "out", "png"), options)
+    assert (source.reads, source.rows_read) == (1, 1000)
+    assert stats.variants == 3
+    found = sorted(path.name for path in (tmp_path / "out" / "variants").iterdir())
+    assert found == ["1280.png", "320.png", "640.png"]
+    assert stats.variant_bytes == sum(path.stat().st_size for path in (tmp_path / "out" / "variants").iterdir())
+    original = Image.fromarray(pixels)
+    for width in (320, 640, 1280):
+        variant = _decode((tmp_path / "out" / "variants" / f"{width}.png").read_bytes())
+        height = round(1000 * width / 1500)
+        assert variant.shape == (height, width, 3)
+        direct = np.asarray(original.resize((width, height), Image.Resampling.LANCZOS))
+        assert np.abs(variant.astype(int) - direct).mean() < 2
+
+
+def test_grayscale_variants():
+    pixels = _smooth(900, 300, bands=1)
+    options = TileOptions(tile_size=128, format="png", variant_widths=(200,))
+    tiler = PyramidTiler(900, 300, options)
+    collector = VariantCollector(tiler.sizes, options)
+    for _ in tiler.tiles((pixels[top:top + 64] for top in range(0, 300, 64)), collector.taps):
+        pass
+    [variant] = collector.variants()
+    assert (variant.width, variant.height) == (200, 67)
+    assert _decode(variant.data).shape == (67, 200, 1)
+
+
+def test_no_variants_requested_collects_nothing():
+    options = TileOptions(tile_size=64, format="png")
+    collector = VariantCollector(level_sizes(500, 400), options)
+    assert collector.taps == {} and list(collector.variants()) == []
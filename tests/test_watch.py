@@ -0,0 +1,52 @@
+import os
+
+from lfp_image_preprocessor.watch import Debouncer, PollingWatcher
+
+
+def test_debouncer_coalesces_until_quiet():
+    debouncer = Debouncer(quiet=2.0, max_delay=30.0)
+    assert not debouncer.ready(now=0.0)
+    debouncer.add({"a"}, now=0.0)
+    debouncer.add({"b", "a"}, now=1.5)
+    debouncer.add(set(), now=3.0)
+    assert not debouncer.ready(now=3.0)
+    assert debouncer.ready(now=3.5)
+    assert debouncer.take() == {"a", "b"}
+    assert not debouncer.ready(now=100.0)
+    assert debouncer.take() == set()
+
+
+def test_debouncer_max_delay_bounds_a_trickle():
+    debouncer = Debouncer(quiet=2.0, max_delay=5.0)
+    for second in range(7):
+        debouncer.add({f"f{second}"}, now=float(second))
+        if debouncer.ready(now=float(second)):
+            break
+    assert second == 5
+    assert debouncer.take() == {f"f{i}" for i in range(6)}
+
+
+def test_debouncer_lost_events_mean_resync():
+    debouncer = Debouncer(quiet=1.0)
+    debouncer.add({"a"}, now=0.0)
+    debouncer.add(None, now=0.5)
+    debouncer.add({"b"}, now=0.6)
+    assert debouncer.ready(now=2.0)
+    assert debouncer.take() is None
+    debouncer.add({"c"}, now=3.0)
+    assert debouncer.ready(now=4.0)
+    assert debouncer.take() == {"c"}
+
+
+def test_polling_watcher_reports_changes(tmp_path):
+    (tmp_path / "sub").mkdir()
+    kept, changed, deleted = tmp_path / "kept", tmp_path / "sub" / "changed", tmp_path / "deleted"
+    for path in (kept, changed, deleted):
+        path.write_bytes(b"x")
+    watcher = PollingWatcher([tmp_path], interval=0)
+    assert watcher.poll(0) == set()
+    changed.write_bytes(b"longer")
+    deleted.unlink()
+    (tmp_path / "sub" / "new").write_bytes(b"x")
+    assert watcher.poll(0) == {os.fspath(changed), os.fspath(deleted), os.fspath(tmp_path / "sub" / "new")}
+    watcher.close()
@@ -0,0 +1,202 @@
+import os
+import threading
+
+import pytest
+
+from lfp_image_preprocessor.tiling import writer
+from lfp_image_preprocessor.tiling.pack import PackReader, PackSink
+from lfp_image_preprocessor.tiling.sink import DirectorySink
+from lfp_image_preprocessor.tiling.writer import ThreadedSink, TileFiles
+
+
+class RecordingSink:
+    def __init__(self, path, fail_on=None):
+        self.path = path
+        self.fail_on = fail_on
+        self.calls = []
+
+    def begin(self, width, height, bands):
+        self.calls.append("begin")
+
+    def write(self, level, col, row, data):
+        if (level, col, row) == self.fail_on:
+            raise OSError("disk full")
+        self.calls.append(("write", level, col, row))
+
+    def alias(self, level, col, row, target):
+        self.calls.append(("alias", level, col, row))
+
+    def write_variant(self, width, height, data):
+        self.calls.append(("variant", width))
+
+    def close(self):
+        self.calls.append("close")
+
+    def abort(self):
+        self.calls.append("abort")
+
+
+def _writer_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "tile-writer"]
+
+
+def test_calls_run_in_order(tmp_path):
+    inner = RecordingSink(tmp_path)
+    sink = ThreadedSink(inner, max_pending=2)
+    sink.begin(10, 10, 3)
+    for col in range(20):
+        sink.write(3, col, 0, b"x")
+    sink.alias(3, 20, 0, (3, 0, 0))
+    sink.write_variant(64, 48, b"v")
+    sink.close()
+    assert inner.calls == ["begin", *[("write", 3, col, 0) for col in range(20)], ("alias", 3, 20, 0),
+                           ("variant", 64), "close"]
+    assert not _writer_threads()
+
+
+def test_write_error_is_raised_and_the_inner_sink_aborted(tmp_path):
+    inner = RecordingSink(tmp_path, fail_on=(3, 5, 0))
+    sink = ThreadedSink(inner, max_pending=2)
+    sink.begin(10, 10, 3)
+    with pytest.raises(OSError, match="disk full"):
+        for col in range(50):
+            sink.write(3, col, 0, b"x")
+        sink.close()
+    sink.abort()
+    writes = [call for call in inner.calls if call[0] == "write"]
+    assert writes == [("write", 3, col, 0) for col in range(5)]
+    assert "close" not in inner.calls and inner.calls[-1] == "abort"
+    assert not _writer_threads()
+
+
+def test_error_surfaces_at_close_and_aborts(tmp_path):
+    inner = RecordingSink(tmp_path, fail_on=(0, 0, 0))
+    sink = ThreadedSink(inner)
+    sink.begin(1, 1, 3)
+    sink.write(0, 0, 0, b"x")
+    with pytest.raises(OSError):
+        sink.close()
+    assert inner.calls == ["begin", "abort"]
+    assert not _writer_threads()
+
+
+def test_abort_stops_the_thread_and_drops_queued_calls(tmp_path):
+    inner = RecordingSink(tmp_path)
+    sink = ThreadedSink(inner)
+    sink.begin(1, 1, 3)
+    sink.abort()
+    assert inner.calls[-1] == "abort" and "close" not in inner.calls
+    assert not _writer_threads()
+
+
+def test_failed_pack_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / "image.lfpack"
+    sink = ThreadedSink(PackSink(path, "png"))
+    sink.begin(1, 1, 3)
+    sink.write(0, 0, 0, b"tile")
+    sink.alias(1, 0, 0, (9, 9, 9))  # unknown target: KeyError on the writer thread
+    with pytest.raises(KeyError):
+        sink.close()
+    assert os.listdir(tmp_path) == []
+    assert not _writer_threads()
+
+
+def test_pack_written_through_the_thread(tmp_path):
+    path = tmp_path / "image.lfpack"
+    sink = ThreadedSink(PackSink(path, "png"), max_pending=1)
+    sink.begin(1, 1, 3)
+    for col in range(10):
+        sink.write(2, col, 0, bytes([col]) * 3)
+    sink.close()
+    with PackReader(path) as reader:
+        assert reader.get(2, 7, 0) == b"\x07" * 3
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    paths = []
+    monkeypatch.setattr(writer, "fsync_path", paths.append)
+    return paths
+
+
+def test_fsync_off_never_syncs(tmp_path, synced):
+    files = TileFiles("off")
+    for i in range(5):
+        files.write(tmp_path / "0" / f"{i}.png", b"x")
+    files.close()
+    assert synced == []
+    assert (tmp_path / "0" / "4.png").read_bytes() == b"x"
+
+
+def test_fsync_batch_syncs_every_batch_files(tmp_path, synced):
+    files = TileFiles("batch", batch=3)
+    for i in range(7):
+        files.write(tmp_path / "0" / f"{i}.png", b"x")
+    # Two full batches, each followed by the tile directory and its parent.
+    assert synced.count(tmp_path / "0") == 2
+    assert len([path for path in synced if path.suffix == ".png"]) == 6
+    files.close()
+    assert len([path for path in synced if path.suffix == ".png"]) == 7
+
+
+def test_fsync_end_syncs_files_then_directories_deepest_first(tmp_path, synced):
+    files = TileFiles("end")
+    files.write(tmp_path / "a" / "b" / "1.png", b"x")
+    files.write(tmp_path / "a" / "2.png", b"x")
+    assert synced == []
+    files.close()
+    assert synced[:2] == [tmp_path / "a" / "b" / "1.png", tmp_path / "a" / "2.png"]
+    directories = synced[2:]
+    assert directories.index(tmp_path / "a" / "b") < directories.index(tmp_path / "a") < directories.index(tmp_path)
+
+
+def test_fsync_mode_is_validated():
+    with pytest.raises(ValueError, match="fsync"):
+        TileFiles("always")
+
+
+def test_directory_cache_is_bounded(tmp_path):
+    files = TileFiles(open_dirs=2)
+    for level in range(5):
+        files.write(tmp_path / str(level) / "0_0.png", b"x")
+    assert len(files._dirs) == 2
+    files.close()
+    assert files._dirs == {}
+    assert sorted(os.listdir(tmp_path)) == [str(level) for level in range(5)]
+
+
+def test_directory_sink_aliases_are_relative_symlinks(tmp_path):
+    sink = DirectorySink(tmp_path / "tiles", "png")
+    sink.begin(1, 1, 3)
+    sink.write(1, 0, 0, b"tile")
+    sink.alias(2, 3, 4, (1, 0, 0))
+    sink.close()
+    link = tmp_path / "tiles" / "2" / "3_4.png"
+    assert os.readlink(link) == os.path.join("..", "1", "0_0.png")
+    assert link.read_bytes() == b"tile"
+
+
+def test_tile_source_aborts_a_failing_threaded_sink(tmp_path):
+    np = pytest.importorskip("numpy")
+    from lfp_image_preprocessor.tiling.pyramid import TileOptions
+    from lfp_image_preprocessor.tiling.tiler import tile_source
+
+    class Source:
+        width, height, bands = 100, 80, 3
+
+        def strips(self, rows):
+            pixels = np.random.default_rng(0).integers(0, 256, (80, 100, 3), dtype=np.uint8)
+            for top in range(0, 80, rows):
+                yield pixels[top:top + rows]
+
+    class FailingPack(PackSink):
+        def write(self, level, col, row, data):
+            if level == 7:
+                raise OSError("disk full")
+            super().write(level, col, row, data)
+
+    inner = FailingPack(tmp_path / "image.lfpack", "png")
+    with pytest.raises(OSError, match="disk full"):
+        tile_source(Source(), ThreadedSink(inner, max_pending=1), TileOptions(tile_size=16, format="png"))
+    assert os.listdir(tmp_path) == []
+    assert not _writer_threads()